@@ -0,0 +1,64 @@
+"""
+    Shows how polling throughput scales with the adapter's UART rate,
+    as raised by OBD(negotiate_baud=True). The adapter is emulated with
+    a fake serial port that takes as long as a real UART to move each
+    character (see fakeport.ThrottledPort).
+
+    usage: python benchmarks/bench_baud.py [ECU latency in ms]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from obd.elm327 import ELM327
+from fakeport import ThrottledPort
+from run import offline
+
+
+RATES = [38400, 115200, 230400, 500000]
+
+# a single PID (RPM), and a six-ECU reply to 0100, with headers and spaces on
+RPM  = b"7E8 04 41 0C 1A F8 \r\r>"
+PIDS = b"\r".join([
+    b"7E8 06 41 00 BE 3F A8 13",
+    b"7E9 06 41 00 98 18 80 11",
+    b"7EA 06 41 00 80 00 00 01",
+    b"7EB 06 41 00 98 18 80 01",
+    b"7EC 06 41 00 80 08 00 01",
+    b"7ED 06 41 00 88 18 00 11",
+]) + b"\r\r>"
+
+
+def bench(response, rate, latency, seconds=1.0):
+    elm = offline(ELM327, 38400, None)
+    elm._ELM327__port = ThrottledPort(response, rate, latency)
+    elm._ELM327__set_protocol("6", ["7E8 06 41 00 BE 3F A8 13"])
+    elm._ELM327__connected()
+
+    n = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        elm.send_and_parse("010C1")
+        n += 1
+
+    return n / (time.time() - start)
+
+
+def main(latency_ms=0):
+    latency = latency_ms / 1000.0
+    print("responses/second, with %d ms of ECU latency" % latency_ms)
+    print("%8s %16s %16s" % ("baud", "RPM (%d B)" % len(RPM), "0100 (%d B)" % len(PIDS)))
+
+    base = None
+    for rate in RATES:
+        rpm = bench(RPM, rate, latency)
+        pids = bench(PIDS, rate, latency)
+        base = base or (rpm, pids)
+        print("%8d %9.1f (%.1fx) %9.1f (%.1fx)" % (rate, rpm, rpm / base[0], pids, pids / base[1]))
+
+
+if __name__ == "__main__":
+    main(*[ int(a) for a in sys.argv[1:] ])
@@ -0,0 +1,53 @@
+"""
+    Measures the command registry's checks, which OBD.query() makes (via
+    supports()) on every query: the linear scans that has_command() and
+    has_name() used to make over the commands, against the dict indexes
+    that they use now, and the end to end query rate for scale.
+
+    usage: python benchmarks/bench_commands.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import obd
+from corpora import CORPORA
+from run import best, new_connection, E2E_FAMILY
+
+CMD  = obd.commands.RPM
+LAST = obd.commands.GET_FREEZE_DTC # at the end of the tables
+
+
+def scan_command(c):
+    """ has_command(), as it was written before """
+    return c in obd.commands.__dict__.values()
+
+
+def scan_name(s):
+    """ has_name(), as it was written before """
+    return s.isupper() and (s in obd.commands.__dict__.keys())
+
+
+def main(n=200000):
+    rows = [
+        ("has_command() scan",      best(lambda: scan_command(CMD), n // 10, 5)),
+        ("has_command() scan/last", best(lambda: scan_command(LAST), n // 10, 5)),
+        ("has_command() index",     best(lambda: obd.commands.has_command(CMD), n, 5)),
+        ("has_name() scan",         best(lambda: scan_name(CMD.name), n // 10, 5)),
+        ("has_name() index",        best(lambda: obd.commands.has_name(CMD.name), n, 5)),
+        ("has_pid() index",         best(lambda: obd.commands.has_pid(1, 12), n, 5)),
+    ]
+
+    connection = new_connection(obd.OBD, CORPORA[E2E_FAMILY][1])
+    rows.append(("OBD.supports()",    best(lambda: connection.supports(CMD), n, 5)))
+    rows.append(("OBD.query()",       best(lambda: connection.query(CMD), n // 50, 5)))
+
+    print("%d iterations" % n)
+    for name, s in rows:
+        print("%-24s %10.1f ns" % (name, s * 1e9))
+
+
+if __name__ == "__main__":
+    main()
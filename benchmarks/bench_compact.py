@@ -0,0 +1,70 @@
+"""
+    Compares the wire cost of polling a mode 01 PID with the default
+    adapter settings against compact mode (spaces off, and headers off
+    for a single ECU), using a fake serial port.
+
+    The samples/second column is the ceiling a UART of the given baud
+    rate can carry (10 bits per character), ignoring the vehicle's own
+    response time. The CPU column is the time python-OBD spends per
+    sample, writing, reading and parsing.
+
+    usage: python benchmarks/bench_compact.py [baudrate]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from obd.elm327 import ELM327
+from fakeport import FakePort
+from run import offline
+
+cpu_time = time.process_time if hasattr(time, "process_time") else time.clock
+
+
+LINES_0100 = ["7E8 06 41 00 BE 3F A8 13"]
+REQUEST = b"010C1\r"
+
+MODES = [
+    # name,                 response to 010C1,                headers
+    ("default (ATS1 ATH1)", b"7E8 04 41 0C 1A F8 \r\r>",     True),
+    ("spaces off (ATS0)",   b"7E804410C1AF8\r\r>",           True),
+    ("compact (ATS0 ATH0)", b"410C1AF8\r\r>",                False),
+]
+
+
+def bench(response, headers, n):
+    elm = offline(ELM327, 38400, None)
+    elm._ELM327__port = FakePort(response)
+    elm._ELM327__set_protocol("6", LINES_0100)
+    elm._ELM327__connected()
+    elm._ELM327__protocol.headers = headers
+
+    start = cpu_time()
+    for i in range(n):
+        messages = elm.send_and_parse("010C1")
+    elapsed = cpu_time() - start
+
+    assert messages[0].data == [0x1A, 0xF8]
+    return elapsed / n * 1e6
+
+
+def main(baudrate=38400, n=20000):
+    chars_per_second = baudrate / 10.0
+
+    print("polling 010C (RPM) from a single ECU at %d baud, %d iterations" % (baudrate, n))
+    print("%-20s %12s %12s %14s" % ("mode", "chars/sample", "samples/s", "CPU us/sample"))
+
+    base = None
+    for name, response, headers in MODES:
+        chars = len(REQUEST) + len(response)
+        rate = chars_per_second / chars
+        us = bench(response, headers, n)
+        base = base or rate
+        print("%-20s %12d %12.1f %14.1f   (%.2fx)" % (name, chars, rate, us, rate / base))
+
+
+if __name__ == "__main__":
+    main(*[ int(a) for a in sys.argv[1:] ])
@@ -0,0 +1,60 @@
+"""
+    Measures what debug output costs each query while it is turned off:
+    the messages that a query used to build eagerly (before checking
+    whether anyone was listening), against the guarded, lazily formatted
+    ones, and the end to end query rate for scale.
+
+    usage: python benchmarks/bench_debug.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import obd
+from obd.debug import debug
+from corpora import CORPORA
+from run import best, new_connection, E2E_FAMILY
+
+CMD     = obd.commands.RPM
+WRITTEN = "010C1\r\n"
+BUFFER  = bytearray(b"7E8 04 41 0C 1A F8 \r\r")
+
+
+def eager():
+    """ the debug calls of one query, as they were written before """
+    debug("Sending command: %s" % str(CMD))
+    debug("write: " + repr(WRITTEN))
+    debug("read: " + repr(bytes(BUFFER)))
+
+
+def guarded():
+    """ the same calls, as they are written now """
+    if debug.enabled:
+        debug.log("Sending command: %s", CMD)
+    if debug.enabled:
+        debug.log("write: %r", WRITTEN)
+    if debug.enabled:
+        debug.log("read: %r", bytes(BUFFER))
+
+
+def main(n=200000):
+    assert not debug.enabled
+
+    old = best(eager, n, 5) * 1e9
+    new = best(guarded, n, 5) * 1e9
+
+    connection = new_connection(obd.OBD, CORPORA[E2E_FAMILY][1])
+    query = best(lambda: connection.query(CMD), n // 50, 5) * 1e9
+
+    print("debug output off, %d iterations" % n)
+    print("%-22s %10.1f ns/query" % ("eager messages", old))
+    print("%-22s %10.1f ns/query" % ("guarded messages", new))
+    print("%-22s %10.1f ns/query (%.1f%% of a query)" % ("saving", old - new, (old - new) / (query + old - new) * 100))
+    print("%-22s %10.1f ns/query" % ("OBD.query() now", query))
+
+
+if __name__ == "__main__":
+    main()
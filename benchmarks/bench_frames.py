@@ -0,0 +1,64 @@
+"""
+    Measures the memory held per Frame and per Message, and the time
+    taken to parse them, by replaying the corpora until `n` responses
+    have been parsed, and keeping every message, as a long recording
+    would.
+
+    Memory is traced with tracemalloc (Python 3.4+); on older Pythons
+    only the parse time is reported.
+
+    usage: python benchmarks/bench_frames.py [n]
+"""
+
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from corpora import CORPORA
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+cpu_time = time.process_time if hasattr(time, "process_time") else time.clock
+
+
+def main(n=100000):
+    n = int(n)
+    responses = [ (protocol_class(corpus[0][1]), lines)
+                  for protocol_class, corpus in CORPORA.values()
+                  for cmd, lines in corpus ]
+
+    # the lines are shared, so that only the parsed objects are counted
+    replay = [ responses[i % len(responses)] for i in range(n) ]
+
+    gc.collect()
+    start = cpu_time()
+    kept = [ protocol(lines) for protocol, lines in replay ]
+    elapsed = cpu_time() - start
+
+    # memory is measured on a second pass, since tracing slows parsing down
+    if tracemalloc is not None:
+        kept = None
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        kept = [ protocol(lines) for protocol, lines in replay ]
+        held = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+    messages = sum([ len(m) for m in kept ])
+    frames = sum([ len(m.frames) for ms in kept for m in ms ])
+
+    print("%d responses, %d messages, %d frames" % (n, messages, frames))
+    print("%-24s %10.2f us/response" % ("parse time", elapsed / n * 1e6))
+    if tracemalloc is not None:
+        print("%-24s %10.0f bytes/frame (messages included)" % ("memory held", float(held) / frames))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
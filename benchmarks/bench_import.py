@@ -0,0 +1,55 @@
+"""
+    Measures what `import obd` costs a fresh interpreter: the wall time
+    of the import, and the peak resident memory (RSS) afterwards, as the
+    median of several runs. The time of the first command lookup (which
+    imports the command tables, and what they need), and of the first
+    DTC lookup (which may load the DTC table) are reported too.
+
+    usage: python benchmarks/bench_import.py [runs]
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+PROBE = """
+import sys, json, time, resource
+sys.path.insert(0, %r)
+start = time.time()
+import obd
+imported = time.time()
+obd.commands.RPM
+first_command = time.time() - imported
+from obd import decoders
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start_dtc = time.time()
+codes, unit = decoders.dtc([type("M", (), {"data" : [0x01, 0x33]})()])
+first_dtc = time.time() - start_dtc
+assert codes[0][1] != "Unknown error code"
+print(json.dumps([imported - start, rss, first_dtc, first_command]))
+""" % ROOT
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main(runs=15):
+    results = []
+    for i in range(int(runs)):
+        out = subprocess.check_output([sys.executable, "-c", PROBE])
+        results.append(json.loads(out.decode().strip().splitlines()[-1]))
+
+    print("%d runs of %s" % (int(runs), sys.executable))
+    print("%-22s %10.1f ms" % ("import obd", median([ r[0] for r in results ]) * 1000))
+    print("%-22s %10.0f KB" % ("peak RSS", median([ r[1] for r in results ])))
+    print("%-22s %10.1f ms" % ("first command lookup", median([ r[3] for r in results ]) * 1000))
+    print("%-22s %10.3f ms" % ("first DTC lookup", median([ r[2] for r in results ]) * 1000))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
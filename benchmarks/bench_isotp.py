@@ -0,0 +1,83 @@
+"""
+    Compares parsing a multi-frame CAN reply all at once (after the
+    prompt) with reassembling it line by line (ISOTPReassembler).
+
+    The reply is a long mode 06 answer from the engine, followed by a
+    short one from the transmission. "available" is when each message
+    can be handed out, counting the characters that must cross a UART
+    of the given rate (10 bits each) before then. Without a response
+    count, the adapter only prints its prompt once the response timeout
+    (ATST, ~205 ms by default) has passed since the last frame, so the
+    batch parse waits for that too. The CPU figures are per line, for
+    the parsing alone.
+
+    usage: python benchmarks/bench_isotp.py [baudrate] [timeout_ms]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from obd.protocols import ISO_15765_4_11bit_500k
+
+cpu_time = time.process_time if hasattr(time, "process_time") else time.clock
+
+
+def can_lines(header, payload):
+    """ ISO-TP frames of a payload, as the adapter prints them """
+    hexes = lambda bs: " ".join([ "%02X" % b for b in bs ])
+    if len(payload) <= 7:
+        return ["%s %02X %s" % (header, len(payload), hexes(payload))]
+    lines = ["%s 1%X %02X %s" % (header, len(payload) >> 8, len(payload) & 0xFF, hexes(payload[:6]))]
+    rest, seq = payload[6:], 1
+    while rest:
+        lines.append("%s 2%X %s" % (header, seq & 0x0F, hexes((rest[:7] + [0] * 7)[:7])))
+        rest, seq = rest[7:], seq + 1
+    return lines
+
+
+LINES = can_lines("7E8", [0x46, 0x00] + [ i & 0xFF for i in range(400) ]) + \
+        can_lines("7E9", [0x46, 0x00, 0x01, 0x02, 0x03])
+
+
+def main(baudrate=38400, timeout_ms=205, n=2000):
+    baudrate = int(baudrate)
+    timeout = float(timeout_ms) / 1000
+    p = ISO_15765_4_11bit_500k(["7E8 06 41 00 00 01 02 03", "7E9 06 41 00 00 01 02 03"])
+    seconds = lambda chars: chars * 10.0 / baudrate
+
+    # when each message is available
+    total = sum([ len(l) + 1 for l in LINES ]) + 2 # the empty line, and the prompt
+    chars = 0
+    streamed = {}
+    r = p.reassembler()
+    for line in LINES:
+        chars += len(line) + 1
+        for m in r.feed(line):
+            streamed[m.tx_id] = seconds(chars)
+
+    print("%d lines at %d baud" % (len(LINES), baudrate))
+    print("%-10s %18s %18s" % ("ECU", "batch available", "stream available"))
+    for tx_id in sorted(streamed):
+        print("%-10s %15.1f ms %15.1f ms" % (hex(tx_id), (seconds(total) + timeout) * 1000, streamed[tx_id] * 1000))
+
+    start = cpu_time()
+    for i in range(n):
+        p(LINES)
+    batch = (cpu_time() - start) / n / len(LINES) * 1e9
+
+    start = cpu_time()
+    for i in range(n):
+        r = p.reassembler()
+        for line in LINES:
+            r.feed(line)
+    stream = (cpu_time() - start) / n / len(LINES) * 1e9
+
+    print("%-10s %15.0f ns/line" % ("batch CPU", batch))
+    print("%-10s %15.0f ns/line" % ("stream CPU", stream))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
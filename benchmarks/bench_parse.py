@@ -0,0 +1,96 @@
+"""
+    Benchmarks the classify-and-decode stage of Protocol.__call__(),
+    which sorts each line printed by the adapter into hex frames and
+    status messages, and decodes the frames to bytes. The old stage
+    (scrubbing spaces, isHex(), then ascii_to_bytes()) is compared to
+    the single pass of hex_line_to_bytes(), and the whole parser's
+    throughput is measured on the same lines.
+
+    By default, the lines of every corpus in corpora.py are replayed,
+    along with some typical status messages. A log of raw adapter
+    output (one line per line, blank lines are skipped) can be replayed
+    instead, in which case the whole-parser figure uses CAN 11/500.
+
+    usage: python benchmarks/bench_parse.py [logfile]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from obd.utils import isHex, ascii_to_bytes, hex_line_to_bytes
+from obd.protocols import ISO_15765_4_11bit_500k
+from corpora import CORPORA
+
+cpu_time = time.process_time if hasattr(time, "process_time") else time.clock
+
+STATUS_LINES = ["SEARCHING...", "NO DATA", "CAN ERROR", "STOPPED", "?"]
+
+
+def legacy_classify(lines):
+    """ the old preprocessing, with the decoding the parsers used to do """
+    frames = []
+    other = []
+    for line in lines:
+        line_no_spaces = line.replace(' ', '')
+        if isHex(line_no_spaces):
+            if len(line_no_spaces) % 2:
+                line_no_spaces = "0" + line_no_spaces
+            frames.append(ascii_to_bytes(line_no_spaces))
+        else:
+            other.append(line)
+    return frames, other
+
+
+def classify(lines):
+    frames = []
+    other = []
+    for line in lines:
+        raw_bytes = hex_line_to_bytes(line)
+        if raw_bytes is not None:
+            frames.append(raw_bytes)
+        else:
+            other.append(line)
+    return frames, other
+
+
+def bench(f, args, n):
+    start = cpu_time()
+    for i in range(n):
+        f(*args)
+    return (cpu_time() - start) / n
+
+
+def main(logfile=None, n=2000):
+    if logfile is None:
+        responses = [ (protocol_class(corpus[0][1]), lines)
+                      for protocol_class, corpus in CORPORA.values()
+                      for cmd, lines in corpus ]
+        responses.append((ISO_15765_4_11bit_500k([]), STATUS_LINES))
+    else:
+        with open(logfile) as f:
+            lines = [ l.strip() for l in f if l.strip() ]
+        responses = [ (ISO_15765_4_11bit_500k(lines[:1]), lines) ]
+
+    lines = [ l for p, ls in responses for l in ls ]
+    frames, other = legacy_classify(lines)
+    assert ([ bytearray(f) for f in frames ], other) == classify(lines)
+
+    old = bench(legacy_classify, [lines], n) / len(lines) * 1e9
+    new = bench(classify, [lines], n) / len(lines) * 1e9
+
+    def parse_all():
+        for protocol, ls in responses:
+            protocol(ls)
+    parse = bench(parse_all, [], n) / len(lines) * 1e9
+
+    print("%d lines, %d iterations" % (len(lines), n))
+    print("%-28s %10.1f ns/line" % ("scrub + isHex + unhex", old))
+    print("%-28s %10.1f ns/line   (%.1fx)" % ("hex_line_to_bytes", new, old / new))
+    print("%-28s %10.1f ns/line   (%.0f lines/s)" % ("Protocol.__call__ overall", parse, 1e9 / parse))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
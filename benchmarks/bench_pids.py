@@ -0,0 +1,79 @@
+"""
+    Measures PID support discovery, per PID getter response: decoding
+    the 4-byte bitmap into a "0101..." string and walking its characters,
+    as it was done before, against decoding it into a BitSet and walking
+    its set bits. Also times merging the answers of many ECUs, and the
+    support check that OBD.supports() makes on every query, on a bare
+    int against a BitSet.
+
+    usage: python benchmarks/bench_pids.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from obd.utils import BitSet, bytes_to_bits
+from run import best
+
+DATA = [0xBE, 0x3F, 0xA8, 0x13] # PIDS_A, as a typical engine answers it
+ECUS = [ [(0x11 * i) & 0xFF, 0x3F, (0xA8 >> i) & 0xFF, 0x13] for i in range(16) ]
+BASE = 0x00
+
+
+def strings():
+    """ the PIDs of one response, as they were found before """
+    supported = bytes_to_bits(DATA)
+    pids = []
+    for i in range(len(supported)):
+        if supported[i] == "1":
+            pids.append(BASE + i + 1)
+    return pids
+
+
+def bitsets():
+    """ the same, as they are found now """
+    return list(BitSet.from_bytes(DATA) << BASE)
+
+
+def union_strings():
+    """ the PIDs supported by any of many ECUs, from strings """
+    pids = set()
+    for data in ECUS:
+        supported = bytes_to_bits(data)
+        for i in range(len(supported)):
+            if supported[i] == "1":
+                pids.add(BASE + i + 1)
+    return pids
+
+
+def union_bitsets():
+    supported = BitSet()
+    for data in ECUS:
+        supported |= BitSet.from_bytes(data)
+    return supported
+
+
+def main(n=50000):
+    assert strings() == bitsets()
+    assert union_strings() == set(union_bitsets())
+
+    bitmap = BitSet.from_bytes(DATA)
+    bits = bitmap.bits
+    rows = [
+        ("discover/string",                  best(strings, n, 5)),
+        ("discover/BitSet",                  best(bitsets, n, 5)),
+        ("union %d ECUs/string" % len(ECUS), best(union_strings, n // 10, 5)),
+        ("union %d ECUs/BitSet" % len(ECUS), best(union_bitsets, n // 10, 5)),
+        ("check/int",                        best(lambda: (bits >> 0x0C) & 1 == 1, n * 10, 5)),
+        ("check/BitSet",                     best(lambda: 0x0C in bitmap, n * 10, 5)),
+    ]
+
+    print("%d iterations" % n)
+    for name, s in rows:
+        print("%-22s %10.1f ns" % (name, s * 1e9))
+
+
+if __name__ == "__main__":
+    main()
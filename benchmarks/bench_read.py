@@ -0,0 +1,72 @@
+"""
+    Benchmarks the ELM327 serial reader against the old
+    byte-at-a-time implementation, using a fake serial port.
+
+    usage: python benchmarks/bench_read.py
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from obd.elm327 import ELM327
+from fakeport import FakePort
+from run import offline
+
+cpu_time = time.process_time if hasattr(time, "process_time") else time.clock
+
+
+# a six-ECU reply to 0100, with headers and spaces on
+RESPONSE = b"\r".join([
+    b"7E8 06 41 00 BE 3F A8 13",
+    b"7E9 06 41 00 98 18 80 11",
+    b"7EA 06 41 00 80 00 00 01",
+    b"7EB 06 41 00 98 18 80 01",
+    b"7EC 06 41 00 80 08 00 01",
+    b"7ED 06 41 00 88 18 00 11",
+]) + b"\r\r>"
+
+
+def legacy_read(port):
+    """ the original reader, one read(1) call per character """
+    buffer = b''
+    while True:
+        c = port.read(1)
+        if not c or c == b'>':
+            break
+        if c == b'\x00':
+            continue
+        buffer += c
+    raw = buffer.decode()
+    return [ s.strip() for s in re.split("[\r\n]", raw) if bool(s) ]
+
+
+def bench(name, read, port, n):
+    start = cpu_time()
+    for i in range(n):
+        port.write(b"0100\r")
+        lines = read()
+    elapsed = cpu_time() - start
+    assert len(lines) == 6
+    us = elapsed / n * 1e6
+    print("%-10s %8.1f us/response" % (name, us))
+    return us
+
+
+def main(n=20000):
+    port = FakePort(RESPONSE)
+    elm = offline(ELM327, 38400, None)
+    elm._ELM327__port = port
+
+    print("%d byte response, %d iterations" % (len(RESPONSE), n))
+    old = bench("legacy", lambda: legacy_read(port), port, n)
+    new = bench("block", elm._ELM327__read, port, n)
+
+    print("speedup: %.1fx" % (old / new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+    Fixed corpora of raw ELM327 output (headers and spaces on), one per
+    protocol family, used by the benchmark suite. Each entry is the
+    command that was sent, and the lines that the adapter printed.
+
+    Every corpus holds the same vehicle: an engine (which knows RPM,
+    speed, coolant temp, four DTCs and the VIN), and a transmission
+    (which knows speed). So the corpora also cover multi-ECU replies,
+    and multi-frame replies (the DTCs and the VIN).
+"""
+
+from obd.protocols import *
+
+
+CORPORA = {
+
+    "CAN 11/500" : (ISO_15765_4_11bit_500k, [
+        ("0100", ["7E8 06 41 00 08 18 00 00", "7E9 06 41 00 00 08 00 00"]),
+        ("010C", ["7E8 04 41 0C 1A F8"]),
+        ("010D", ["7E8 03 41 0D 32", "7E9 03 41 0D 33"]),
+        ("0105", ["7E8 03 41 05 7B"]),
+        ("03",   ["7E8 10 0A 43 04 01 33 01 71", "7E8 21 03 00 04 20 00 00 00", "7E9 02 43 00"]),
+        ("0902", ["7E8 10 14 49 02 01 31 47 31", "7E8 21 41 46 35 43 35 39 46", "7E8 22 41 31 33 36 35 39 00"]),
+    ]),
+
+    "CAN 29/500" : (ISO_15765_4_29bit_500k, [
+        ("0100", ["18 DA F1 10 06 41 00 08 18 00 00", "18 DA F1 18 06 41 00 00 08 00 00"]),
+        ("010C", ["18 DA F1 10 04 41 0C 1A F8"]),
+        ("010D", ["18 DA F1 10 03 41 0D 32", "18 DA F1 18 03 41 0D 33"]),
+        ("0105", ["18 DA F1 10 03 41 05 7B"]),
+        ("03",   ["18 DA F1 10 10 0A 43 04 01 33 01 71", "18 DA F1 10 21 03 00 04 20 00 00 00", "18 DA F1 18 02 43 00"]),
+        ("0902", ["18 DA F1 10 10 14 49 02 01 31 47 31", "18 DA F1 10 21 41 46 35 43 35 39 46", "18 DA F1 10 22 41 31 33 36 35 39 00"]),
+    ]),
+
+    "J1850 PWM" : (SAE_J1850_PWM, [
+        ("0100", ["41 6B 10 41 00 08 18 00 00 14", "41 6B 18 41 00 00 08 00 00 42"]),
+        ("010C", ["41 6B 10 41 0C 1A F8 3D"]),
+        ("010D", ["41 6B 10 41 0D 32 F6", "41 6B 18 41 0D 33 77"]),
+        ("0105", ["41 6B 10 41 05 7B 4A"]),
+        ("03",   ["41 6B 10 43 01 33 01 71 03 00 AF", "41 6B 10 43 04 20 00 00 00 00 32", "41 6B 18 43 00 00 00 00 00 00 34"]),
+        ("0902", ["41 6B 10 49 02 01 01 31 47 31 06", "41 6B 10 49 02 02 41 46 35 43 3E", "41 6B 10 49 02 03 35 39 46 41 EA", "41 6B 10 49 02 04 31 33 36 35 A6", "41 6B 10 49 02 05 39 00 00 00 A3"]),
+    ]),
+
+    "J1850 VPW" : (SAE_J1850_VPW, [
+        ("0100", ["48 6B 10 41 00 08 18 00 00 7E", "48 6B 18 41 00 00 08 00 00 28"]),
+        ("010C", ["48 6B 10 41 0C 1A F8 B2"]),
+        ("010D", ["48 6B 10 41 0D 32 BA", "48 6B 18 41 0D 33 3B"]),
+        ("0105", ["48 6B 10 41 05 7B 06"]),
+        ("03",   ["48 6B 10 43 01 33 01 71 03 00 E9", "48 6B 10 43 04 20 00 00 00 00 74", "48 6B 18 43 00 00 00 00 00 00 72"]),
+        ("0902", ["48 6B 10 49 02 01 01 31 47 31 40", "48 6B 10 49 02 02 41 46 35 43 78", "48 6B 10 49 02 03 35 39 46 41 AC", "48 6B 10 49 02 04 31 33 36 35 E0", "48 6B 10 49 02 05 39 00 00 00 E5"]),
+    ]),
+
+    "ISO 9141-2" : (ISO_9141_2, [
+        ("0100", ["48 6B 10 41 00 08 18 00 00 24", "48 6B 18 41 00 00 08 00 00 14"]),
+        ("010C", ["48 6B 10 41 0C 1A F8 22"]),
+        ("010D", ["48 6B 10 41 0D 32 43", "48 6B 18 41 0D 33 4C"]),
+        ("0105", ["48 6B 10 41 05 7B 84"]),
+        ("03",   ["48 6B 10 43 01 33 01 71 03 00 AF", "48 6B 10 43 04 20 00 00 00 00 2A", "48 6B 18 43 00 00 00 00 00 00 0E"]),
+        ("0902", ["48 6B 10 49 02 01 01 31 47 31 B9", "48 6B 10 49 02 02 41 46 35 43 0F", "48 6B 10 49 02 03 35 39 46 41 06", "48 6B 10 49 02 04 31 33 36 35 E1", "48 6B 10 49 02 05 39 00 00 00 4C"]),
+    ]),
+
+    "KWP FAST" : (ISO_14230_4_fast, [
+        ("0100", ["86 F1 10 41 00 08 18 00 00 E8", "86 F1 18 41 00 00 08 00 00 D8"]),
+        ("010C", ["84 F1 10 41 0C 1A F8 E4"]),
+        ("010D", ["83 F1 10 41 0D 32 04", "83 F1 18 41 0D 33 0D"]),
+        ("0105", ["83 F1 10 41 05 7B 45"]),
+        ("03",   ["87 F1 10 43 01 33 01 71 03 00 74", "87 F1 10 43 04 20 00 00 00 00 EF", "87 F1 18 43 00 00 00 00 00 00 D3"]),
+        ("0902", ["87 F1 10 49 02 01 01 31 47 31 7E", "87 F1 10 49 02 02 41 46 35 43 D4", "87 F1 10 49 02 03 35 39 46 41 CB", "87 F1 10 49 02 04 31 33 36 35 A6", "87 F1 10 49 02 05 39 00 00 00 11"]),
+    ]),
+}
+
+
+def raw(lines):
+    """ the bytes the adapter sends for a list of lines """
+    return b"".join([ l.encode() + b" \r" for l in lines ]) + b"\r>"
@@ -0,0 +1,96 @@
+"""
+    In-process stand-in for serial.Serial, used by the benchmarks.
+
+    Every write() queues up the next canned response, which is then
+    handed out by read() in chunks of at most `chunk` bytes, the way a
+    USB-serial driver delivers a burst of characters.
+
+    ThrottledPort additionally takes as long as a real UART would to
+    move the characters (10 bits each), plus the vehicle's latency.
+"""
+
+import time
+
+
+class FakePort(object):
+
+    def __init__(self, response, chunk=64):
+        self.response = response # bytes returned after every write
+        self.chunk    = chunk
+        self.portstr  = "fake"
+        self.timeout  = 3
+        self.__buffer = b''
+
+    def inWaiting(self):
+        return min(len(self.__buffer), self.chunk)
+
+    def read(self, n=1):
+        n = min(n, self.chunk)
+        data = self.__buffer[:n]
+        self.__buffer = self.__buffer[n:]
+        return data
+
+    def write(self, data):
+        self.__buffer = self.response
+        return len(data)
+
+    def flushInput(self):
+        self.__buffer = b''
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+
+class ThrottledPort(FakePort):
+
+    def __init__(self, response, baudrate=38400, latency=0.0, chunk=64):
+        FakePort.__init__(self, response, chunk)
+        self.baudrate = baudrate
+        self.latency  = latency # seconds for the vehicle to answer
+
+    def __transfer(self, n):
+        time.sleep(n * 10.0 / self.baudrate)
+
+    def read(self, n=1):
+        data = FakePort.read(self, n)
+        self.__transfer(len(data))
+        return data
+
+    def write(self, data):
+        self.__transfer(len(data))
+        time.sleep(self.latency)
+        return FakePort.write(self, data)
+
+
+
+
+class ScriptedPort(FakePort):
+    """
+        Answers each command with its own canned response, like an
+        adapter would. `responses` maps command strings (without the
+        fast-mode count, ex: "010C") to the bytes sent back. Unknown
+        commands get NO DATA, and an empty line repeats the last one.
+    """
+
+    def __init__(self, responses, chunk=64):
+        FakePort.__init__(self, b"", chunk)
+        self.responses = responses
+        self.__last    = ""
+
+    def write(self, data):
+        cmd = data.decode().strip().upper()
+        cmd = cmd or self.__last
+        self.__last = cmd
+
+        response = self.responses.get(cmd)
+        if (response is None) and (len(cmd) % 2 == 1):
+            response = self.responses.get(cmd[:-1]) # a fast-mode response count
+        if response is None:
+            response = b"NO DATA\r\r>"
+
+        self.response = response
+        return FakePort.write(self, data)
@@ -0,0 +1,249 @@
+"""
+    The benchmark suite. Times each stage of the query path against the
+    fixed corpora in corpora.py, and the whole path end to end against
+    an in-process fake adapter (no serial port, no vehicle):
+
+        read    ELM327.__read(), per frame (line) of adapter output
+        parse   Protocol.__call__(), per frame, and per message
+        decode  OBDCommand.__call__(), per decoded response
+        e2e     OBD.query() and the Async loop, in queries per second
+
+    Each figure is the best of several repeats. Results can be saved as
+    JSON, and compared against a saved baseline, in which case the exit
+    status is non-zero when any figure regressed by more than the
+    tolerance.
+
+    usage: python benchmarks/run.py [--quick] [--json FILE]
+                                    [--baseline FILE [--tolerance 0.25]]
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import obd
+from obd.elm327 import ELM327
+from obd.utils import OBDStatus
+from fakeport import FakePort, ScriptedPort
+from corpora import CORPORA, raw
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+# the commands (by their string) that the corpora's responses decode with
+DECODERS = {
+    "0100" : obd.commands.PIDS_A,
+    "010C" : obd.commands.RPM,
+    "010D" : obd.commands.SPEED,
+    "0105" : obd.commands.COOLANT_TEMP,
+    "03"   : obd.commands.GET_DTC,
+}
+
+E2E_FAMILY   = "CAN 11/500"
+E2E_PROTOCOL = "6"
+
+# figures where bigger is better, all others are costs
+RATES = ["queries/s"]
+
+
+def best(f, n, repeat):
+    """ runs f() n times, repeat times over, and returns the fastest seconds per call """
+    times = []
+    for r in range(repeat):
+        start = timer()
+        for i in range(n):
+            f()
+        times.append((timer() - start) / n)
+    return min(times)
+
+
+def offline(cls, *args, **kwargs):
+    """
+        instantiates an ELM327 or OBD on /dev/null, which fails to open and
+        leaves no port, without printing its (forced) connection errors
+    """
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        return cls("/dev/null", *args, **kwargs)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def new_elm(port, lines_0100, **kwargs):
+    """ an ELM327 that's connected (protocol 6) through the given fake port """
+    elm = offline(ELM327, 38400, None, **kwargs)
+    elm._ELM327__port = port
+    elm._ELM327__set_protocol(E2E_PROTOCOL, lines_0100)
+    elm._ELM327__connected()
+    return elm
+
+
+def bench_read(family, corpus, n, repeat):
+    port = FakePort(b"")
+    elm = offline(ELM327, 38400, None)
+    elm._ELM327__port = port
+
+    responses = [ raw(lines) for cmd, lines in corpus ]
+    frames = sum([ len(lines) for cmd, lines in corpus ])
+
+    def read_all():
+        for r in responses:
+            port.response = r
+            port.write(b"\r")
+            elm._ELM327__read()
+
+    s = best(read_all, n, repeat)
+    return { "read/%s" % family : (s / frames * 1e9, "ns/frame") }
+
+
+def bench_parse(family, protocol_class, corpus, n, repeat):
+    protocol = protocol_class(corpus[0][1]) # built from the 0100 response
+    frames = sum([ len(lines) for cmd, lines in corpus ])
+    messages = sum([ len(protocol(lines)) for cmd, lines in corpus ])
+
+    def parse_all():
+        for cmd, lines in corpus:
+            protocol(lines)
+
+    s = best(parse_all, n, repeat)
+    return {
+        "parse/%s" % family         : (s / frames * 1e9, "ns/frame"),
+        "parse/%s/message" % family : (s / messages * 1e9, "ns/message"),
+    }
+
+
+def bench_decode(n, repeat):
+    protocol_class, corpus = CORPORA[E2E_FAMILY]
+    protocol = protocol_class(corpus[0][1])
+
+    results = {}
+    for cmd, lines in corpus:
+        if cmd not in DECODERS:
+            continue
+        command = DECODERS[cmd]
+        messages = protocol(lines)
+        assert command(messages).value is not None
+        s = best(lambda: command(messages), n, repeat)
+        results["decode/%s" % command.name] = (s * 1e9, "ns/decode")
+    return results
+
+
+def new_connection(cls, corpus, **kwargs):
+    """ an OBD (or Async) connected to a ScriptedPort serving the corpus """
+    responses = dict([ (cmd, raw(lines)) for cmd, lines in corpus ])
+    connection = offline(cls, **kwargs)
+    instrument = kwargs.get("instrument", False)
+    connection.port = new_elm(ScriptedPort(responses), corpus[0][1], instrument=instrument)
+    connection._OBD__load_commands()
+    assert connection.status() == OBDStatus.CAR_CONNECTED
+    return connection
+
+
+def bench_e2e(seconds):
+    protocol_class, corpus = CORPORA[E2E_FAMILY]
+    results = {}
+
+    connection = new_connection(obd.OBD, corpus)
+    n = int(2000 * seconds)
+    s = best(lambda: connection.query(obd.commands.RPM), n, 3)
+    results["e2e/query"] = (1.0 / s, "queries/s")
+
+    # the same, timing every stage of the query
+    connection = new_connection(obd.OBD, corpus, instrument=True)
+    s = best(lambda: connection.query(obd.commands.RPM), n, 3)
+    results["e2e/query/instrumented"] = (1.0 / s, "queries/s")
+
+    # the Async loop, flat out, polling three commands
+    connection = new_connection(obd.Async, corpus)
+    counts = [0]
+    def callback(r):
+        counts[0] += 1
+    for c in [obd.commands.RPM, obd.commands.SPEED, obd.commands.COOLANT_TEMP]:
+        connection.watch(c, callback=callback)
+
+    connection.start()
+    time.sleep(seconds / 4.0) # warm up
+    start, first = timer(), counts[0]
+    time.sleep(seconds)
+    elapsed, total = timer() - start, counts[0] - first
+    connection.stop()
+    results["e2e/async"] = (total / elapsed, "queries/s")
+
+    return results
+
+
+def run(quick=False):
+    n, repeat, seconds = (200, 3, 0.5) if quick else (2000, 5, 2.0)
+
+    results = {}
+    for family in sorted(CORPORA):
+        protocol_class, corpus = CORPORA[family]
+        results.update(bench_read(family, corpus, n, repeat))
+        results.update(bench_parse(family, protocol_class, corpus, n, repeat))
+    results.update(bench_decode(n * 5, repeat))
+    results.update(bench_e2e(seconds))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ returns the names of the figures that regressed past the tolerance """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        value, unit = results[name]
+        base = baseline[name]["value"]
+        if unit in RATES:
+            change = (base / value) - 1.0 if value > 0 else float("inf")
+        else:
+            change = (value / base) - 1.0 if base > 0 else 0.0
+        if change > tolerance:
+            regressions.append((name, base, value, unit, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="python-OBD benchmark suite")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for a smoke test")
+    parser.add_argument("--json", metavar="FILE", help="write the results to FILE")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against results saved with --json")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown against the baseline, as a fraction (default 0.25)")
+    args = parser.parse_args()
+
+    results = run(args.quick)
+
+    for name in sorted(results):
+        value, unit = results[name]
+        print("%-32s %12.1f %s" % (name, value, unit))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "python"  : platform.python_version(),
+                "results" : dict([ (name, { "value" : v, "unit" : u }) for name, (v, u) in results.items() ]),
+            }, f, indent=2, sort_keys=True, separators=(",", ": "))
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+        regressions = compare(results, baseline, args.tolerance)
+        for name, base, value, unit, change in regressions:
+            print("REGRESSION %s: %.1f -> %.1f %s (%+.0f%%)" % (name, base, value, unit, change * 100))
+
+        if regressions:
+            sys.exit(1)
+        print("no regressions beyond %.0f%%" % (args.tolerance * 100))
+
+
+if __name__ == "__main__":
+    main()
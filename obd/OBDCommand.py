@@ -35,7 +35,7 @@ from .protocols import ECU
 from .OBDResponse import OBDResponse
 
 
-class OBDCommand():
+class OBDCommand(object):
     def __init__(self,
                  name,
                  desc,
@@ -65,19 +65,44 @@ class OBDCommand():
                           self.supported)
 
     @property
-    def mode_int(self):
-        if len(self.command) >= 2:
-            return unhex(self.command[:2])
+    def command(self):
+        return self.__command
+
+    @command.setter
+    def command(self, command):
+        # parse the mode and PID here, rather than on every support check
+        self.__command = command
+        try:
+            self.__mode_pid = (self.__mode(command), self.__pid(command))
+        except ValueError:
+            self.__mode_pid = None # not hex (like ATRV)
+
+    @staticmethod
+    def __mode(command):
+        if len(command) >= 2:
+            return unhex(command[:2])
         else:
             return 0
 
-    @property
-    def pid_int(self):
-        if len(self.command) > 2:
-            return unhex(self.command[2:])
+    @staticmethod
+    def __pid(command):
+        if len(command) > 2:
+            return unhex(command[2:])
         else:
             return 0
 
+    @property
+    def mode_int(self):
+        if self.__mode_pid is None:
+            return self.__mode(self.command) # raises the ValueError
+        return self.__mode_pid[0]
+
+    @property
+    def pid_int(self):
+        if self.__mode_pid is None:
+            return self.__pid(self.command) # raises the ValueError
+        return self.__mode_pid[1]
+
     def __call__(self, messages):
 
         # filter for applicable messages (from the right ECU(s))
@@ -100,12 +125,12 @@ class OBDCommand():
     def __constrain_message_data(self, message):
         """ pads or chops the data field to the size specified by this command """
         if self.bytes > 0:
-            if len(message.data) > self.bytes:
+            if len(message.payload) > self.bytes:
                 # chop off the right side
-                message.data = message.data[:self.bytes]
+                message.payload = message.payload[:self.bytes]
             else:
                 # pad the right with zeros
-                message.data += ([0] * (self.bytes - len(message.data)))
+                message.payload += bytearray(self.bytes - len(message.payload))
 
 
     def __str__(self):
@@ -36,12 +36,66 @@
 #                                                                      #
 ########################################################################
 
+import sys
+import types
+import importlib
+
 from .__version__ import __version__
-from .obd import OBD
-from .async import Async
-from .commands import commands
-from .OBDCommand import OBDCommand
-from .OBDResponse import OBDResponse, Unit
-from .protocols import ECU
-from .utils import scanSerial, OBDStatus
-from .debug import debug
+
+
+# the package's exports, and the submodules they're imported from. Where
+# the interpreter allows it (3.7+, PEP 562), they are imported on first
+# use, so that `import obd` doesn't load the serial library, the
+# protocols and the command tables until they're needed.
+__exports__ = [
+    ("OBD",         ".obd"),
+    ("Async",       ".async"),
+    ("Overflow",    ".dispatch"),
+    ("OBDCommand",  ".OBDCommand"),
+    ("OBDResponse", ".OBDResponse"),
+    ("Unit",        ".OBDResponse"),
+    ("ECU",         ".protocols"),
+    ("scanSerial",  ".utils"),
+    ("probeSerial", ".utils"),
+    ("OBDStatus",   ".utils"),
+    ("commands",    ".commands"),
+    ("debug",       ".debug"),
+]
+
+__all__ = ["__version__"] + [ name for name, module in __exports__ ]
+
+
+def __getattr__(name):
+    """ imports an export on first use """
+    for export, module in __exports__:
+        if export == name:
+            value = getattr(importlib.import_module(module, __name__), name)
+            globals()[name] = value
+            return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+class _Package(types.ModuleType):
+    """
+        Importing a submodule binds it here, which would hide the exports
+        named after their submodules (commands, debug, OBDCommand and
+        OBDResponse), keep the exports instead
+    """
+
+    def __setattr__(self, name, value):
+        if isinstance(value, types.ModuleType) and (name in __all__):
+            value = getattr(value, name)
+        super(_Package, self).__setattr__(name, value)
+
+
+if sys.version_info >= (3, 7):
+    sys.modules[__name__].__class__ = _Package
+else:
+    # no module __getattr__, import everything now
+    for name, module in __exports__:
+        __getattr__(name)
+    del name, module
@@ -0,0 +1,429 @@
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)                   #
+#                                                                      #
+########################################################################
+#                                                                      #
+# aio.py                                                               #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+
+"""
+    asyncio-native counterparts to the ELM327 and OBD classes.
+
+    A single event loop can drive many adapters at once, since every port
+    is serviced by loop.add_reader() rather than by a blocking thread.
+
+    Requires Python 3.5+ (this module is not imported by obd/__init__.py)
+
+        import asyncio
+        import obd
+        from obd.aio import AsyncioOBD
+
+        async def main():
+            connection = AsyncioOBD("/dev/ttyUSB0")
+            await connection.connect()
+            r = await connection.query(obd.commands.RPM)
+
+        asyncio.get_event_loop().run_until_complete(main())
+"""
+
+import asyncio
+import serial
+from .elm327 import ELM327
+from .commands import commands
+from .OBDResponse import OBDResponse
+from .protocols import UnknownProtocol
+from .utils import OBDStatus
+from .connection import Connection
+from .debug import debug
+
+
+
+class AsyncioELM327(object):
+    """
+        Handles communication with the ELM327 adapter, without blocking.
+
+        After instantiation with a portname, `await connect()`.
+        The following functions then become available:
+
+            send_and_parse() (coroutine)
+            close()
+            status()
+            port_name()
+            protocol_name()
+            ecus()
+    """
+
+    def __init__(self, portname, baudrate=38400, timeout=3):
+        self.__portname = portname
+        self.__baudrate = baudrate
+        self.__timeout  = timeout # seconds to wait for the prompt character
+        self.__status   = OBDStatus.NOT_CONNECTED
+        self.__port     = None
+        self.__protocol = UnknownProtocol([])
+        self.__loop     = None
+        self.__lock     = None # serializes commands on this adapter
+        self.__buffer   = bytearray()
+        self.__pending  = None # future waiting for the next prompt
+
+
+    async def connect(self):
+        """ opens the port, and runs the same init sequence as ELM327 """
+
+        self.__loop = asyncio.get_event_loop()
+        self.__lock = asyncio.Lock()
+
+        # ------------- open port -------------
+        try:
+            debug("Opening serial port '%s'" % self.__portname)
+            self.__port = serial.Serial(self.__portname, \
+                                        baudrate = self.__baudrate, \
+                                        parity   = serial.PARITY_NONE, \
+                                        stopbits = 1, \
+                                        bytesize = 8, \
+                                        timeout  = 0) # non-blocking
+            self.__loop.add_reader(self.__port.fileno(), self.__on_readable)
+            debug("Serial port successfully opened on " + self.port_name())
+
+        except (serial.SerialException, OSError) as e:
+            self.__error(e)
+            return self.__status
+
+        # ---------------------------- ATZ (reset) ----------------------------
+        await self.__send("ATZ") # return data can be junk, so don't bother checking
+
+        # -------------------------- ATE0 (echo OFF) --------------------------
+        r = await self.__send("ATE0")
+        if not self.__has_message(r, "OK"):
+            self.__error("ATE0 did not return 'OK'")
+            return self.__status
+
+        # ------------------- ATH1, ATL0 (headers ON, linefeeds OFF) ----------
+        for cmd in ["ATH1", "ATL0"]:
+            r = await self.__send(cmd)
+            if r != ["OK"]:
+                self.__error("%s did not return 'OK'" % cmd)
+                return self.__status
+
+        # by now, we've successfuly communicated with the ELM, but not the car
+        self.__status = OBDStatus.ELM_CONNECTED
+
+        # try to communicate with the car, and load the correct protocol parser
+        if await self.load_protocol():
+            self.__status = OBDStatus.CAR_CONNECTED
+            debug("Connection successful")
+        else:
+            debug("Connected to the adapter, but failed to connect to the vehicle", True)
+
+        return self.__status
+
+
+    async def load_protocol(self):
+        """
+            Attempts communication with the car, using the ELM's auto
+            protocol mode first, then trying each protocol with `ATTP`
+        """
+
+        await self.__send("ATSP0")
+        r0100 = await self.__send("0100")
+
+        r = await self.__send("ATDPN")
+        if len(r) == 1:
+            # suppress any "automatic" prefix
+            p = r[0]
+            p = p[1:] if (len(p) > 1 and p.startswith("A")) else p
+
+            if p in ELM327._SUPPORTED_PROTOCOLS and p != "0":
+                self.__protocol = ELM327._SUPPORTED_PROTOCOLS[p](r0100)
+                return True
+
+        debug("ELM responded with unknown protocol. Trying them one-by-one")
+
+        for p in ELM327._TRY_PROTOCOL_ORDER:
+            await self.__send("ATTP%s" % p)
+            r0100 = await self.__send("0100")
+            if not self.__has_message(r0100, "UNABLE TO CONNECT"):
+                # success, found the protocol
+                self.__protocol = ELM327._SUPPORTED_PROTOCOLS[p](r0100)
+                return True
+
+        return False
+
+
+    def __has_message(self, lines, text):
+        for line in lines:
+            if text in line:
+                return True
+        return False
+
+
+    def __error(self, msg=None):
+        """ handles fatal failures, print debug info and closes serial """
+
+        self.close()
+
+        debug("Connection Error:", True)
+        if msg is not None:
+            debug('    ' + str(msg), True)
+
+
+    def port_name(self):
+        if self.__port is not None:
+            return self.__port.portstr
+        else:
+            return "No Port"
+
+
+    def status(self):
+        return self.__status
+
+
+    def ecus(self):
+        return self.__protocol.ecu_map.values()
+
+
+    def protocol_name(self):
+        return self.__protocol.ELM_NAME
+
+
+    def protocol_id(self):
+        return self.__protocol.ELM_ID
+
+
+    def close(self):
+        """
+            Resets the device, and sets all
+            attributes to unconnected states.
+        """
+
+        self.__status   = OBDStatus.NOT_CONNECTED
+        self.__protocol = None
+
+        if self.__port is not None:
+            self.__loop.remove_reader(self.__port.fileno())
+            self.__write("ATZ")
+            self.__port.close()
+            self.__port = None
+
+        if self.__pending is not None and not self.__pending.done():
+            self.__pending.cancel()
+
+
+    async def send_and_parse(self, cmd):
+        """
+            send() coroutine used to service all OBDCommands
+
+            Sends the given command string, and parses the
+            response lines with the protocol object.
+
+            Returns a list of Message objects
+        """
+
+        if self.__status == OBDStatus.NOT_CONNECTED:
+            debug("cannot send_and_parse() when unconnected", True)
+            return None
+
+        lines = await self.__send(cmd)
+        return self.__protocol(lines)
+
+
+    async def __send(self, cmd):
+        """
+            unprotected send() coroutine
+
+            writes the given string, and waits for the prompt character.
+            returns a list of line strings
+        """
+
+        async with self.__lock:
+            self.__pending = self.__loop.create_future()
+            self.__write(cmd)
+
+            try:
+                return await asyncio.wait_for(self.__pending, self.__timeout)
+            except asyncio.TimeoutError:
+                debug("Failed to read port, giving up")
+                return self.__lines()
+            finally:
+                self.__pending = None
+
+
+    def __write(self, cmd):
+        """
+            "low-level" function to write a string to the port
+        """
+
+        if self.__port:
+            cmd += "\r\n" # terminate
+            self.__buffer = bytearray() # dump everything in the input buffer
+            self.__port.write(cmd.encode())
+            if debug.enabled:
+                debug.log("write: %r", cmd)
+        else:
+            debug("cannot perform __write() when unconnected", True)
+
+
+    def __on_readable(self):
+        """
+            reader callback, invoked by the event loop whenever the port
+            has data. Resolves the pending send once the prompt arrives.
+        """
+
+        try:
+            data = self.__port.read(self.__port.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            self.__error(e)
+            return
+
+        if self.__pending is None or self.__pending.done():
+            return # nobody is listening, drop it
+
+        self.__buffer.extend(data)
+
+        # end on chevron (ELM prompt character)
+        prompt = self.__buffer.find(b'>')
+        if prompt >= 0:
+            del self.__buffer[prompt:]
+            self.__pending.set_result(self.__lines())
+
+
+    def __lines(self):
+        """ splits the accumulated buffer into a list of lines """
+
+        # skip null characters (ELM spec page 9)
+        buffer = self.__buffer.replace(b'\x00', b'')
+        self.__buffer = bytearray()
+
+        if debug.enabled:
+            debug.log("read: %r", bytes(buffer))
+
+        return [ s.strip() for s in buffer.decode().splitlines() if bool(s) ]
+
+
+
+class AsyncioOBD(Connection):
+    """
+        Class representing an OBD-II connection, driven by asyncio.
+        Every adapter gets its own AsyncioOBD, and they can all share
+        one event loop.
+    """
+
+    def __init__(self, portstr, baudrate=38400, fast=True):
+        Connection.__init__(self)
+        self.port = AsyncioELM327(portstr, baudrate)
+        self.fast = fast
+        self.__lock = None # serializes queries, from building the command string to noting it
+
+
+    async def connect(self):
+        """ connects to the adapter, and loads the car's supported commands """
+        debug("Connecting to %s" % self.port.port_name())
+        self.__lock = asyncio.Lock()
+        await self.port.connect()
+        await self.__load_commands()
+        return self.status()
+
+
+    async def __load_commands(self):
+        """
+            Queries for available PIDs, records their support in this
+            connection's bitmap, and compiles a list of command objects.
+        """
+
+        if self.status() != OBDStatus.CAR_CONNECTED:
+            debug("Cannot load commands: No connection to car", True)
+            return
+
+        debug("querying for supported PIDs (commands)...")
+        for get in commands.pid_getters():
+            # PID listing commands should sequentialy become supported
+            # Mode 1 PID 0 is assumed to always be supported
+            if not self.supports(get):
+                continue
+
+            response = await self.query(get, force=True)
+
+            if response.is_null():
+                continue
+
+            self._add_supported(get, response.value)
+
+        debug("finished querying with %d commands supported" % len(self.supported_commands))
+
+
+    def close(self):
+        """ Closes the connection, and clears supported_commands """
+        self._clear_supported()
+        self.port.close()
+
+
+    def status(self):
+        """ returns the OBD connection status """
+        return self.port.status()
+
+
+    def is_connected(self):
+        """ Returns a boolean for whether a connection with the car was made """
+        return self.status() == OBDStatus.CAR_CONNECTED
+
+
+    def protocol_name(self):
+        """ returns the name of the protocol being used by the ELM327 """
+        return self.port.protocol_name()
+
+
+    def port_name(self):
+        """ Returns the name of the currently connected port """
+        return self.port.port_name()
+
+
+    async def query(self, cmd, force=False):
+        """
+            primary API coroutine. Sends commands to the car, and
+            protects against sending unsupported commands.
+        """
+
+        if self.status() == OBDStatus.NOT_CONNECTED:
+            debug("Query failed, no connection available", True)
+            return OBDResponse()
+
+        if not self.supports(cmd) and not force:
+            debug("'%s' is not supported" % str(cmd), True)
+            return OBDResponse()
+
+        # send command and retrieve message
+        if debug.enabled:
+            debug.log("Sending command: %s", cmd)
+        # concurrent queries take turns, so that each one's command string
+        # is built against the command that was really sent before it
+        async with self.__lock:
+            cmd_string = self._build_command_string(cmd)
+            messages = await self.port.send_and_parse(cmd_string)
+            self._sent(cmd_string, cmd, messages)
+
+        if not messages:
+            debug("No valid OBD Messages returned", True)
+            return OBDResponse()
+
+        return cmd(messages) # compute a response object
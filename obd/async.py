@@ -32,6 +32,7 @@
 import time
 import threading
 from .OBDResponse import OBDResponse
+from .dispatch import CallbackDispatcher, Overflow
 from .debug import debug
 from . import OBD
 
@@ -41,32 +42,77 @@ class Async(OBD):
         Specialized for asynchronous value reporting.
     """
 
-    def __init__(self, portstr=None, baudrate=38400, protocol=None, fast=True):
-        super(Async, self).__init__(portstr, baudrate, protocol, fast)
+    def __init__(self, portstr=None, baudrate=38400, protocol=None, fast=True,
+                 cache=None, reset_timeout=5, compact=False, adaptive_timeout=False,
+                 negotiate_baud=False, instrument=False, callback_workers=0, callback_queue=64, overflow=Overflow.DROP_OLDEST):
+        super(Async, self).__init__(portstr, baudrate, protocol, fast,
+                                    cache, reset_timeout, compact, adaptive_timeout,
+                                    negotiate_baud, instrument)
         self.__commands    = {} # key = OBDCommand, value = Response
         self.__callbacks   = {} # key = OBDCommand, value = list of Functions
+        self.__schedule    = {} # key = OBDCommand, value = [deadline, period, priority, duration]
+        self.__lock        = threading.Lock() # guards changes to the watched commands
+        self.__wake        = threading.Event() # interrupts the loop's idle waits
+        self.__overloaded  = False
         self.__thread      = None
         self.__running     = False
         self.__was_running = False # used with __enter__() and __exit__()
 
+        # callbacks are fired inline, unless workers were requested
+        self.__dispatcher  = None
+        if callback_workers > 0:
+            self.__dispatcher = CallbackDispatcher(callback_workers, callback_queue, overflow)
+
 
     @property
     def running(self):
         return self.__running
 
 
+    @property
+    def dispatcher(self):
+        """ The CallbackDispatcher (with its counters), or None when callbacks fire inline """
+        return self.__dispatcher
+
+
+    @property
+    def load(self):
+        """
+            Fraction of the bus time needed to meet the requested periods,
+            based on the measured duration of each command. Values above
+            1.0 mean the requested rates can't all be met.
+
+            Commands without a period take turns with the overdue ones, so
+            they count as being sent once per shortest period, unless their
+            priority is below that of every command with a period.
+        """
+        schedule = list(self.__schedule.values())
+        periodic = [ e for e in schedule if e[1] > 0 ]
+        if not periodic:
+            return 0.0 # nothing was asked for but "as often as possible"
+
+        shortest = min([ e[1] for e in periodic ])
+        lowest   = min([ e[2] for e in periodic ])
+
+        load = 0.0
+        for deadline, period, priority, duration in schedule:
+            if period > 0:
+                load += duration / period
+            elif priority >= lowest:
+                load += duration / shortest
+        return load
+
+
     def start(self):
         """ Starts the async update loop """
         if not self.is_connected():
             debug("Async thread not started because no connection was made")
             return
 
-        if len(self.__commands) == 0:
-            debug("Async thread not started because no commands were registered")
-            return
-
         if self.__thread is None:
             debug("Starting async thread")
+            if self.__dispatcher is not None:
+                self.__dispatcher.start()
             self.__running = True
             self.__thread = threading.Thread(target=self.run)
             self.__thread.daemon = True
@@ -78,8 +124,11 @@ class Async(OBD):
         if self.__thread is not None:
             debug("Stopping async thread...")
             self.__running = False
+            self.__wake.set()
             self.__thread.join()
             self.__thread = None
+            if self.__dispatcher is not None:
+                self.__dispatcher.stop()
             debug("Async thread stopped")
 
 
@@ -121,21 +170,24 @@ class Async(OBD):
         super(Async, self).close()
 
 
-    def watch(self, c, callback=None, force=False):
+    def watch(self, c, callback=None, force=False, period=None, priority=None):
         """
             Subscribes the given command for continuous updating. Once subscribed,
             query() will return that command's latest value. Optional callbacks can
             be given, which will be fired upon every new value.
+
+            An optional period (in seconds) sets how often the command is sent.
+            When several commands are overdue, the one with the highest
+            priority goes first. Commands without a period are always due,
+            and are sent as often as the bus allows (so a high priority on
+            one of these will starve the others).
         """
 
-        # the dict shouldn't be changed while the daemon thread is iterating
-        if self.__running:
-            debug("Can't watch() while running, please use stop()", True)
-        else:
+        if not (self.supports(c) or force):
+            debug("'%s' is not supported" % str(c), True)
+            return
 
-            if not (self.supports(c) or force):
-                debug("'%s' is not supported" % str(c), True)
-                return
+        with self.__lock:
 
             # new command being watched, store the command
             if c not in self.__commands:
@@ -143,6 +195,19 @@ class Async(OBD):
                 self.__commands[c] = OBDResponse() # give it an initial value
                 self.__callbacks[c] = [] # create an empty list
 
+                # the update loop iterates the schedule without locking,
+                # so it's replaced with a new copy, never changed in place
+                schedule = dict(self.__schedule)
+                schedule[c] = [0.0, 0.0, 0, 0.0] # due immediately
+                self.__schedule = schedule
+                self.__wake.set()
+
+            # update the scheduling of the command, if given
+            if period is not None:
+                self.__schedule[c][1] = float(period)
+            if priority is not None:
+                self.__schedule[c][2] = priority
+
             # if a callback was given, push it
             if hasattr(callback, "__call__") and (callback not in self.__callbacks[c]):
                 debug("subscribing callback for command: %s" % str(c))
@@ -156,12 +221,9 @@ class Async(OBD):
             that command are dropped.
         """
 
-        # the dict shouldn't be changed while the daemon thread is iterating
-        if self.__running:
-            debug("Can't unwatch() while running, please use stop()", True)
-        else:
-            debug("Unwatching command: %s" % str(c))
+        debug("Unwatching command: %s" % str(c))
 
+        with self.__lock:
             if c in self.__commands:
                 # if a callback was specified, only remove the callback
                 if hasattr(callback, "__call__") and (callback in self.__callbacks[c]):
@@ -169,23 +231,30 @@ class Async(OBD):
 
                     # if no more callbacks are left, remove the command entirely
                     if len(self.__callbacks[c]) == 0:
-                        self.__commands.pop(c, None)
+                        self.__remove(c)
                 else:
                     # no callback was specified, pop everything
-                    self.__callbacks.pop(c, None)
-                    self.__commands.pop(c, None)
+                    self.__remove(c)
+
+
+    def __remove(self, c):
+        """ drops a command from the watch list (call with the lock held) """
+        self.__callbacks.pop(c, None)
+        self.__commands.pop(c, None)
+
+        schedule = dict(self.__schedule)
+        schedule.pop(c, None)
+        self.__schedule = schedule
 
 
     def unwatch_all(self):
         """ Unsubscribes all commands and callbacks from being updated """
 
-        # the dict shouldn't be changed while the daemon thread is iterating
-        if self.__running:
-            debug("Can't unwatch_all() while running, please use stop()", True)
-        else:
-            debug("Unwatching all")
+        debug("Unwatching all")
+        with self.__lock:
             self.__commands  = {}
             self.__callbacks = {}
+            self.__schedule  = {}
 
 
     def query(self, c):
@@ -194,10 +263,11 @@ class Async(OBD):
             Only commands that have been watch()ed will return valid responses
         """
 
-        if c in self.__commands:
-            return self.__commands[c]
-        else:
-            return OBDResponse()
+        with self.__lock:
+            if c in self.__commands:
+                return self.__commands[c]
+            else:
+                return OBDResponse()
 
 
     def run(self):
@@ -206,19 +276,81 @@ class Async(OBD):
         # loop until the stop signal is recieved
         while self.__running:
 
-            if len(self.__commands) > 0:
-                # loop over the requested commands, send, and collect the response
-                for c in self.__commands:
-
-                    # force, since commands are checked for support in watch()
-                    r = super(Async, self).query(c, force=True)
-
-                    # store the response
+            # work from a snapshot, so that commands can be
+            # watched and unwatched while the loop is running
+            schedule = self.__schedule
+
+            if len(schedule) > 0:
+
+                c = self.__next_command(schedule)
+                entry = schedule[c]
+
+                # nothing is due yet, wait (briefly, to stay responsive to stop())
+                wait = entry[0] - time.time()
+                if wait > 0:
+                    self.__idle(min(wait, 0.25))
+                    continue
+
+                # force, since commands are checked for support in watch()
+                start = time.time()
+                r = super(Async, self).query(c, force=True)
+                end = time.time()
+
+                # schedule the next run. If we've slipped by more than
+                # a period, start over from now, rather than catching up
+                entry[0] += entry[1]
+                if entry[0] <= start:
+                    entry[0] = start + entry[1]
+                # smoothed measure of how much bus time this command takes
+                entry[3] = (end - start) if entry[3] == 0 else (0.8 * entry[3]) + (0.2 * (end - start))
+                self.__check_load()
+
+                # store the response, unless the command was unwatched meanwhile
+                with self.__lock:
+                    if c not in self.__commands:
+                        continue
                     self.__commands[c] = r
+                    callbacks = list(self.__callbacks[c])
 
-                    # fire the callbacks, if there are any
-                    for callback in self.__callbacks[c]:
+                # fire the callbacks, if there are any
+                if self.__dispatcher is None:
+                    for callback in callbacks:
                         callback(r)
+                elif callbacks:
+                    self.__dispatcher.put(c, callbacks, r)
 
             else:
-                time.sleep(0.25) # idle
+                self.__idle(0.25)
+
+
+    def __idle(self, seconds):
+        """ sleeps, unless woken early by a newly watched command """
+        self.__wake.wait(seconds)
+        self.__wake.clear()
+
+
+    def __next_command(self, schedule):
+        """
+            Picks the command to send next. Amongst the overdue commands,
+            the highest priority goes first, then the most overdue. If none
+            are overdue, returns the one that comes due soonest.
+        """
+        now = time.time()
+        due = [c for c in schedule if schedule[c][0] <= now]
+
+        if due:
+            return min(due, key=lambda c: (-schedule[c][2], schedule[c][0]))
+        else:
+            return min(schedule, key=lambda c: schedule[c][0])
+
+
+    def __check_load(self):
+        """ reports when the requested periods exceed what the bus can deliver """
+        overloaded = self.load > 1.0
+
+        if overloaded and not self.__overloaded:
+            debug("Requested update rates need %d%% of the measured bus capacity" % (self.load * 100), True)
+        elif self.__overloaded and not overloaded:
+            debug("Requested update rates are within the bus capacity again")
+
+        self.__overloaded = overloaded
@@ -29,6 +29,7 @@
 #                                                                      #
 ########################################################################
 
+import threading
 from .protocols import ECU
 from .OBDCommand import OBDCommand
 from .decoders import *
@@ -151,14 +152,8 @@ __mode1__ = [
 ]
 
 
-# mode 2 is the same as mode 1, but returns values from when the DTC occured
-__mode2__ = []
-for c in __mode1__:
-    c = c.clone()
-    c.command = "02" + c.command[2:] # change the mode: 0100 ---> 0200
-    c.name = "DTC_" + c.name
-    c.desc = "DTC " + c.desc
-    __mode2__.append(c)
+# mode 2 is the same as mode 1, but returns values from when the DTC occured,
+# its table is cloned from mode 1's when the tables are assembled (see below)
 
 
 __mode3__ = [
@@ -184,31 +179,99 @@ __misc__ = [
 
 
 '''
-Assemble the command tables by mode, and allow access by name
+Assemble the command tables by mode, and index them
 '''
 
-class Commands():
-    def __init__(self):
-
-        # allow commands to be accessed by mode and PID
-        self.modes = [
-            [],
-            __mode1__,
-            __mode2__,
-            __mode3__,
-            __mode4__,
-            [],
-            [],
-            __mode7__
-        ]
-
-        # allow commands to be accessed by name
-        for m in self.modes:
-            for c in m:
-                self.__dict__[c.name] = c
+class Commands(object):
+    """
+        The tables are assembled on first use (the first lookup of a
+        command, or of `modes`), rather than when this module is imported.
+
+        Every command is indexed by name, by command string, and (when
+        its command string is hex) by mode and PID, so that each of the
+        has_*() checks is a single dict lookup. Custom commands can be
+        added to the indexes with register().
+    """
+
+    __lock = threading.Lock() # guards the first assembly of the tables
+
+    def __load(self):
+        """ assembles the command tables, once """
+
+        with self.__lock:
+            if "modes" in self.__dict__:
+                return
+
+            __mode2__ = []
+            for c in __mode1__:
+                c = c.clone()
+                c.command = "02" + c.command[2:] # change the mode: 0100 ---> 0200
+                c.name = "DTC_" + c.name
+                c.desc = "DTC " + c.desc
+                __mode2__.append(c)
+
+            # allow commands to be accessed by mode and PID
+            modes = [
+                [],
+                __mode1__,
+                __mode2__,
+                __mode3__,
+                __mode4__,
+                [],
+                [],
+                __mode7__
+            ]
+
+            # the indexes are filled before they're published, and modes
+            # goes last, so that other threads never see them half built
+            names    = {} # key = name, value = OBDCommand
+            commands = {} # key = command string, value = OBDCommand
+            pids     = {} # key = (mode, pid), value = OBDCommand
+            attrs    = {} # key = name, value = OBDCommand
+
+            for c in [ c for m in modes for c in m ] + __misc__:
+                self.__index(c, names, commands, pids, attrs)
+
+            self.__dict__.update(attrs)
+            self.__names    = names
+            self.__commands = commands
+            self.__pids     = pids
+            self.modes      = modes
+
+
+    @classmethod
+    def __index(cls, c, names, commands, pids, attrs):
+        """ adds a command to the indexes, and allows it to be accessed by name """
+
+        names[c.name] = c
+        commands[c.command] = c
+        attrs[c.name] = c
+
+        key = cls.__pid_key(c)
+        if key is not None:
+            pids[key] = c
+
+
+    @staticmethod
+    def __pid_key(c):
+        """ returns the (mode, pid) of a command, or None for non-hex commands (like ATRV) """
+        try:
+            return (c.mode_int, c.pid_int)
+        except ValueError:
+            return None
+
+
+    def __getattr__(self, name):
+        """
+            only called for attributes that aren't set: the tables and
+            indexes, before they're assembled
+        """
 
-        for c in __misc__:
-            self.__dict__[c.name] = c
+        if name.startswith("__") or ("modes" in self.__dict__):
+            raise AttributeError(name)
+
+        self.__load()
+        return getattr(self, name)
 
 
     def __getitem__(self, key):
@@ -218,12 +281,15 @@ class Commands():
             obd.commands.RPM
             obd.commands["RPM"]
             obd.commands[1][12] # mode 1, PID 12 (RPM)
+            obd.commands[1, 12] # mode 1, PID 12 (RPM), includes registered commands
         """
 
         if isinstance(key, int):
             return self.modes[key]
+        elif isinstance(key, tuple):
+            return self.__pids[key]
         elif isinstance(key, str) or isinstance(key, unicode):
-            return self.__dict__[key]
+            return self.__names[key]
         else:
             debug("OBD commands can only be retrieved by PID value or dict name", True)
 
@@ -241,6 +307,24 @@ class Commands():
         return self.has_name(s)
 
 
+    def register(self, c):
+        """
+            adds a custom command to the indexes, so that it can be
+            looked up (by name, and by mode/pid), and passes the has_*()
+            checks. Returns False if its name is already taken.
+        """
+        if not isinstance(c, OBDCommand):
+            debug("register() only accepts OBDCommand objects", True)
+            return False
+
+        if (c.name in self.__names) or hasattr(self, c.name):
+            debug("A command named '%s' already exists" % c.name, True)
+            return False
+
+        self.__index(c, self.__names, self.__commands, self.__pids, self.__dict__)
+        return True
+
+
     def pid_getters(self):
         """ returns a list of PID GET commands """
         getters = []
@@ -263,7 +347,7 @@ class Commands():
     def has_command(self, c):
         """ checks for existance of a command by OBDCommand object """
         if isinstance(c, OBDCommand):
-            return c in self.__dict__.values()
+            return c.command in self.__commands
         else:
             debug("has_command() only accepts OBDCommand objects", True)
             return False
@@ -272,7 +356,7 @@ class Commands():
     def has_name(self, s):
         """ checks for existance of a command by name """
         if isinstance(s, str) or isinstance(s, unicode):
-            return s.isupper() and (s in self.__dict__.keys())
+            return s in self.__names
         else:
             debug("has_name() only accepts string names for commands", True)
             return False
@@ -281,13 +365,7 @@ class Commands():
     def has_pid(self, mode, pid):
         """ checks for existance of a command by int mode and int pid """
         if isinstance(mode, int) and isinstance(pid, int):
-            if (mode < 0) or (pid < 0):
-                return False
-            if mode >= len(self.modes):
-                return False
-            if pid >= len(self.modes[mode]):
-                return False
-            return True
+            return (mode, pid) in self.__pids
         else:
             debug("has_pid() only accepts integer values for mode and PID", True)
             return False
@@ -0,0 +1,174 @@
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)                   #
+#                                                                      #
+########################################################################
+#                                                                      #
+# connection.py                                                        #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+from .commands import commands
+from .utils import BitSet
+from .debug import debug
+
+
+
+class Connection(object):
+    """
+        The bookkeeping shared by the OBD and AsyncioOBD classes: which
+        commands the car supports, and what to send for each command
+        (its learned response count, or the empty line that repeats it).
+
+        Subclasses provide the `port` and `fast` attributes.
+    """
+
+    # every Nth fast query re-checks its learned response count, using
+    # the total number of ECUs, in case another ECU has started answering
+    _RECOUNT_INTERVAL = 100
+
+
+    def __init__(self):
+        self.supported_commands = []
+        self.__supported = {} # key = mode, value = BitSet of the car's supported PIDs
+        self.__last_command = "" # used for repeating commands with an empty line
+        self.__counts = {} # key = command string, value = [learned response count, queries since recount]
+
+
+    def supports(self, cmd):
+        """
+            Returns a boolean for whether the given command
+            is supported by the car AND this library
+        """
+        if not commands.has_command(cmd):
+            return False
+        if cmd.supported: # always supported, like the first PID getter
+            return True
+        try:
+            supported = self.__supported.get(cmd.mode_int)
+            return (supported is not None) and (cmd.pid_int in supported)
+        except ValueError:
+            return False # not a mode/PID command (like ATRV)
+
+
+    def _add_supported(self, get, supported):
+        """
+            Records the PIDs that a PID getter reported (a BitSet, counted
+            from the getter's PID) in this connection's bitmap, and adds
+            their commands to supported_commands.
+        """
+
+        # the PIDs themselves, in the getter's mode
+        mode = get.mode_int
+        supported = supported << get.pid_int
+        self.__supported[mode] = self.__supported.get(mode, BitSet()) | supported
+
+        pid_getters = commands.pid_getters()
+        for pid in supported:
+            if commands.has_pid(mode, pid):
+                c = commands[mode, pid]
+
+                # don't add PID getters to the command list
+                if c not in pid_getters:
+                    self.supported_commands.append(c)
+
+
+    def _clear_supported(self):
+        """ forgets everything learned about the car """
+        self.supported_commands = []
+        self.__supported = {}
+        self.__last_command = ""
+        self.__counts = {}
+
+
+    def _build_command_string(self, cmd):
+        """ assembles the appropriate command string """
+        cmd_string = cmd.command
+
+        if self.fast and cmd.fast:
+            cmd_string += str(self.__response_count(cmd))
+
+        return self._repeat_string(cmd_string)
+
+
+    def _repeat_string(self, cmd_string):
+        """
+            returns the string to send for the given command string:
+            if we sent it last time, just send an empty line (the ELM
+            repeats the last command)
+
+            The command that was last sent must not change between
+            building a string and sending it, so callers that send
+            concurrently must hold a lock around both (and _sent()).
+        """
+        if self.fast and (cmd_string == self.__last_command):
+            return ""
+        return cmd_string
+
+
+    def _sent(self, cmd_string, cmd=None, messages=None):
+        """
+            notes a command string that was sent, and for fast commands,
+            how many ECUs answered it
+        """
+
+        # if we're sending a new command, note it
+        if cmd_string:
+            self.__last_command = cmd_string
+
+        if (cmd is not None) and self.fast and cmd.fast:
+            self.__learn_count(cmd, messages)
+
+
+    def __response_count(self, cmd):
+        """
+            returns the number of responses to wait for. Starts out as the
+            number of ECUs, and then uses what the command has returned before
+        """
+        ecus = len(self.port.ecus())
+        learned = self.__counts.get(cmd.command)
+
+        if learned is None:
+            return ecus
+
+        learned[1] += 1
+        if learned[1] >= self._RECOUNT_INTERVAL:
+            learned[1] = 0
+            return ecus
+
+        return learned[0]
+
+
+    def __learn_count(self, cmd, messages):
+        """ records how many ECUs answered a fast command """
+        count = len([ m for m in (messages or []) if m.parsed() ])
+
+        if count == 0:
+            # nobody answered (the ECU may be asleep), start over
+            self.__counts.pop(cmd.command, None)
+        elif cmd.command not in self.__counts:
+            self.__counts[cmd.command] = [count, 0]
+        elif count != self.__counts[cmd.command][0]:
+            debug.log("Response count for %s changed to %d", cmd.command, count)
+            self.__counts[cmd.command][0] = count
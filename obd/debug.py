@@ -29,18 +29,98 @@
 #                                                                      #
 ########################################################################
 
-class Debug():
+_DEBUG = 10 # logging.DEBUG (logging itself is only needed by whoever sets a logger)
+
+
+class Debug(object):
+    """
+        Receives status messages and errors, and passes them on to the
+        console (console = True), to a handler function (handler), and/or
+        to a stdlib logging.Logger (logger). Messages are logged at DEBUG,
+        and the ones that are always printed (forcePrint) at WARNING.
+
+        `enabled` is True when any of these outputs is on, counting the
+        logger only while it lets DEBUG records through (its level is
+        checked on every read, since it can change at any time).
+        Frequent messages are only built after checking it, so that
+        while debug output is off, they cost a single branch.
+    """
+
     def __init__(self):
-        self.console = False
-        self.handler = None
+        self.__console = False
+        self.__handler = None
+        self.__logger  = None
+        self.__outputs = False # whether the console or handler is on
+
+    @property
+    def enabled(self):
+        if self.__logger is None:
+            return self.__outputs
+        return self.__outputs or self.__logger.isEnabledFor(_DEBUG)
+
+    @property
+    def console(self):
+        return self.__console
+
+    @console.setter
+    def console(self, console):
+        self.__console = console
+        self.__update()
+
+    @property
+    def handler(self):
+        return self.__handler
+
+    @handler.setter
+    def handler(self, handler):
+        self.__handler = handler
+        self.__update()
+
+    @property
+    def logger(self):
+        return self.__logger
+
+    @logger.setter
+    def logger(self, logger):
+        self.__logger = logger
+        self.__update()
+
+    def __update(self):
+        self.__outputs = bool(self.__console) or hasattr(self.__handler, '__call__')
 
     def __call__(self, msg, forcePrint=False):
 
-        if self.console or forcePrint:
+        if self.__console or forcePrint:
             print("[obd] " + str(msg))
 
-        if hasattr(self.handler, '__call__'):
-            self.handler(msg)
+        if hasattr(self.__handler, '__call__'):
+            self.__handler(msg)
+
+        if self.__logger is not None:
+            if forcePrint:
+                self.__logger.warning(msg)
+            else:
+                self.__logger.debug(msg)
+
+    def log(self, msg, *args):
+        """
+            lazily formatted debug(): the message is only formatted
+            (msg % args) when an output is enabled, and a logger is
+            handed the arguments to format as it sees fit
+        """
+
+        if not self.enabled:
+            return
+
+        if self.__logger is not None:
+            self.__logger.debug(msg, *args)
+
+        if self.__console or hasattr(self.__handler, '__call__'):
+            msg = msg % args
+            if self.__console:
+                print("[obd] " + msg)
+            if hasattr(self.__handler, '__call__'):
+                self.__handler(msg)
 
 debug = Debug()
 
@@ -49,10 +49,11 @@ def <name>(_hex):
 def noop(messages):
     return (None, Unit.NONE)
 
-# hex in, bitstring out
+# hex in, BitSet out: N is a member when the getter's PID + N is supported
 def pid(messages):
-    d = messages[0].data
-    v = bytes_to_bits(d)
+    v = BitSet()
+    for m in messages: # any of the ECUs that answered
+        v |= BitSet.from_bytes(m.data)
     return (v, Unit.NONE)
 
 '''
@@ -388,8 +389,6 @@ def dtc(messages):
     for message in messages:
         d += message.data
 
-    print(bytes_to_hex(d))
-
     # look at data in pairs of bytes
     for n in range(0, len(d), 2):
 
@@ -398,10 +397,7 @@ def dtc(messages):
 
         if dtc is not None:
             # pull a description if we have one
-            if dtc in DTC:
-                desc = DTC[dtc]
-            else:
-                desc = "Unknown error code"
+            desc = DTC.get(dtc, "Unknown error code")
 
             codes.append( (dtc, desc) )
 
@@ -0,0 +1,151 @@
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)                   #
+#                                                                      #
+########################################################################
+#                                                                      #
+# dispatch.py                                                          #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+
+import threading
+from collections import deque
+from .debug import debug
+
+
+class Overflow:
+    """ Policies for when the callback queue is full """
+
+    DROP_OLDEST = "Drop Oldest" # discard the oldest queued event
+    COALESCE    = "Coalesce"    # keep only the latest event per command
+    BLOCK       = "Block"       # wait for the workers to catch up
+
+
+
+class CallbackDispatcher():
+    """
+        Fires Async callbacks from a pool of worker threads, so that slow
+        consumer code never holds up the update loop. Events wait in a
+        bounded queue, and the overflow policy decides what happens when
+        it fills up.
+
+        Counters:
+            dropped   - events discarded because the queue was full
+            coalesced - events replaced by a newer response for the same command
+    """
+
+    def __init__(self, workers=1, maxsize=64, overflow=Overflow.DROP_OLDEST):
+        self.workers   = workers
+        self.maxsize   = maxsize
+        self.overflow  = overflow
+        self.dropped   = 0
+        self.coalesced = 0
+
+        self.__queue   = deque() # items are [command, callbacks, response]
+        self.__queued  = {}      # key = OBDCommand, value = queued item (used to coalesce)
+        self.__cond    = threading.Condition()
+        self.__threads = []
+        self.__running = False
+
+
+    def start(self):
+        """ Starts the worker threads """
+        with self.__cond:
+            if self.__running:
+                return
+            self.__running = True
+
+        for i in range(self.workers):
+            t = threading.Thread(target=self.run)
+            t.daemon = True
+            t.start()
+            self.__threads.append(t)
+
+
+    def stop(self):
+        """ Stops the workers, once they've emptied the queue """
+        with self.__cond:
+            self.__running = False
+            self.__cond.notify_all()
+
+        for t in self.__threads:
+            t.join()
+        self.__threads = []
+
+
+    def pending(self):
+        """ returns the number of events waiting for a worker """
+        return len(self.__queue)
+
+
+    def put(self, c, callbacks, response):
+        """ queues a response, to be passed to the given callbacks """
+
+        with self.__cond:
+
+            if self.overflow == Overflow.COALESCE and c in self.__queued:
+                # an older response is still waiting, replace it
+                self.__queued[c][2] = response
+                self.coalesced += 1
+                return
+
+            if len(self.__queue) >= self.maxsize:
+                if self.overflow == Overflow.BLOCK:
+                    while self.__running and len(self.__queue) >= self.maxsize:
+                        self.__cond.wait(0.25)
+                else:
+                    # make room by dropping the oldest event
+                    old = self.__queue.popleft()
+                    self.__queued.pop(old[0], None)
+                    self.dropped += 1
+
+            item = [c, callbacks, response]
+            self.__queue.append(item)
+            if self.overflow == Overflow.COALESCE:
+                self.__queued[c] = item
+
+            self.__cond.notify_all()
+
+
+    def run(self):
+        """ Worker thread """
+
+        while True:
+            with self.__cond:
+                while self.__running and not self.__queue:
+                    self.__cond.wait(0.25)
+
+                if not self.__queue:
+                    return # stopped, and nothing left to do
+
+                item = self.__queue.popleft()
+                if self.__queued.get(item[0]) is item:
+                    self.__queued.pop(item[0])
+                c, callbacks, response = item
+                self.__cond.notify_all() # there's room for a blocked put()
+
+            for callback in callbacks:
+                try:
+                    callback(response)
+                except Exception as e:
+                    debug("Callback for '%s' raised: %s" % (str(c), repr(e)), True)
@@ -0,0 +1,128 @@
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)                   #
+#                                                                      #
+########################################################################
+#                                                                      #
+# dtc.py                                                               #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+########################################################################
+
+import mmap
+import threading
+
+try:
+    from collections.abc import Mapping
+except ImportError: # Python 2
+    from collections import Mapping
+
+
+class DTCIndex(Mapping):
+    """
+        Read-only mapping of DTCs ("P0133") to their descriptions, looked
+        up in a text file of sorted "CODE<tab>description" lines.
+
+        The file isn't read at import. On the first lookup it is memory
+        mapped, and each lookup is a binary search over the mapped bytes,
+        so only the pages that are touched are ever loaded.
+    """
+
+    def __init__(self, path):
+        self.path   = path
+        self.__map  = None
+        self.__lock = threading.Lock()
+
+
+    def __mapped(self):
+        if self.__map is None:
+            with self.__lock:
+                if self.__map is None:
+                    with open(self.path, "rb") as f:
+                        self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.__map
+
+
+    def __lookup(self, code):
+        """ returns the description of a code, or None """
+        try:
+            key = code.encode("ascii")
+        except (AttributeError, UnicodeError):
+            return None # not a string, or not a code
+
+        m = self.__mapped()
+        n = len(key)
+
+        lo, hi = 0, len(m)
+        while lo < hi:
+            # the line surrounding the midpoint
+            mid = (lo + hi) // 2
+            start = m.rfind(b"\n", 0, mid) + 1
+            end = m.find(b"\n", start)
+            if end < 0:
+                end = len(m)
+
+            line_key = m[start:start + n]
+            if line_key < key:
+                lo = end + 1
+            elif line_key > key:
+                hi = start
+            elif m[start + n:start + n + 1] == b"\t":
+                return _text(m[start + n + 1:end])
+            else:
+                lo = end + 1 # a longer code with the same prefix
+
+        return None
+
+
+    def __getitem__(self, code):
+        desc = self.__lookup(code)
+        if desc is None:
+            raise KeyError(code)
+        return desc
+
+
+    def __contains__(self, code):
+        return self.__lookup(code) is not None
+
+
+    def get(self, code, default=None):
+        desc = self.__lookup(code)
+        return default if desc is None else desc
+
+
+    def __iter__(self):
+        m = self.__mapped()
+        for line in m[:].splitlines():
+            if line:
+                yield _text(line.split(b"\t", 1)[0])
+
+
+    def __len__(self):
+        return len([ c for c in self ])
+
+
+
+def _text(b):
+    """ bytes from the file, as a native string """
+    return b if isinstance(b, str) else b.decode("utf-8")
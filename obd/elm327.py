@@ -29,14 +29,24 @@
 #                                                                      #
 ########################################################################
 
-import re
 import serial
 import time
 from .protocols import *
 from .utils import OBDStatus, numBitsSet
+from .profiles import fingerprint
+from .timing import TimeoutTuner, now_ns
 from .debug import debug
 
 
+def _booted(buffer, start=0):
+    """ whether a version banner (ELM or STN), then the prompt, show up in buffer at or after start """
+    for banner in [b"ELM", b"STN"]:
+        i = buffer.find(banner, start)
+        if (i >= 0) and (buffer.find(b">", i) >= 0):
+            return True
+    return False
+
+
 
 class ELM327:
     """
@@ -46,6 +56,7 @@ class ELM327:
         the following functions become available:
 
             send_and_parse()
+            monitor()
             close()
             status()
             port_name()
@@ -84,12 +95,68 @@ class ELM327:
     ]
 
 
-    def __init__(self, portname, baudrate, protocol):
-        """Initializes port by resetting device and gettings supported PIDs. """
+    # UART rates to try when negotiating, fastest first
+    _BAUD_RATES = [500000, 230400, 115200]
 
-        self.__status   = OBDStatus.NOT_CONNECTED
-        self.__port     = None
-        self.__protocol = UnknownProtocol([])
+    # how long a banner without a reset echo is given for the echo to follow
+    _ECHO_GRACE = 0.2
+
+    # in compact mode, the plain mode 01 commands in a row that turn headers
+    # off. Every switch costs a round trip, which the shorter answers need
+    # to win back, so commands that need headers keep them on while they
+    # are mixed in with plain ones.
+    _HEADERLESS_RUN = 8
+
+
+    def __init__(self, portname, baudrate, protocol, profiles=None, reset_timeout=5, compact=False, adaptive_timeout=False,
+                 negotiate_baud=False, instrument=False):
+        """
+            Initializes port by resetting device and gettings supported PIDs.
+
+            If a list of cached profiles (see profiles.py) is given, the
+            adapter is warm started, and the protocol of the most recent
+            profile is tried before searching.
+
+            reset_timeout is the longest (in seconds) that the adapter
+            is given to boot, before initialization carries on anyway.
+
+            In compact mode, spaces are turned off (ATS0), and if only one
+            ECU responds, headers are turned off (ATH0) while polling
+            plain mode 01 PIDs, to put fewer characters on the wire. Only
+            a run of such polls turns headers off (see _HEADERLESS_RUN).
+
+            With adaptive_timeout, the adapter's response timeout (ATST)
+            and adaptive timing mode (ATAT) are tuned to the measured
+            response latency of the vehicle's ECUs (see timing.py).
+
+            With negotiate_baud, the adapter's UART is switched to the
+            fastest rate in _BAUD_RATES that survives a round trip.
+
+            With instrument, send_and_parse() times each stage of the
+            exchange, see stages().
+        """
+
+        self.__status      = OBDStatus.NOT_CONNECTED
+        self.__port        = None
+        self.__protocol    = UnknownProtocol([])
+        self.__fingerprint = None # the vehicle's response to 0100
+        self.__profile     = None # the cached profile that matched, if any
+        self.__compact     = compact
+        self.__headerless  = False # whether headers may be turned off for mode 01
+        self.__headers     = True  # current header setting on the adapter
+        self.__plain_run   = 0     # plain mode 01 commands in a row, while headerless is allowed
+        self.__last_write  = ""    # last command written to the adapter
+        self.__last_cmd    = ""    # last command sent through send_and_parse()
+        self.__tuner       = TimeoutTuner() if adaptive_timeout else None
+        self.__responders  = {}    # key = command, value = most ECUs seen responding
+        self.__write_time  = None  # when the last command was written
+        self.__line_times  = {}    # key = line (spaces removed), value = seconds after writing
+        self.__stages      = {} if instrument else None # stage durations of the last exchange (ns)
+        self.__first_byte  = None  # when the first byte of the last answer arrived (ns)
+        self.__stats       = {
+            "boot_time" : None, # seconds between the reset command and the prompt
+            "baudrate"  : baudrate,
+        }
 
 
         # ------------- open port -------------
@@ -113,12 +180,22 @@ class ELM327:
 
         # ---------------------------- ATZ (reset) ----------------------------
         try:
-            self.__send("ATZ", delay=1) # wait 1 second for ELM to initialize
+            # nothing new to learn about the adapter, skip the full reset
+            cmd = "ATWS" if profiles else "ATZ"
+            self.__stats["boot_time"] = self.__reset(cmd, reset_timeout)
             # return data can be junk, so don't bother checking
         except serial.SerialException as e:
             self.__error(e)
             return
 
+        # ------------------------ ATBRD / STBR (baud) ------------------------
+        if negotiate_baud:
+            try:
+                self.__stats["baudrate"] = self.__negotiate_baud(reset_timeout)
+            except serial.SerialException as e:
+                self.__error(e)
+                return
+
         # -------------------------- ATE0 (echo OFF) --------------------------
         r = self.__send("ATE0")
         if not self.__isok(r, expectEcho=True):
@@ -137,9 +214,22 @@ class ELM327:
             self.__error("ATL0 did not return 'OK'")
             return
 
+        # ------------------------- ATS0 (spaces OFF) -------------------------
+        if compact:
+            r = self.__send("ATS0")
+            if not self.__isok(r):
+                self.__error("ATS0 did not return 'OK'")
+                return
+
         # by now, we've successfuly communicated with the ELM, but not the car
         self.__status = OBDStatus.ELM_CONNECTED
 
+        # -------------- ATSPn (protocol from the cached profile) --------------
+        if profiles and self.load_profile(profiles):
+            self.__connected()
+            debug("Connection successful (using cached profile)")
+            return
+
         # ---------------------- ATSP0 (protocol AUTO) -----------------------
         r = self.__send("ATSP0")
         if not self.__isok(r):
@@ -148,7 +238,7 @@ class ELM327:
 
         # try to communicate with the car, and load the correct protocol parser
         if self.load_protocol():
-            self.__status = OBDStatus.CAR_CONNECTED
+            self.__connected()
             debug("Connection successful")
         else:
             debug("Connected to the adapter, but failed to connect to the vehicle", True)
@@ -159,7 +249,8 @@ class ELM327:
         """
             Attempts communication with the car.
 
-            If no protocol is specified, then protocols at tried with `ATTP`
+            Uses the protocol found by the ELM's auto mode. If that protocol
+            isn't one we know, then protocols are tried one-by-one with `ATTP`
 
             Upon success, the appropriate protocol parser is loaded,
             and this function returns True
@@ -171,32 +262,20 @@ class ELM327:
         # -------------- 0100 (first command, SEARCH protocols) --------------
         r0100 = self.__send("0100")
 
-        print r0100 # remove this line later
-
         # ------------------- ATDPN (list protocol number) -------------------
         r = self.__send("ATDPN")
         if len(r) != 1:
             debug("Failed to retrieve current protocol", True)
             return False
 
-
         p = r[0] # grab the first (and only) line returned
         # suppress any "automatic" prefix
-        p = p[1:] if (len(p) > 1 and p.startswith("A")) else p[:-1]
-
-        if p not in self._SUPPORTED_PROTOCOLS:
-            self.__error("ELM responded with unknown protocol ")
-            return
-
-        # instantiate the correct protocol handler
-        self.__protocol = self._SUPPORTED_PROTOCOLS[p]()
-        #print p
         p = p[1:] if (len(p) > 1 and p.startswith("A")) else p
 
         # check if the protocol is something we know
-        if p in self._SUPPORTED_PROTOCOLS:
+        if self._SUPPORTED_PROTOCOLS.get(p) is not None:
             # jackpot, instantiate the corresponding protocol handler
-            self.__protocol = self._SUPPORTED_PROTOCOLS[p](r0100)
+            self.__set_protocol(p, r0100)
             return True
         else:
             # an unknown protocol
@@ -209,13 +288,156 @@ class ELM327:
                 r0100 = self.__send("0100")
                 if not self.__has_message(r0100, "UNABLE TO CONNECT"):
                     # success, found the protocol
-                    self.__protocol = self._SUPPORTED_PROTOCOLS[p](r0100)
+                    self.__set_protocol(p, r0100)
                     return True
 
         # if we've come this far, then we have failed...
         return False
 
 
+    def load_profile(self, profiles):
+        """
+            Attempts communication with the car, using the protocol of the
+            most recent cached profile. The 0100 response must match the
+            fingerprint (and ECU layout) of one of the profiles before it's
+            trusted.
+
+            Upon success, the appropriate protocol parser is loaded,
+            and this function returns True
+        """
+
+        p = profiles[0]["protocol"]
+        if self._SUPPORTED_PROTOCOLS.get(p) is None:
+            return False
+
+        r = self.__send("ATSP%s" % p)
+        if not self.__isok(r):
+            return False
+
+        r0100 = self.__send("0100")
+        f = fingerprint(r0100)
+
+        for profile in profiles:
+            if (profile["protocol"] == p) and (profile["fingerprint"] == f):
+                self.__set_protocol(p, r0100)
+
+                # make sure the ECUs were identified the same way
+                if sorted(self.ecu_map().items()) == sorted([tuple(e) for e in profile["ecu_map"]]):
+                    self.__profile = profile
+                    return True
+
+        debug("Vehicle didn't match any cached profile")
+        return False
+
+
+    def __negotiate_baud(self, reset_timeout):
+        """
+            switches the adapter (and the port) to the fastest UART rate
+            that works. Falls back to the current rate when none do.
+
+            returns the rate in use
+        """
+
+        current = self.__port.baudrate
+
+        # STN chips have their own command, taking the rate directly
+        r = self.__send("STI")
+        stn = any([ l.startswith("STN") for l in r ])
+
+        if stn:
+            self.__send("STBRT 500") # ms to wait for the host to switch
+        else:
+            self.__send("ATBRT 64") # x 5 ms, same as above
+
+        for rate in self._BAUD_RATES:
+            if rate <= current:
+                break
+
+            if stn:
+                cmd = "STBR %d" % rate
+            else:
+                # ELMs take a divisor of 4 MHz
+                cmd = "ATBRD %02X" % int(round(4000000.0 / rate))
+
+            if self.__switch_baud(cmd, rate, current, reset_timeout):
+                debug("Switched baud rate to %d" % rate)
+                return rate
+
+        debug("Failed to raise the baud rate, staying at %d" % current)
+        return current
+
+
+    def __switch_baud(self, cmd, rate, current, reset_timeout):
+        """
+            runs the baud switching handshake (ELM327 datasheet, "AT BRD"):
+
+                host sends the command  -> adapter answers "OK" at the old rate
+                host switches rates     -> adapter sends its ID at the new rate
+                host sends a CR         -> adapter answers "OK", and keeps the new rate
+
+            then verifies the new rate with a round trip. Returns success
+        """
+
+        self.__write(cmd)
+        r = self.__poll([b"OK", b">"], 1)
+        if (r is None) or (b"OK" not in r):
+            debug("Adapter refused %s" % cmd)
+            if (r is None) or (b">" not in r):
+                self.__poll([b">"], 1)
+            return False
+
+        self.__port.baudrate = rate
+
+        # the ID string may not arrive (or survive), the CR settles it
+        self.__poll([b"\r"], 0.1)
+        self.__port.write(b"\r")
+        r = self.__poll([b">"], 1)
+
+        if (r is not None) and (b"OK" in r):
+            # verify with a round trip at the new rate
+            lines = self.__send("ATI")
+            if any([ "ELM" in l for l in lines ]):
+                return True
+
+            # the adapter may be stuck at the new rate, so reset it from there
+            debug("Round trip failed at %d baud, resetting adapter" % rate, True)
+            self.__write("ATZ")
+
+        # the adapter falls back on its own if it never saw the CR
+        self.__port.baudrate = current
+        self.__poll([b">"], reset_timeout)
+        return False
+
+
+    def __connected(self):
+        """ marks the car as connected, and decides whether headers can be dropped """
+        self.__status = OBDStatus.CAR_CONNECTED
+
+        # without headers, responses can't be told apart, so only
+        # go headerless when there's a single ECU to hear from
+        self.__headerless = self.__compact and (len(self.__protocol.ecu_map) == 1)
+        if self.__headerless:
+            debug("Single ECU found, headers will be turned off for mode 01")
+
+
+    def __set_headers(self, on):
+        """ switches the adapter's headers on or off, if they aren't already """
+        if on == self.__headers:
+            return
+
+        r = self.__send("ATH1" if on else "ATH0")
+        if self.__isok(r):
+            self.__headers = on
+            self.__protocol.headers = on
+        else:
+            debug("Failed to switch headers %s" % ("on" if on else "off"), True)
+
+
+    def __set_protocol(self, p, lines_0100):
+        """ instantiates the protocol handler for the given protocol ID """
+        self.__protocol = self._SUPPORTED_PROTOCOLS[p](lines_0100)
+        self.__fingerprint = fingerprint(lines_0100)
+
 
     def __isok(self, lines, expectEcho=False):
         if not lines:
@@ -260,6 +482,37 @@ class ELM327:
         return self.__protocol.ecu_map.values()
 
 
+    def ecu_map(self):
+        """ returns a copy of the {tx_id: ECU} map """
+        return dict(self.__protocol.ecu_map)
+
+
+    def fingerprint(self):
+        """ returns the vehicle's fingerprint (see profiles.py), if connected """
+        return self.__fingerprint
+
+
+    def profile(self):
+        """ returns the cached profile used to connect, or None """
+        return self.__profile
+
+
+    def stats(self):
+        """ returns a dict of measurements taken on this connection """
+        stats = dict(self.__stats)
+        if self.__tuner is not None:
+            stats["timing"] = self.__tuner.stats()
+        return stats
+
+
+    def stages(self):
+        """
+            returns how long (in nanoseconds) each stage of the last
+            send_and_parse() took, or None when not instrumenting
+        """
+        return self.__stages
+
+
     def protocol_name(self):
         return self.__protocol.ELM_NAME
 
@@ -299,11 +552,164 @@ class ELM327:
             debug("cannot send_and_parse() when unconnected", True)
             return None
 
-        lines = self.__send(cmd)
+        # an empty command repeats the previous one
+        full_cmd = cmd or self.__last_cmd
+
+        # plain mode 01 requests (a single PID, optionally with a response
+        # count) are answered in a single frame, and can be read with or
+        # without headers. Everything else needs them.
+        if self.__headerless:
+            plain = full_cmd.startswith("01") and (len(full_cmd) in [4, 5])
+            self.__plain_run = (self.__plain_run + 1) if plain else 0
+            if not plain:
+                self.__set_headers(True)
+            elif self.__plain_run >= self._HEADERLESS_RUN:
+                self.__set_headers(False)
+
+        # the adapter can only repeat the command it was last sent
+        if (not cmd) and (self.__last_write != self.__last_cmd):
+            cmd = self.__last_cmd
+
+        self.__last_cmd = full_cmd
+
+        if self.__stages is None:
+            lines = self.__send(cmd)
+            messages = self.__protocol(lines)
+        else:
+            messages = self.__timed_send_and_parse(cmd)
+
+        if self.__tuner is not None:
+            self.__tune(full_cmd, messages)
+
+        return messages
+
+
+    def monitor(self, duration, cmd="ATMA"):
+        """
+            Passively reads the bus with the ELM's monitor mode (ATMA,
+            or a filtered ATMR/ATMT command), for `duration` seconds.
+
+            This is a generator of Message objects. Each message is
+            yielded as soon as the line that completes it arrives (see
+            ISOTPReassembler), rather than once the monitor has stopped.
+            Truncated and blank lines, which show up on a live bus, are
+            dropped. Only available on CAN protocols.
+
+            Monitoring is stopped by sending a character, once the
+            duration is up, or when the caller stops iterating.
+        """
+
+        if self.__status == OBDStatus.NOT_CONNECTED:
+            debug("cannot monitor() when unconnected", True)
+            return
+
+        if not hasattr(self.__protocol, "reassembler"):
+            debug("Monitoring requires a CAN protocol", True)
+            return
+
+        # frames can only be reassembled with their headers
+        self.__set_headers(True)
+
+        reassembler = self.__protocol.reassembler()
+        deadline = time.time() + duration
+        buffer = bytearray()
+        stopped = False
+
+        self.__write(cmd)
+        try:
+            while True:
+                ended = lambda b: (b'\r' in b) or (b'>' in b)
+                if not self.__fill(buffer, ended, deadline):
+                    break
+
+                # the adapter stops on its own when its buffer fills up
+                prompt = buffer.find(b'>')
+                end = buffer.find(b'\r')
+                if (end < 0) or (0 <= prompt < end):
+                    line = buffer[:prompt]
+                    stopped = True
+                else:
+                    line = buffer[:end]
+                    del buffer[:end + 1]
+
+                line = line.replace(b'\x00', b'').decode().strip()
+                for message in reassembler.feed(line):
+                    if message.tx_id is not None:
+                        yield message
+                    else:
+                        # status lines, like "BUFFER FULL"
+                        debug("monitor: %s" % message.frames[0].raw)
+
+                if stopped:
+                    debug("Monitoring stopped by the adapter")
+                    return
+        finally:
+            if not stopped:
+                self.__port.write(b"\r") # any character stops the monitor
+                self.__read() # up to the prompt
+
+        if reassembler.pending():
+            debug("Monitoring ended with %d incomplete messages" % len(reassembler.pending()))
+
+
+    def __timed_send_and_parse(self, cmd):
+        """ the same as __send() and parsing, but records the time spent in each stage """
+        start = now_ns()
+        self.__write(cmd)
+        written = now_ns()
+        self.__first_byte = None
+        lines = self.__read()
+        read = now_ns()
         messages = self.__protocol(lines)
+        parsed = now_ns()
+
+        first_byte = self.__first_byte or read # nothing arrived
+        self.__stages = {
+            "write" : written - start,
+            "wait"  : first_byte - written,
+            "read"  : read - first_byte,
+            "parse" : parsed - read,
+        }
         return messages
 
 
+    def __tune(self, cmd, messages):
+        """ feeds the timeout tuner, and reprograms the adapter when asked """
+
+        answered = [ m for m in messages if m.parsed() ]
+
+        for m in answered:
+            latency = self.__line_times.get(m.frames[0].raw)
+            if latency is not None:
+                self.__tuner.record(m.tx_id, latency)
+
+        # fewer ECUs than have answered before means someone was cut off
+        expected = self.__responders.get(cmd, 0)
+        if len(answered) < expected:
+            self.__tuner.miss()
+        elif answered:
+            self.__tuner.hit()
+        self.__responders[cmd] = max(expected, len(answered))
+
+        st, at = self.__tuner.st, self.__tuner.at
+        change = self.__tuner.update()
+        if change is None:
+            return
+
+        # only send the settings that changed
+        debug("Tuning response timeout to %d ms (ATAT%d)" % (change[0] * TimeoutTuner.UNIT * 1000, change[1]))
+        cmds = []
+        if change[0] != st:
+            cmds.append("ATST%02X" % change[0])
+        if change[1] != at:
+            cmds.append("ATAT%d" % change[1])
+
+        for cmd in cmds:
+            if not self.__isok(self.__send(cmd)):
+                debug("Failed to program the response timeout", True)
+                break
+
+
     def __send(self, cmd, delay=None):
         """
             unprotected send() function
@@ -322,17 +728,115 @@ class ELM327:
         return self.__read()
 
 
+    def __reset(self, cmd, timeout):
+        """
+            sends a reset command (ATZ or ATWS), and polls for the version
+            banner and then the prompt that the adapter prints once it has
+            booted, instead of sleeping for a fixed time. Gives up waiting
+            after `timeout` seconds.
+
+            A banner and prompt that arrive before the echo of the reset
+            can be left over from an earlier reset (like close()'s ATZ),
+            with the adapter about to reboot again for this one. They only
+            count when no echo follows (the adapter has echo turned off).
+
+            returns the boot time in seconds, or None if no prompt was seen
+        """
+
+        self.__write(cmd)
+
+        start = time.time()
+        deadline = start + timeout
+        buffer = bytearray()
+        echo = cmd.encode()
+
+        ready = None
+        booted = lambda b: (echo in b) or _booted(b)
+        if self.__fill(buffer, booted, deadline) and (echo not in buffer):
+            # the adapter was ready here, unless an echo follows, so the
+            # grace period isn't counted in the boot time
+            ready = time.time()
+            # an echo would follow right away, if this was an earlier boot
+            grace = min(deadline, ready + self._ECHO_GRACE)
+            self.__fill(buffer, lambda b: echo in b, grace)
+
+        if echo in buffer:
+            after = buffer.find(echo) + len(echo)
+            self.__fill(buffer, lambda b: _booted(b, after), deadline)
+            done = _booted(buffer, after)
+            ready = time.time()
+        else:
+            done = _booted(buffer)
+
+        if debug.enabled:
+            debug.log("read: %r", bytes(buffer))
+
+        if not done:
+            debug("No prompt within %.1f seconds of %s, continuing anyway" % (timeout, cmd), True)
+            return None
+
+        boot_time = ready - start
+        debug("adapter ready after %.3f seconds" % boot_time)
+        return boot_time
+
+
+    def __poll(self, tokens, timeout):
+        """
+            reads until any of the given byte strings shows up, for at most
+            `timeout` seconds. Unlike __read(), this doesn't need a prompt.
+
+            returns the bytes read, or None if no token was seen
+        """
+
+        buffer = bytearray()
+        found = self.__fill(buffer, lambda b: any([ t in b for t in tokens ]), time.time() + timeout)
+
+        if debug.enabled:
+            debug.log("read: %r", bytes(buffer))
+        return bytes(buffer) if found else None
+
+
+    def __fill(self, buffer, done, deadline):
+        """
+            reads into the buffer until done(buffer) is true, or the
+            deadline (a time.time()) passes. Returns whether it's done
+        """
+
+        port_timeout = self.__port.timeout
+
+        try:
+            while not done(buffer):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+
+                waiting = self.__port.inWaiting()
+                if not waiting:
+                    # block for the next character, but not beyond the deadline
+                    self.__port.timeout = remaining
+                buffer.extend(self.__port.read(waiting or 1))
+        finally:
+            self.__port.timeout = port_timeout
+
+        return True
+
+
     def __write(self, cmd):
         """
             "low-level" function to write a string to the port
         """
 
         if self.__port:
+            if cmd:
+                self.__last_write = cmd
+            if self.__tuner is not None:
+                self.__write_time = time.time()
             cmd += "\r\n" # terminate
             self.__port.flushInput() # dump everything in the input buffer
             self.__port.write(cmd.encode()) # turn the string into bytes and write
             self.__port.flush() # wait for the output buffer to finish transmitting
-            debug("write: " + repr(cmd))
+            if debug.enabled:
+                debug.log("write: %r", cmd)
         else:
             debug("cannot perform __write() when unconnected", True)
 
@@ -346,14 +850,17 @@ class ELM327:
         """
 
         attempts = 2
-        buffer = b''
+        buffer = bytearray()
+        arrivals = [] # when each line terminator arrived (only when tuning)
 
         if self.__port:
             while True:
-                c = self.__port.read(1)
+                # grab everything the port has already buffered in one call,
+                # or block (up to the port timeout) for the next character
+                data = self.__port.read(self.__port.inWaiting() or 1)
 
                 # if nothing was recieved
-                if not c:
+                if not data:
 
                     if attempts <= 0:
                         debug("Failed to read port, giving up")
@@ -363,20 +870,29 @@ class ELM327:
                     attempts -= 1
                     continue
 
-                # end on chevron (ELM prompt character)
-                if c == b'>':
-                    break
+                if (self.__stages is not None) and not buffer:
+                    self.__first_byte = now_ns()
 
-                # skip null characters (ELM spec page 9)
-                if c == b'\x00':
-                    continue
+                buffer.extend(data)
+
+                if self.__tuner is not None:
+                    arrivals += [time.time()] * data.count(b'\r')
 
-                buffer += c # whatever is left must be part of the response
+                # end on chevron (ELM prompt character)
+                # anything after the prompt is discarded
+                prompt = buffer.find(b'>')
+                if prompt >= 0:
+                    del buffer[prompt:]
+                    break
         else:
             debug("cannot perform __read() when unconnected", True)
             return ""
 
-        debug("read: " + repr(buffer))
+        # skip null characters (ELM spec page 9)
+        buffer = buffer.replace(b'\x00', b'')
+
+        if debug.enabled:
+            debug.log("read: %r", bytes(buffer))
 
         # convert bytes into a standard string
         raw = buffer.decode()
@@ -384,6 +900,21 @@ class ELM327:
         # splits into lines
         # removes empty lines
         # removes trailing spaces
-        lines = [ s.strip() for s in re.split("[\r\n]", raw) if bool(s) ]
+        lines = [ s.strip() for s in raw.splitlines() if bool(s) ]
+
+        if self.__tuner is not None:
+            self.__time_lines(raw, arrivals)
 
         return lines
+
+
+    def __time_lines(self, raw, arrivals):
+        """ records how long after the last write each line finished arriving """
+        self.__line_times = {}
+        if self.__write_time is None:
+            return
+
+        now = time.time()
+        for i, line in enumerate(raw.split("\r")):
+            t = arrivals[i] if i < len(arrivals) else now
+            self.__line_times[line.strip().replace(" ", "")] = t - self.__write_time
@@ -0,0 +1,638 @@
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)                   #
+#                                                                      #
+########################################################################
+#                                                                      #
+# emulator.py                                                          #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+
+"""
+    An emulated ELM327 adapter and vehicle, served on a pseudo-terminal,
+    so that OBD and Async can be tested and benchmarked end to end
+    without any hardware. Linux (and other POSIX systems) only.
+
+        from obd.emulator import Emulator
+
+        with Emulator(protocol="6") as emulator:
+            connection = obd.OBD(emulator.port_name)
+
+    Or, from a shell, to point other programs at it:
+
+        $ python -m obd.emulator --protocol 6 --baudrate 38400
+"""
+
+import os
+import pty
+import sys
+import time
+import tty
+import select
+import threading
+
+
+class VirtualECU(object):
+    """
+        An ECU on the emulated vehicle's bus.
+
+        responses maps requests (ex: "010C") to the data bytes of the
+        answer in hex, without the mode and PID bytes (ex: "1AF8"). For
+        modes 03 and 07, the value is the list of DTC bytes, and the DTC
+        count is added for the protocols that need one.
+
+        Mode 01 PID support bitmaps (0100, 0120, ...) are generated from
+        the mode 01 responses, unless they're given explicitly.
+
+        latency is the time (seconds) that the ECU takes to answer.
+    """
+
+    def __init__(self, address, responses, latency=0.0):
+        self.address   = address # tx address on 29 bit CAN and legacy buses (0x10 = engine)
+        self.latency   = latency
+        self.responses = {}
+
+        for request, data in responses.items():
+            self.responses[request.upper()] = data.replace(" ", "").upper()
+
+        self.__fill_pid_support()
+
+
+    def __fill_pid_support(self):
+        pids = [ int(r[2:], 16) for r in self.responses if r.startswith("01") and len(r) == 4 ]
+        highest = max(pids) if pids else 0
+
+        base = 0x00
+        while True:
+            getter = "01%02X" % base
+            if getter not in self.responses:
+                bits = 0
+                for pid in pids:
+                    if base < pid <= base + 0x20:
+                        bits |= 1 << (0x20 - (pid - base))
+                if highest > base + 0x20:
+                    bits |= 1 # the next getter is supported
+                self.responses[getter] = "%08X" % bits
+
+            base += 0x20
+            if (highest <= base) or (base > 0xE0):
+                break
+
+
+    def respond(self, request):
+        """
+            returns the payload of the answer as a list of bytes, the way
+            ISO 15765 carries it (ex: [0x41, 0x0C, 0x1A, 0xF8]), or None
+        """
+
+        mode = int(request[:2], 16)
+
+        # multi-PID mode 01 requests are answered with the supported subset
+        if (mode == 0x01) and (len(request) > 4):
+            payload = [0x41]
+            for i in range(2, len(request), 2):
+                pid = request[i:i+2]
+                if "01" + pid in self.responses:
+                    payload += [int(pid, 16)] + _unhex(self.responses["01" + pid])
+            return payload if len(payload) > 1 else None
+
+        if request not in self.responses:
+            return None
+
+        data = _unhex(self.responses[request])
+
+        if mode in [0x03, 0x07]:
+            return [0x40 | mode, len(data) // 2] + data
+        else:
+            return [0x40 | b for b in _unhex(request[:2])] + _unhex(request[2:]) + data
+
+
+
+def default_ecus():
+    """ an engine and a transmission, with a handful of typical values """
+    return [
+        VirtualECU(0x10, {
+            "0101" : "00076500", # status
+            "0104" : "80",       # engine load
+            "0105" : "7B",       # coolant temp, 83 C
+            "010B" : "65",       # intake pressure
+            "010C" : "1AF8",     # RPM, 1726
+            "010D" : "32",       # speed, 50 kph
+            "010F" : "46",       # intake temp
+            "0110" : "0210",     # MAF
+            "0111" : "40",       # throttle position
+            "011F" : "0123",     # run time
+            "0121" : "0000",     # distance with MIL
+            "03"   : "01330171", # P0133, P0171
+            "04"   : "",
+            "07"   : "",
+        }),
+        VirtualECU(0x18, {
+            "010D" : "32",       # speed, 50 kph
+            "03"   : "",
+        }, latency=0.002),
+    ]
+
+
+
+class Emulator(threading.Thread):
+    """
+        Serves an emulated ELM327, and the vehicle behind it, on the master
+        side of a pty. Connect to port_name as if it were a serial port.
+
+        protocol      - ELM protocol ID of the vehicle's bus ("1" through "9")
+        ecus          - list of VirtualECUs, default_ecus() when None
+        baudrate      - when given, characters take as long to move as on
+                        a UART of this rate (10 bits each), in both directions
+        boot_time     - seconds that ATZ takes
+        timeout_scale - scales the response timeout (ATST) waited out when the
+                        number of responses isn't known, to speed up tests
+        stn           - answer STI, and accept STBR, like an STN chip
+    """
+
+    ELM_VERSION = "ELM327 v1.5"
+
+    # seconds between the frames replayed on the bus while monitoring (ATMA)
+    MONITOR_INTERVAL = 0.002
+
+    PROTOCOL_NAMES = {
+        "1" : "SAE J1850 PWM",
+        "2" : "SAE J1850 VPW",
+        "3" : "ISO 9141-2",
+        "4" : "ISO 14230-4 (KWP 5BAUD)",
+        "5" : "ISO 14230-4 (KWP FAST)",
+        "6" : "ISO 15765-4 (CAN 11/500)",
+        "7" : "ISO 15765-4 (CAN 29/500)",
+        "8" : "ISO 15765-4 (CAN 11/250)",
+        "9" : "ISO 15765-4 (CAN 29/250)",
+    }
+
+    def __init__(self, protocol="6", ecus=None, baudrate=None, boot_time=0.0,
+                 timeout_scale=1.0, stn=False):
+        super(Emulator, self).__init__()
+        self.daemon = True
+
+        if protocol not in self.PROTOCOL_NAMES:
+            raise ValueError("Unsupported protocol '%s'" % protocol)
+
+        self.protocol      = protocol
+        self.ecus          = default_ecus() if ecus is None else ecus
+        self.baudrate      = baudrate
+        self.boot_time     = boot_time
+        self.timeout_scale = timeout_scale
+        self.stn           = stn
+        self.written       = [] # every command received, in order
+
+        self.__master, self.__slave = pty.openpty()
+        tty.setraw(self.__slave)
+        self.port_name = os.ttyname(self.__slave)
+
+        self.__running = True
+        self.__last    = ""   # the command an empty line repeats
+        self.__baud    = None # pending (rate, deadline) of a baud switch
+        self.__reset()
+
+
+    def __reset(self):
+        """ restores the power-on settings """
+        self.__echo      = True
+        self.__headers   = False
+        self.__linefeeds = True
+        self.__spaces    = True
+        self.__timeout   = 0x32 # x 4.096 ms
+        self.__setting   = "0"  # ATSP setting, "0" = automatic
+        self.__auto      = True
+        self.__found     = None # the protocol found by the automatic search
+        self.__baud_wait = 0x0F # x 5 ms, for the host to confirm a baud switch
+
+
+    # ------------------------------ plumbing ------------------------------
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+    def stop(self):
+        """ stops serving, and closes the pty """
+        self.__running = False
+        if self.is_alive():
+            self.join()
+        for fd in [self.__master, self.__slave]:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+    def run(self):
+        buffer = b""
+        while self.__running:
+            # a pending baud switch falls back when the host never confirms it
+            if (self.__baud is not None) and (time.time() > self.__baud[1]):
+                self.__baud = None
+                self.__write(self.__eol() + ">")
+
+            r, w, x = select.select([self.__master], [], [], 0.05)
+            if not r:
+                continue
+
+            try:
+                data = os.read(self.__master, 1024)
+            except OSError:
+                return
+
+            self.__transfer(len(data))
+            buffer += data
+
+            while b"\r" in buffer:
+                line, buffer = buffer.split(b"\r", 1)
+                self.__handle(line.decode("ascii", "replace").strip())
+
+
+    def __transfer(self, n):
+        """ waits out the time a UART takes to move n characters """
+        if self.baudrate:
+            time.sleep(n * 10.0 / self.baudrate)
+
+
+    def __write(self, text):
+        data = text.encode("ascii")
+        self.__transfer(len(data))
+        os.write(self.__master, data)
+
+
+    def __eol(self):
+        return "\r\n" if self.__linefeeds else "\r"
+
+
+    def __hex(self, values):
+        """ formats bytes the way the adapter prints them """
+        if self.__spaces:
+            return "".join([ "%02X " % v for v in values ])
+        else:
+            return "".join([ "%02X" % v for v in values ])
+
+
+    # ------------------------------ commands ------------------------------
+
+    def __handle(self, raw):
+        self.written.append(raw)
+
+        if self.__baud is not None:
+            # the host's CR confirms a baud switch
+            rate, deadline = self.__baud
+            self.__baud = None
+            if raw == "":
+                if self.baudrate:
+                    self.baudrate = rate
+                self.__write("OK" + self.__eol() + self.__eol() + ">")
+                return
+
+        if self.__echo:
+            self.__write(raw + "\r")
+
+        cmd = raw.replace(" ", "").upper()
+
+        # an empty line repeats the last command
+        if cmd == "":
+            cmd = self.__last
+        else:
+            self.__last = cmd
+
+        if cmd.startswith("AT"):
+            lines = self.__at(cmd[2:])
+        elif cmd.startswith("ST"):
+            lines = self.__st(cmd[2:])
+        elif cmd and _is_hex(cmd):
+            lines = self.__obd(cmd)
+        else:
+            lines = ["?"]
+
+        if lines is None:
+            return # the command finishes on its own (baud switching)
+
+        out = "".join([ l + self.__eol() for l in lines ])
+        self.__write(out + self.__eol() + ">")
+
+
+    def __at(self, cmd):
+        if cmd in ["Z", "WS"]:
+            time.sleep(self.boot_time if cmd == "Z" else self.boot_time / 4)
+            self.__reset()
+            return ["", self.ELM_VERSION]
+        elif cmd == "D":
+            self.__reset()
+        elif cmd == "I":
+            return [self.ELM_VERSION]
+        elif cmd == "@1":
+            return ["OBDII to RS232 Interpreter"]
+        elif cmd == "RV":
+            return ["12.6V"]
+        elif cmd in ["E0", "E1"]:
+            self.__echo = (cmd == "E1")
+        elif cmd in ["H0", "H1"]:
+            self.__headers = (cmd == "H1")
+        elif cmd in ["L0", "L1"]:
+            self.__linefeeds = (cmd == "L1")
+        elif cmd in ["S0", "S1"]:
+            self.__spaces = (cmd == "S1")
+        elif cmd[:2] in ["SP", "TP"] and len(cmd) in [3, 4]:
+            p = cmd[2:]
+            self.__auto = p.startswith("A") or (p == "0")
+            self.__setting = p[-1]
+            self.__found = None
+        elif cmd == "DPN":
+            p = self.__found or self.__setting
+            return [("A" if self.__auto else "") + p]
+        elif cmd == "DP":
+            p = self.__found or self.__setting
+            name = self.PROTOCOL_NAMES.get(p, "")
+            return [("AUTO, " if self.__auto else "") + name if name else "AUTO"]
+        elif cmd.startswith("ST") and len(cmd) == 4 and _is_hex(cmd[2:]):
+            self.__timeout = int(cmd[2:], 16) or 0x32
+        elif cmd in ["AT0", "AT1", "AT2"]:
+            pass # adaptive timing isn't emulated
+        elif cmd == "MA":
+            self.__monitor()
+            return None
+        elif cmd.startswith("BRT") and _is_hex(cmd[3:]):
+            self.__baud_wait = int(cmd[3:], 16)
+        elif cmd.startswith("BRD") and _is_hex(cmd[3:]) and cmd[3:]:
+            divisor = int(cmd[3:], 16)
+            if divisor < 8:
+                return ["?"]
+            self.__switch_baud(4000000.0 / divisor, self.__baud_wait * 0.005)
+            return None
+        else:
+            return ["?"]
+
+        return ["OK"]
+
+
+    def __st(self, cmd):
+        if not self.stn:
+            return ["?"]
+        if cmd == "I":
+            return ["STN1110 v4.2.1"]
+        elif cmd.startswith("BRT"):
+            self.__baud_wait = int(cmd[3:]) / 5.0
+            return ["OK"]
+        elif cmd.startswith("BR"):
+            self.__switch_baud(int(cmd[2:]), self.__baud_wait * 0.005)
+            return None
+        return ["?"]
+
+
+    def __switch_baud(self, rate, wait):
+        """ answers OK, then waits for the host's CR at the new rate """
+        self.__write("OK" + self.__eol())
+        self.__write(self.ELM_VERSION + self.__eol())
+        self.__baud = (rate, time.time() + wait)
+
+
+    # ------------------------------ vehicle -------------------------------
+
+    def __monitor(self):
+        """
+            replays every answer the ECUs know on the bus, frame by frame
+            (interleaving the ECUs), until the host sends a character
+        """
+        streams = []
+        for i, ecu in enumerate(self.ecus):
+            frames = []
+            for request in sorted(ecu.responses):
+                payload = ecu.respond(request)
+                if payload is not None:
+                    frames += self.__frames(i, ecu, payload)
+            if frames:
+                streams.append(frames)
+
+        n = 0
+        while self.__running and streams:
+            r, w, x = select.select([self.__master], [], [], self.MONITOR_INTERVAL)
+            if r:
+                os.read(self.__master, 1024) # the character is discarded
+                break
+
+            frames = streams[n % len(streams)]
+            self.__write(frames[(n // len(streams)) % len(frames)] + self.__eol())
+            n += 1
+
+        self.__write(self.__eol() + ">")
+
+    def __obd(self, cmd):
+        start = time.time()
+        lines = []
+
+        # a trailing digit is the number of responses to wait for
+        count = None
+        if len(cmd) % 2 == 1:
+            count = int(cmd[-1], 16)
+            cmd = cmd[:-1]
+
+        if len(cmd) < 2:
+            return ["?"]
+
+        # find the bus
+        if self.__found is None:
+            if self.__auto:
+                lines.append("SEARCHING...")
+            elif self.__setting != self.protocol:
+                return lines + ["UNABLE TO CONNECT"]
+            self.__found = self.protocol
+
+        # the bus only carries one protocol
+        if self.__found != self.protocol:
+            return lines + ["UNABLE TO CONNECT"]
+
+        answers = []
+        for i, ecu in enumerate(self.ecus):
+            payload = ecu.respond(cmd)
+            if payload is not None:
+                answers.append((ecu.latency, i, ecu, payload))
+        answers.sort(key=lambda a: (a[0], a[1]))
+
+        if lines:
+            self.__write("".join([ l + self.__eol() for l in lines ]))
+            lines = []
+
+        # stream each ECU's answer once it's "ready"
+        for n, (latency, i, ecu, payload) in enumerate(answers):
+            wait = start + latency - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            self.__write("".join([ l + self.__eol() for l in self.__frames(i, ecu, payload) ]))
+
+            if (count is not None) and (n + 1 >= count):
+                return lines
+
+        # without enough answers, the adapter waits out its timeout
+        time.sleep(self.__timeout * 0.004096 * self.timeout_scale)
+
+        if not answers:
+            return ["NO DATA"]
+        return lines
+
+
+    def __frames(self, index, ecu, payload):
+        if self.protocol in ["6", "7", "8", "9"]:
+            return self.__can_frames(index, ecu, payload)
+        else:
+            return self.__legacy_frames(ecu, payload)
+
+
+    def __can_frames(self, index, ecu, payload):
+        # split the payload ISO-TP style
+        if len(payload) <= 7:
+            frames = [ [len(payload)] + payload ]
+        else:
+            frames = [ [0x10 | (len(payload) >> 8), len(payload) & 0xFF] + payload[:6] ]
+            data = payload[6:]
+            seq = 1
+            while data:
+                chunk = data[:7]
+                data = data[7:]
+                frames.append([0x20 | (seq & 0x0F)] + chunk + ([0x00] * (7 - len(chunk))))
+                seq += 1
+
+        if self.__headers:
+            if self.protocol in ["6", "8"]:
+                header = "%03X" % (0x7E8 + index) + (" " if self.__spaces else "")
+            else:
+                header = self.__hex([0x18, 0xDA, 0xF1, ecu.address])
+            return [ (header + self.__hex(f)).strip() for f in frames ]
+
+        # without headers, the PCI bytes are hidden too
+        if len(frames) == 1:
+            return [ self.__hex(payload).strip() ]
+
+        lines = [ "%03X" % len(payload) ]
+        remaining = len(payload)
+        for i, f in enumerate(frames):
+            data = f[2:] if i == 0 else f[1:]
+            data = data[:remaining]
+            remaining -= len(data)
+            lines.append(("%X:" % (i & 0x0F)) + (" " if self.__spaces else "") + self.__hex(data).strip())
+        return lines
+
+
+    def __legacy_frames(self, ecu, payload):
+        mode = payload[0]
+
+        if mode in [0x43, 0x47]:
+            # DTCs, three per frame, without a count
+            dtcs = payload[2:]
+            frames = []
+            while True:
+                chunk = dtcs[:6]
+                dtcs = dtcs[6:]
+                frames.append([mode] + chunk + ([0x00] * (6 - len(chunk))))
+                if not dtcs:
+                    break
+        elif len(payload) <= 7:
+            frames = [payload]
+        else:
+            # longer answers are sent in numbered frames of four bytes
+            data = payload[2:]
+            frames = []
+            for i in range(0, len(data), 4):
+                chunk = data[i:i+4]
+                frames.append(payload[:2] + [i // 4 + 1] + chunk + ([0x00] * (4 - len(chunk))))
+
+        lines = []
+        for f in frames:
+            if not self.__headers:
+                lines.append(self.__hex(f).strip())
+                continue
+
+            if self.protocol == "1":
+                header = [0x41, 0x6B, ecu.address]
+            elif self.protocol in ["2", "3"]:
+                header = [0x48, 0x6B, ecu.address]
+            else:
+                header = [0x80 | len(f), 0xF1, ecu.address]
+
+            raw = header + f
+            if self.protocol in ["1", "2"]:
+                raw.append(_crc8(raw))
+            else:
+                raw.append(sum(raw) & 0xFF)
+
+            lines.append(self.__hex(raw).strip())
+
+        return lines
+
+
+
+def _unhex(h):
+    return [ int(h[i:i+2], 16) for i in range(0, len(h), 2) ]
+
+
+def _is_hex(s):
+    return all([ c in "0123456789ABCDEF" for c in s ])
+
+
+def _crc8(data):
+    """ the SAE J1850 CRC """
+    crc = 0xFF
+    for b in data:
+        crc ^= b
+        for i in range(8):
+            crc = ((crc << 1) ^ 0x1D) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc ^ 0xFF
+
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serves an emulated ELM327 and vehicle on a pty")
+    parser.add_argument("--protocol", default="6", help="ELM protocol ID of the vehicle (1-9)")
+    parser.add_argument("--baudrate", type=int, default=None, help="emulate the speed of a UART")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds each ECU takes to answer")
+    args = parser.parse_args(argv)
+
+    ecus = default_ecus()
+    for ecu in ecus:
+        ecu.latency += args.latency
+
+    emulator = Emulator(args.protocol, ecus, args.baudrate)
+    emulator.start()
+    print("Emulating %s on %s" % (emulator.PROTOCOL_NAMES[args.protocol], emulator.port_name))
+
+    try:
+        while emulator.is_alive():
+            emulator.join(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -35,22 +35,42 @@ from .__version__ import __version__
 from .elm327 import ELM327
 from .commands import commands
 from .OBDResponse import OBDResponse
-from .utils import scanSerial, OBDStatus
+from .protocols.protocol import Message
+from .protocols.protocol_can import CANProtocol
+from .utils import scanSerial, probeSerial, OBDStatus, BitSet, ascii_to_bytes, bytes_to_hex
+from .connection import Connection
+from .profiles import ProfileCache
+from .timing import QueryProfiler, now_ns
 from .debug import debug
 
 
 
-class OBD(object):
+class OBD(Connection):
     """
         Class representing an OBD-II connection
         with it's assorted commands/sensors.
     """
 
-    def __init__(self, portstr=None, baudrate=38400, protocol=None, fast=True):
+    # CAN protocols on which mode 01 requests can carry several PIDs
+    _MULTI_PID_PROTOCOLS = ["6", "7", "8", "9"]
+    _MAX_PIDS_PER_REQUEST = 6
+
+
+    def __init__(self, portstr=None, baudrate=38400, protocol=None, fast=True,
+                 cache=None, reset_timeout=5, compact=False, adaptive_timeout=False,
+                 negotiate_baud=False, instrument=False):
+        Connection.__init__(self)
         self.port = None
-        self.supported_commands = []
         self.fast = fast
-        self.__last_command = "" # used for 
+        self.reset_timeout = reset_timeout # upper bound on the adapter's boot time
+        self.compact = compact # spaces (and when possible, headers) off
+        self.adaptive_timeout = adaptive_timeout # tune ATST/ATAT to the vehicle
+        self.negotiate_baud = negotiate_baud # raise the adapter's UART rate
+        self.instrument = instrument # time each stage of every query
+        self.__profiler = QueryProfiler() if instrument else None
+
+        # optional store of connection profiles (a path to a JSON file)
+        self.__cache = ProfileCache(cache) if cache is not None else None
 
         debug("========================== python-OBD (v%s) ==========================" % __version__)
         self.__connect(portstr, baudrate, protocol) # initialize by connecting and loading sensors
@@ -64,81 +84,115 @@ class OBD(object):
         """
 
         if portstr is None:
-            debug("Using scanSerial to select port")
-            portnames = scanSerial()
+            debug("Probing serial ports for ELM327 adapters")
+            portnames = [ port for port, latency in probeSerial(baudrate=baudrate) ]
+
+            if not portnames:
+                # adapters that don't answer ATI might still work, try them the old way
+                debug("No adapters answered a probe, using scanSerial to select port")
+                portnames = scanSerial()
+
             debug("Available ports: " + str(portnames))
 
             if not portnames:
                 debug("No OBD-II adapters found", True)
                 return
 
+            # ports are ordered fastest first
             for port in portnames:
                 debug("Attempting to use port: " + str(port))
-                self.port = ELM327(port, baudrate, protocol)
+                self.port = self.__open(port, baudrate, protocol)
 
-                if self.port.status >= OBDStatus.ELM_CONNECTED:
+                if self.port.status() != OBDStatus.NOT_CONNECTED:
                     break # success! stop searching for serial
         else:
             debug("Explicit port defined")
-            self.port = ELM327(portstr, baudrate, protocol)
+            self.port = self.__open(portstr, baudrate, protocol)
 
         # if the connection failed, close it
-        if self.port.status == OBDStatus.NOT_CONNECTED:
+        if self.port.status() == OBDStatus.NOT_CONNECTED:
             # the ELM327 class will report its own errors
-            self.close()
+            # (only the base close(), subclasses may not be initialized yet)
+            OBD.close(self)
+
+
+    def __open(self, port, baudrate, protocol):
+        """ instantiates an ELM327 on the given port, with this connection's options """
+        return ELM327(port, baudrate, protocol,
+                      profiles         = self.__profiles(port),
+                      reset_timeout    = self.reset_timeout,
+                      compact          = self.compact,
+                      adaptive_timeout = self.adaptive_timeout,
+                      negotiate_baud   = self.negotiate_baud,
+                      instrument       = self.instrument)
+
+
+    def __profiles(self, port):
+        """ returns the cached profiles for a port (if caching is enabled) """
+        if self.__cache is None:
+            return None
+        return self.__cache.lookup(port)
 
 
     def __load_commands(self):
         """
-            Queries for available PIDs, sets their support status,
-            and compiles a list of command objects.
+            Queries for available PIDs, records their support in this
+            connection's bitmap, and compiles a list of command objects.
+
+            When connected with a cached profile, the PID bitmaps
+            are read from the profile instead.
         """
 
         if self.status() != OBDStatus.CAR_CONNECTED:
             debug("Cannot load commands: No connection to car", True)
             return
 
+        profile = self.port.profile()
+        cached = profile["pids"] if profile is not None else None
+        pids = {} # key = PID getter command string, value = hex bitmap
+
         debug("querying for supported PIDs (commands)...")
-        pid_getters = commands.pid_getters()
-        for get in pid_getters:
+        for get in commands.pid_getters():
             # PID listing commands should sequentialy become supported
             # Mode 1 PID 0 is assumed to always be supported
             if not self.supports(get):
                 continue
 
-            # when querying, only use the blocking OBD.query()
-            # prevents problems when query is redefined in a subclass (like Async)
-            response = OBD.query(self, get, force=True) # ask nicely
-
-            if response.is_null():
-                continue
-            
-            supported = response.value # string of binary 01010101010101
-
-            # loop through PIDs binary
-            for i in range(len(supported)):
-                if supported[i] == "1":
+            if cached is not None:
+                if get.command not in cached:
+                    continue
+                supported = BitSet.from_bytes(ascii_to_bytes(cached[get.command]))
+            else:
+                # when querying, only use the blocking OBD.query()
+                # prevents problems when query is redefined in a subclass (like Async)
+                response = OBD.query(self, get, force=True) # ask nicely
 
-                    mode = get.mode_int
-                    pid  = get.pid_int + i + 1
+                if response.is_null():
+                    continue
 
-                    if commands.has_pid(mode, pid):
-                        c = commands[mode][pid]
-                        c.supported = True
+                supported = response.value # BitSet of PIDs, counted from the getter's
 
-                        # don't add PID getters to the command list
-                        if c not in pid_getters:
-                            self.supported_commands.append(c)
+            pids[get.command] = bytes_to_hex(supported.to_bytes(4)).upper()
+            self._add_supported(get, supported)
 
         debug("finished querying with %d commands supported" % len(self.supported_commands))
 
+        # remember this vehicle, for next time
+        if (self.__cache is not None) and (cached is None):
+            self.__cache.store(self.port.port_name(), {
+                "protocol"    : self.port.protocol_id(),
+                "fingerprint" : self.port.fingerprint(),
+                "ecu_map"     : sorted(self.port.ecu_map().items()),
+                "pids"        : pids,
+            })
+
 
     def close(self):
         """
             Closes the connection, and clears supported_commands
         """
 
-        self.supported_commands = []
+        self._clear_supported()
 
         if self.port is not None:
             debug("Closing connection")
@@ -180,6 +234,17 @@ class OBD(object):
             return self.port.protocol_id()
 
 
+    def stats(self):
+        """ returns a dict of measurements taken on the connection """
+        if self.port is None:
+            return {}
+
+        stats = self.port.stats()
+        if self.__profiler is not None:
+            stats["queries"] = self.__profiler.stats()
+        return stats
+
+
     def get_port_name(self):
         # TODO: deprecated, remove later
         print("OBD.get_port_name() is deprecated, use OBD.port_name() instead")
@@ -213,14 +278,6 @@ class OBD(object):
             print(str(c))
 
 
-    def supports(self, cmd):
-        """
-            Returns a boolean for whether the given command
-            is supported by the car AND this library
-        """
-        return commands.has_command(cmd) and cmd.supported
-
-
     def query(self, cmd, force=False):
         """
             primary API function. Sends commands to the car, and
@@ -237,30 +294,148 @@ class OBD(object):
 
 
         # send command and retrieve message
-        debug("Sending command: %s" % str(cmd))
-        cmd_string = self.__build_command_string(cmd)
+        if debug.enabled:
+            debug.log("Sending command: %s", cmd)
+        cmd_string = self._build_command_string(cmd)
         messages = self.port.send_and_parse(cmd_string)
-
-        # if we're sending a new command, note it
-        if cmd_string:
-            self.__last_command = cmd_string
+        self._sent(cmd_string, cmd, messages)
 
         if not messages:
             debug("No valid OBD Messages returned", True)
+            if self.__profiler is not None:
+                self.__profiler.record(cmd.name, self.port.stages())
             return OBDResponse()
 
-        return cmd(messages) # compute a response object
+        if self.__profiler is None:
+            return cmd(messages) # compute a response object
+
+        start = now_ns()
+        r = cmd(messages)
+        stages = dict(self.port.stages(), decode=now_ns() - start)
+        self.__profiler.record(cmd.name, stages)
+        return r
 
 
-    def __build_command_string(self, cmd):
-        """ assembles the appropriate command string """
-        cmd_string = cmd.command
+    def query_many(self, cmds, force=False):
+        """
+            Sends a list of commands, and returns a list of OBDResponses
+            (in the same order). On CAN protocols, mode 01 commands are
+            packed up to six PIDs per request (ex: "010C0D05"), and the
+            reply is split back out, command by command.
+        """
+
+        responses = [None] * len(cmds)
+
+        if self.status() == OBDStatus.NOT_CONNECTED:
+            debug("Query failed, no connection available", True)
+            return [OBDResponse() for c in cmds]
+
+        # sort out the commands that can share a request
+        # batch[pid] = command
+        batch = {}
+        pids = [] # in the order they were given
+        for c in cmds:
+            if self.__can_batch(c) and (self.supports(c) or force):
+                if c.pid_int not in batch:
+                    pids.append(c.pid_int)
+                batch[c.pid_int] = c
+
+        for i in range(0, len(pids), self._MAX_PIDS_PER_REQUEST):
+            group = pids[i:i + self._MAX_PIDS_PER_REQUEST]
+
+            if len(group) == 1:
+                continue # a lone command is sent normally, below
+
+            for pid, r in self.__query_group(group, batch).items():
+                for n, c in enumerate(cmds):
+                    if c == batch[pid]:
+                        responses[n] = r
+
+        # everything else goes out one-by-one
+        # (uses the blocking OBD.query(), like __load_commands())
+        for n, c in enumerate(cmds):
+            if responses[n] is None:
+                responses[n] = OBD.query(self, c, force)
+
+        return responses
+
 
-        if self.fast and cmd.fast:
-            cmd_string += str(len(self.port.ecus()))
+    def __can_batch(self, cmd):
+        """ boolean for whether a command may share a multi-PID request """
+        return (self.port.protocol_id() in self._MULTI_PID_PROTOCOLS) and \
+               (cmd.mode_int == 1) and \
+               (len(cmd.command) == 4) and \
+               (cmd.bytes > 0)
 
-        # if we sent this last time, just send 
-        if self.fast and (cmd_string == self.__last_command):
-            cmd_string = ""
 
-        return cmd_string
+    def __query_group(self, pids, batch):
+        """
+            sends a single multi-PID request for the given list of PIDs
+            returns a dict of {pid: OBDResponse}
+        """
+
+        group = dict((pid, batch[pid]) for pid in pids)
+        cmd_string = "01" + "".join(["%02X" % pid for pid in pids])
+        debug.log("Sending multi-PID command: %s", cmd_string)
+
+        # response counts don't apply to multi-PID requests,
+        # but a repeated request can still be re-triggered
+        cmd_string = self._repeat_string(cmd_string)
+        messages = self.port.send_and_parse(cmd_string)
+        self._sent(cmd_string)
+
+        # split every ECU's reply into one message per PID
+        # split[pid] = [Message, Message, ...]
+        split = dict((pid, []) for pid in group)
+        for message in (messages or []):
+            if message.parsed():
+                for pid, m in self.__split_message(message, group).items():
+                    split[pid].append(m)
+
+        responses = {}
+        for pid, c in group.items():
+            if split[pid]:
+                responses[pid] = c(split[pid]) # compute a response object
+            else:
+                responses[pid] = OBDResponse()
+
+        return responses
+
+
+    def __split_message(self, message, group):
+        """
+            Splits one ECU's reply to a multi-PID request into a Message
+            per PID, using each command's byte count. Returns {pid: Message}
+        """
+
+        # The CAN parser strips the mode byte along with the *first* PID,
+        # which isn't necessarily the first one requested (ECUs skip PIDs
+        # they don't support). So read it back from the opening frame:
+        #
+        #   single frame: [PCI] 41 PID ...
+        #   first frame:  [PCI  L] 41 PID ...
+        opener = [f for f in message.frames if f.type != CANProtocol.FRAME_TYPE_CF]
+        if not opener:
+            return {}
+
+        offset = 2 if opener[0].type == CANProtocol.FRAME_TYPE_SF else 3
+        data = opener[0].payload[offset:offset + 1] + message.payload
+
+        split = {}
+        i = 0
+        while i < len(data):
+            pid = data[i]
+
+            # without the command, there's no telling how long its data is
+            if pid not in group:
+                debug.log("Dropping unrequested PID %02X in multi-PID response", pid)
+                break
+
+            m = Message(message.frames)
+            m.ecu = message.ecu
+            m.payload = data[i + 1:i + 1 + group[pid].bytes]
+            split[pid] = m
+
+            i += 1 + group[pid].bytes
+
+        return split
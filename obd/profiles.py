@@ -0,0 +1,122 @@
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)                   #
+#                                                                      #
+########################################################################
+#                                                                      #
+# profiles.py                                                          #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+
+import os
+import json
+import time
+from .utils import isHex
+from .debug import debug
+
+
+def fingerprint(lines_0100):
+    """
+        Identifies a vehicle by its response to 0100. Every ECU reports
+        its own supported PIDs, so this is stable for a vehicle, and
+        differs between most makes and models.
+
+        Only the hex lines count: status lines like "SEARCHING..." (sent
+        while ATSP0 searches, but not once ATSPn sets the protocol) or
+        "BUS INIT: ...OK" depend on how the adapter was set up, not on
+        the vehicle.
+    """
+    lines = [ l.replace(' ', '') for l in lines_0100 ]
+    return "|".join(sorted([ l for l in lines if l and isHex(l) ]))
+
+
+
+class ProfileCache():
+    """
+        Persistent store of connection profiles, so that reconnecting to a
+        vehicle we've already seen can skip the protocol search and the
+        supported PID discovery.
+
+        Profiles are kept in a JSON file, keyed by port name, then by the
+        vehicle's fingerprint. Each profile is a dict of:
+
+            protocol    - ELM protocol ID ("6", "A", etc...)
+            fingerprint - see fingerprint()
+            ecu_map     - list of [tx_id, ECU] pairs
+            pids        - {PID getter command: 32 bit support bitmap, in hex}
+            time        - when the profile was last stored
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+
+
+    def __load(self):
+        if not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            debug("Ignoring unreadable profile cache '%s': %s" % (self.path, str(e)), True)
+            return {}
+
+
+    def lookup(self, port):
+        """ returns a list of the profiles stored for a port, most recent first """
+        profiles = list(self.__load().get(port, {}).values())
+        return sorted(profiles, key=lambda p: p.get("time", 0), reverse=True)
+
+
+    def store(self, port, profile):
+        """ saves (or replaces) a profile for a port """
+        profiles = self.__load()
+
+        profile = dict(profile)
+        profile["time"] = time.time()
+        profiles.setdefault(port, {})[profile["fingerprint"]] = profile
+
+        # write to a temporary file, and move it into place,
+        # so that a crash can't leave a half-written cache behind
+        tmp = self.path + ".tmp"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            with open(tmp, "w") as f:
+                json.dump(profiles, f, indent=1, sort_keys=True)
+            os.rename(tmp, self.path)
+            debug("Stored connection profile for '%s'" % port)
+        except (IOError, OSError) as e:
+            debug("Failed to store connection profile: %s" % str(e), True)
+
+
+    def forget(self, port=None):
+        """ drops the profiles for a port, or every profile when no port is given """
+        profiles = self.__load() if port is not None else {}
+        profiles.pop(port, None)
+
+        with open(self.path, "w") as f:
+            json.dump(profiles, f, indent=1, sort_keys=True)
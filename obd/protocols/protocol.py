@@ -29,7 +29,7 @@
 #                                                                      #
 ########################################################################
 
-from obd.utils import ascii_to_bytes, isHex, numBitsSet
+from obd.utils import hex_line_to_bytes, numBitsSet
 from obd.debug import debug
 
 
@@ -53,10 +53,23 @@ class ECU:
 
 
 class Frame(object):
-    """ represents a single parsed line of OBD output """
-    def __init__(self, raw):
+    """
+        represents a single parsed line of OBD output
+
+        The bytes are kept in bytearrays (which index to ints on both
+        Python 2 and 3). The data attribute is the payload as a list of
+        ints: it's converted once, on first use, and then replaces the
+        bytearray, so edits to it stick. The decoded line (raw_bytes)
+        is released once the frame is parsed.
+    """
+
+    __slots__ = ("raw", "raw_bytes", "payload", "priority", "addr_mode",
+                 "rx_id", "tx_id", "type", "seq_index", "data_len")
+
+    def __init__(self, raw, raw_bytes=None):
         self.raw       = raw
-        self.data      = []
+        self.raw_bytes = raw_bytes if raw_bytes is not None else bytearray() # raw, decoded from hex
+        self.payload   = bytearray() # the frame's data
         self.priority  = None
         self.addr_mode = None
         self.rx_id     = None
@@ -65,13 +78,40 @@ class Frame(object):
         self.seq_index = 0 # only used when type = CF
         self.data_len  = None
 
+    @property
+    def data(self):
+        if not isinstance(self.payload, list):
+            self.payload = list(self.payload)
+        return self.payload
+
+    @data.setter
+    def data(self, data):
+        self.payload = list(data)
+
 
 class Message(object):
-    """ represents a fully parsed OBD message of one or more Frames (lines) """
+    """
+        represents a fully parsed OBD message of one or more Frames (lines)
+
+        Like Frame, the data attribute is the payload as a list of ints.
+    """
+
+    __slots__ = ("frames", "ecu", "payload")
+
     def __init__(self, frames):
-        self.frames = frames
-        self.ecu    = ECU.UNKNOWN
-        self.data   = []
+        self.frames  = frames
+        self.ecu     = ECU.UNKNOWN
+        self.payload = bytearray() # the message's data
+
+    @property
+    def data(self):
+        if not isinstance(self.payload, list):
+            self.payload = list(self.payload)
+        return self.payload
+
+    @data.setter
+    def data(self, data):
+        self.payload = list(data)
 
     @property
     def tx_id(self):
@@ -82,7 +122,7 @@ class Message(object):
 
     def parsed(self):
         """ boolean for whether this message was successfully parsed """
-        return bool(self.data)
+        return bool(self.payload)
 
     def __eq__(self, other):
         if isinstance(other, Message):
@@ -129,6 +169,9 @@ class Protocol(object):
         # for example: self.TX_ID_ENGINE : ECU.ENGINE
         self.ecu_map = {}
 
+        # whether the adapter is printing headers (see parse_headerless())
+        self.headers = True
+
         # parse the 0100 data into messages
         # NOTE: at this point, their "ecu" property will be UNKNOWN
         messages = self(lines_0100)
@@ -149,30 +192,37 @@ class Protocol(object):
 
         # Non-hex (non-OBD) lines shouldn't go through the big parsers,
         # since they are typically messages such as: "NO DATA", "CAN ERROR",
-        # "UNABLE TO CONNECT", etc, so sort them into these two lists:
-        obd_lines = []
+        # "UNABLE TO CONNECT", etc. Each line is decoded from hex and sorted
+        # in the same pass, into frames, and the lines that aren't hex:
+        obd_frames = []
         non_obd_lines = []
 
         for line in lines:
 
-            line_no_spaces = line.replace(' ', '')
+            raw_bytes = hex_line_to_bytes(line)
 
-            if isHex(line_no_spaces):
-                obd_lines.append(line_no_spaces)
+            if raw_bytes is not None:
+                obd_frames.append(Frame(line.replace(' ', ''), raw_bytes))
             else:
                 non_obd_lines.append(line) # pass the original, un-scrubbed line
 
         # ---------------------- handle valid OBD lines ----------------------
 
+        if not self.headers:
+            messages = self.parse_headerless(obd_frames)
+            for line in non_obd_lines:
+                messages.append( Message([ Frame(line) ]) )
+            return messages
+
         # parse each frame (each line)
         frames = []
-        for line in obd_lines:
-
-            frame = Frame(line)
+        for frame in obd_frames:
 
             # subclass function to parse the lines into Frames
             # drop frames that couldn't be parsed
+            # (the decoded line isn't needed after parsing, don't hold on to it)
             if self.parse_frame(frame):
+                frame.raw_bytes = None
                 frames.append(frame)
 
 
@@ -209,6 +259,40 @@ class Protocol(object):
         return messages
 
 
+    def parse_headerless(self, frames):
+        """
+            Parses lines printed with headers off (ATH0). Every protocol
+            then prints the same thing: the Mode, PID and data bytes of a
+            single frame response, without PCI bytes or checksums.
+
+            Headers are only turned off when a single ECU responds, so
+            every line is credited to that ECU.
+
+            Ex.
+            [    Data     ]
+            41 0C 1A F8
+        """
+
+        tx_id = list(self.ecu_map.keys())[0] if len(self.ecu_map) == 1 else None
+
+        messages = []
+        for frame in frames:
+            frame.payload = frame.raw_bytes
+            frame.tx_id = tx_id
+
+            if len(frame.payload) < 2:
+                debug("Dropped headerless frame for being too short")
+                continue
+
+            # skip the Mode and PID bytes
+            message = Message([frame])
+            message.payload = frame.payload[2:]
+            message.ecu = self.lookup_ecu(tx_id)
+            messages.append(message)
+
+        return messages
+
+
     def lookup_ecu(self, tx_id):
         if tx_id in self.ecu_map:
             return self.ecu_map[tx_id]
@@ -257,7 +341,7 @@ class Protocol(object):
                 tx_id = None
 
                 for message in messages:
-                    bits = sum([numBitsSet(b) for b in message.data])
+                    bits = sum([numBitsSet(b) for b in message.payload])
 
                     if bits > best:
                         best = bits
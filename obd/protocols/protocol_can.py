@@ -29,7 +29,7 @@
 #                                                                      #
 ########################################################################
 
-from obd.utils import contiguous
+from obd.utils import contiguous, hex_line_to_bytes
 from .protocol import *
 
 
@@ -51,19 +51,23 @@ class CANProtocol(Protocol):
 
     def parse_frame(self, frame):
 
-        raw = frame.raw
+        raw_bytes = frame.raw_bytes
 
         # pad 11-bit CAN headers out to 32 bits for consistency,
         # since ELM already does this for 29-bit CAN headers
 
-        #        7 E8 06 41 00 BE 7F B8 13
+        #       07 E8 06 41 00 BE 7F B8 13
         # to:
         # 00 00 07 E8 06 41 00 BE 7F B8 13
 
         if self.id_bits == 11:
-            raw = "00000" + raw
+            raw_bytes = bytearray(2) + raw_bytes
 
-        raw_bytes = ascii_to_bytes(raw)
+        # a header, and at least a PCI byte (truncated lines show
+        # up when reading a live bus, see ELM327.monitor())
+        if len(raw_bytes) < 5:
+            debug("Dropped frame for being too short")
+            return False
 
         # read header information
         if self.id_bits == 11:
@@ -95,13 +99,13 @@ class CANProtocol(Protocol):
         # extract the frame data
         #             [      Frame       ]
         # 00 00 07 E8 06 41 00 BE 7F B8 13
-        frame.data = raw_bytes[4:]
+        frame.payload = raw_bytes[4:]
 
 
         # read PCI byte (always first byte in the data section)
         #             v
         # 00 00 07 E8 06 41 00 BE 7F B8 13
-        frame.type = frame.data[0] & 0xF0
+        frame.type = frame.payload[0] & 0xF0
         if frame.type not in [self.FRAME_TYPE_SF,
                               self.FRAME_TYPE_FF,
                               self.FRAME_TYPE_CF]:
@@ -113,16 +117,20 @@ class CANProtocol(Protocol):
             # single frames have 4 bit length codes
             #              v
             # 00 00 07 E8 06 41 00 BE 7F B8 13
-            frame.data_len = frame.data[0] & 0x0F
+            frame.data_len = frame.payload[0] & 0x0F
         elif frame.type == self.FRAME_TYPE_FF:
+            if len(frame.payload) < 2:
+                debug("Dropped first frame for being too short")
+                return False
+
             # First frames have 12 bit length codes
             #              v
             # 00 00 07 E8 06 41 00 BE 7F B8 13
-            frame.data_len = (frame.data[0] & 0x0F) << 8
-            frame.data_len += frame.data[1]
+            frame.data_len = (frame.payload[0] & 0x0F) << 8
+            frame.data_len += frame.payload[1]
         elif frame.type == self.FRAME_TYPE_CF:
             # Consecutive frames have 4 bit sequence indices
-            frame.seq_index = frame.data[0] & 0x0F
+            frame.seq_index = frame.payload[0] & 0x0F
 
         return True
 
@@ -142,7 +150,7 @@ class CANProtocol(Protocol):
             #             [      Frame       ]
             #                [     Data      ]
             # 00 00 07 E8 06 41 00 BE 7F B8 13 xx xx xx xx, anything else is ignored
-            message.data = frame.data[1:1+frame.data_len]
+            message.payload = frame.payload[1:1+frame.data_len]
 
         else:
             # sort FF and CF into their own lists
@@ -216,27 +224,41 @@ class CANProtocol(Protocol):
 
 
             # on the first frame, skip PCI byte AND length code
-            message.data = ff[0].data[2:]
+            message.payload = ff[0].payload[2:]
 
             # now that they're in order, load/accumulate the data from each CF frame
             for f in cf:
-                message.data += f.data[1:] # chop off the PCI byte
+                message.payload += f.payload[1:] # chop off the PCI byte
 
             # chop to the correct size (as specified in the first frame)
-            message.data = message.data[:ff[0].data_len]
+            message.payload = message.payload[:ff[0].data_len]
+
+        return self.strip_mode(message)
 
 
+    def strip_mode(self, message):
+        """ chops the Mode/PID bytes off an assembled message """
+
+        # a single frame can carry nothing but its PCI byte (ex: "7E8 00")
+        if not message.payload:
+            debug("Dropped message without any data")
+            return False
+
         # chop off the Mode/PID bytes based on the mode number
-        mode = message.data[0]
+        mode = message.payload[0]
         if mode == 0x43:
 
+            if len(message.payload) < 2:
+                debug("Dropped DTC message without a DTC count")
+                return False
+
             # TODO: confirm this logic. I don't have any raw test data for it yet
 
             # fetch the DTC count, and use it as a length code
-            num_dtc_bytes = message.data[1] * 2
+            num_dtc_bytes = message.payload[1] * 2
 
             # skip the PID byte and the DTC count,
-            message.data = message.data[2:][:num_dtc_bytes]
+            message.payload = message.payload[2:][:num_dtc_bytes]
 
         else:
             # skip the Mode and PID bytes
@@ -248,11 +270,131 @@ class CANProtocol(Protocol):
             # OR, the data from a multiline response:
             #       [                     Data                       ]
             # 49 04 01 35 36 30 32 38 39 34 39 41 43 00 00 00 00 00 00
-            message.data = message.data[2:]
+            message.payload = message.payload[2:]
 
         return True
 
 
+    def reassembler(self):
+        """ returns an ISOTPReassembler, for parsing lines as they arrive """
+        return ISOTPReassembler(self)
+
+
+
+class ISOTPReassembler(object):
+    """
+        Reassembles ISO-TP (ISO 15765-2) messages incrementally, one line
+        at a time, as the lines arrive from the adapter. Where calling the
+        protocol needs every line of a response, the reassembler returns a
+        message as soon as its first frame's length is satisfied, and
+        reports missing and repeated frames right away.
+
+        Each transmitter (tx_id) has its own partial message. Consecutive
+        frames must arrive in order, which is how ISO-TP sends them.
+        Headers must be on.
+
+        Ex.
+            reassembler = protocol.reassembler()
+            for line in lines:
+                for message in reassembler.feed(line):
+                    ...
+    """
+
+    def __init__(self, protocol):
+        self.protocol   = protocol
+        self.dropped    = 0 # messages abandoned because of missing frames
+        self.duplicates = 0 # repeated consecutive frames that were ignored
+        self.__partial  = {} # key = tx_id, value = [Message, length, next sequence index]
+
+
+    def feed(self, line):
+        """
+            parses one line of adapter output, and returns a list of the
+            messages that it completed (at most one). Blank lines, and
+            frames too short to carry a PCI byte, are dropped.
+        """
+
+        if not line.strip():
+            return []
+
+        raw_bytes = hex_line_to_bytes(line)
+        if raw_bytes is None:
+            # status lines (NO DATA, etc) are passed on, like the protocol does
+            return [ Message([ Frame(line) ]) ]
+
+        frame = Frame(line.replace(' ', ''), raw_bytes)
+        if not self.protocol.parse_frame(frame):
+            return []
+        frame.raw_bytes = None
+
+        if frame.type == CANProtocol.FRAME_TYPE_SF:
+            if frame.tx_id in self.__partial:
+                debug("Recieved single frame during a multi-frame message, dropping the message")
+                self.__drop(frame.tx_id)
+            message = Message([frame])
+            message.payload = frame.payload[1:1+frame.data_len]
+            return self.__finish(message)
+
+        if frame.type == CANProtocol.FRAME_TYPE_FF:
+            if frame.tx_id in self.__partial:
+                debug("Recieved multiple frames marked FF")
+                self.__drop(frame.tx_id)
+            message = Message([frame])
+            message.payload = frame.payload[2:]
+            self.__partial[frame.tx_id] = [message, frame.data_len, 1]
+            return []
+
+        # consecutive frames
+        partial = self.__partial.get(frame.tx_id)
+        if partial is None:
+            debug("Never received frame marked FF")
+            return []
+
+        message, length, seq = partial
+
+        if frame.seq_index != (seq & 0x0F):
+            if frame.seq_index == ((seq - 1) & 0x0F):
+                debug("Dropping repeated consecutive frame")
+                self.duplicates += 1
+            else:
+                debug("Recieved multiline response with missing frames")
+                self.__drop(frame.tx_id)
+            return []
+
+        message.frames.append(frame)
+        message.payload += frame.payload[1:] # chop off the PCI byte
+        partial[2] = seq + 1
+
+        if len(message.payload) < length:
+            return []
+
+        del self.__partial[frame.tx_id]
+        message.payload = message.payload[:length]
+        return self.__finish(message)
+
+
+    def pending(self):
+        """ returns the tx_ids that have an incomplete message """
+        return list(self.__partial.keys())
+
+
+    def reset(self):
+        """ forgets any incomplete messages """
+        self.__partial = {}
+
+
+    def __drop(self, tx_id):
+        del self.__partial[tx_id]
+        self.dropped += 1
+
+
+    def __finish(self, message):
+        if not self.protocol.strip_mode(message):
+            return []
+        message.ecu = self.protocol.lookup_ecu(message.tx_id)
+        return [message]
+
+
 ##############################################
 #                                            #
 # Here lie the class stubs for each protocol #
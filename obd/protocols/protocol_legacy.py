@@ -44,9 +44,7 @@ class LegacyProtocol(Protocol):
 
     def parse_frame(self, frame):
 
-        raw = frame.raw
-
-        raw_bytes = ascii_to_bytes(raw)
+        raw_bytes = frame.raw_bytes
 
         if len(raw_bytes) < 6:
             debug("Dropped frame for being too short")
@@ -62,7 +60,7 @@ class LegacyProtocol(Protocol):
         # ck = checksum byte
 
         # exclude header and trailing checksum (handled by ELM adapter)
-        frame.data = raw_bytes[3:-1]
+        frame.payload = raw_bytes[3:-1]
 
         # read header information
         frame.priority = raw_bytes[0]
@@ -77,11 +75,11 @@ class LegacyProtocol(Protocol):
         frames = message.frames
 
         # len(frames) will always be >= 1 (see the caller, protocol.py)
-        mode = frames[0].data[0]
+        mode = frames[0].payload[0]
         
         # test that all frames are responses to the same Mode (SID)
         if len(frames) > 1:
-            if not all([mode == f.data[0] for f in frames[1:]]):
+            if not all([mode == f.payload[0] for f in frames[1:]]):
                 debug("Recieved frames from multiple commands")
                 return False
 
@@ -99,7 +97,7 @@ class LegacyProtocol(Protocol):
             #             [     Data      ]
 
             for f in frames:
-                message.data += f.data[1:]
+                message.payload += f.payload[1:]
 
         else:
             if len(frames) == 1:
@@ -110,7 +108,7 @@ class LegacyProtocol(Protocol):
                 # 48 6B 10 41 00 BE 7F B8 13 ck
                 #                [  Data   ]
 
-                message.data = frames[0].data[2:]
+                message.payload = frames[0].payload[2:]
 
             else: # len(frames) > 1:
                 # generic multiline requests carry an order byte
@@ -123,17 +121,17 @@ class LegacyProtocol(Protocol):
                 # etc...         [] [  Data   ]
 
                 # sort the frames by the order byte
-                frames = sorted(frames, key=lambda f: f.data[2])
+                frames = sorted(frames, key=lambda f: f.payload[2])
 
                 # check contiguity
-                indices = [f.data[2] for f in frames]
+                indices = [f.payload[2] for f in frames]
                 if not contiguous(indices, 1, len(frames)):
                     debug("Recieved multiline response with missing frames")
                     return False
 
                 # now that they're in order, accumulate the data from each frame
                 for f in frames:
-                    message.data += f.data[3:] # loose the mode/pid/seq bytes
+                    message.payload += f.payload[3:] # loose the mode/pid/seq bytes
 
         return True
 
@@ -0,0 +1,243 @@
+
+########################################################################
+#                                                                      #
+# python-OBD: A python OBD-II serial module derived from pyobd         #
+#                                                                      #
+# Copyright 2004 Donour Sizemore (donour@uchicago.edu)                 #
+# Copyright 2009 Secons Ltd. (www.obdtester.com)                       #
+# Copyright 2009 Peter J. Creath                                       #
+# Copyright 2015 Brendan Whitfield (bcw7044@rit.edu)                   #
+#                                                                      #
+########################################################################
+#                                                                      #
+# timing.py                                                            #
+#                                                                      #
+# This file is part of python-OBD (a derivative of pyOBD)              #
+#                                                                      #
+# python-OBD is free software: you can redistribute it and/or modify   #
+# it under the terms of the GNU General Public License as published by #
+# the Free Software Foundation, either version 2 of the License, or    #
+# (at your option) any later version.                                  #
+#                                                                      #
+# python-OBD is distributed in the hope that it will be useful,        #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of       #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the        #
+# GNU General Public License for more details.                         #
+#                                                                      #
+# You should have received a copy of the GNU General Public License    #
+# along with python-OBD.  If not, see <http://www.gnu.org/licenses/>.  #
+#                                                                      #
+
+import math
+import time
+from collections import deque
+
+
+# monotonic nanoseconds, for timing the stages of a query
+if hasattr(time, "perf_counter_ns"):
+    now_ns = time.perf_counter_ns
+elif hasattr(time, "perf_counter"):
+    now_ns = lambda: int(time.perf_counter() * 1e9)
+else:
+    now_ns = lambda: int(time.time() * 1e9)
+
+
+def percentile(values, p):
+    """ nearest-rank percentile (0-100) of a sorted list """
+    if not values:
+        return None
+    i = int(math.ceil(p / 100.0 * len(values))) - 1
+    return values[max(0, min(i, len(values) - 1))]
+
+
+
+class TimeoutTuner(object):
+    """
+        Chooses the ELM327's response timeout (ATST) and adaptive timing
+        mode (ATAT1 / ATAT2) from the response latencies of each ECU.
+
+        Latencies are kept in a sliding window per ECU. Once every ECU
+        has enough samples, the timeout is set to the slowest ECU's p99
+        latency, times a safety margin. Every missed response doubles
+        that margin (the backoff), and a full window of clean responses
+        halves it again.
+
+        The aggressive adaptive mode (ATAT2) is only used when nothing
+        has been missed recently, and latencies are steady. After the
+        first choice, the latencies have to stay steady (or unsteady)
+        for `settle` updates in a row before the mode switches, so that
+        a borderline vehicle doesn't flip it back and forth. A miss
+        drops back to ATAT1 right away.
+    """
+
+    UNIT     = 0.004096 # seconds per ATST count
+    DEFAULT  = 0x32     # the adapter's power-on timeout (~200 ms)
+    MINIMUM  = 0x05     # ~20 ms, leaves room for scheduling jitter
+    MAXIMUM  = 0xFF     # ~1 second, the largest ATST accepts
+    BACKOFF  = 16       # the largest the backoff multiplier will grow
+
+    def __init__(self, window=64, margin=1.5, min_samples=8, settle=3):
+        self.window      = window
+        self.margin      = margin
+        self.min_samples = min_samples
+        self.settle      = settle
+
+        self.st          = None # the programmed ATST value, None = adapter default
+        self.at          = 1    # the programmed ATAT mode
+        self.misses      = 0
+
+        self.__latency   = {}   # key = tx_id, value = deque of seconds
+        self.__backoff   = 1
+        self.__clean     = 0    # responses since the last miss
+        self.__pending   = 0    # samples since the last update()
+        self.__missed    = False
+        self.__streak    = 0    # updates in a row that asked for the other ATAT mode
+
+
+    def record(self, tx_id, latency):
+        """ adds a response latency (in seconds) for an ECU """
+        if tx_id not in self.__latency:
+            self.__latency[tx_id] = deque(maxlen=self.window)
+        self.__latency[tx_id].append(latency)
+        self.__pending += 1
+
+
+    def hit(self):
+        """ marks a request as answered by every ECU that was expected """
+        self.__clean += 1
+        if (self.__clean >= self.window) and (self.__backoff > 1):
+            self.__backoff //= 2
+            self.__clean = 0
+
+
+    def miss(self):
+        """ marks a request as missing responses, most likely cut off by the timeout """
+        self.misses += 1
+        self.__clean = 0
+        self.__missed = True
+        self.__backoff = min(self.__backoff * 2, self.BACKOFF)
+
+
+    def update(self):
+        """
+            re-evaluates the timeout. Returns a tuple of (ATST value, ATAT mode)
+            when the adapter should be reprogrammed, otherwise None
+        """
+
+        if not (self.__missed or self.__pending >= self.min_samples):
+            return None
+
+        missed = self.__missed
+        self.__missed = False
+        self.__pending = 0
+
+        windows = [ sorted(w) for w in self.__latency.values() ]
+        if (not windows) or any([ len(w) < self.min_samples for w in windows ]):
+            return None
+
+        worst = max([ percentile(w, 99) for w in windows ])
+        st = int(math.ceil(worst * self.margin * self.__backoff / self.UNIT))
+        st = max(self.MINIMUM, min(st, self.MAXIMUM))
+
+        # jitter finer than ATST's resolution doesn't count
+        steady = all([ percentile(w, 99) <= max(2 * percentile(w, 50), percentile(w, 50) + self.UNIT)
+                       for w in windows ])
+        at = self.__adaptive_mode(2 if (self.__backoff == 1 and steady) else 1)
+
+        current = self.DEFAULT if self.st is None else self.st
+
+        # lengthen right away, but only shorten for a worthwhile gain
+        if (at == self.at) and (st <= current) and (st >= current * 0.8) and not missed:
+            return None
+        if (at == self.at) and (st == current):
+            return None
+
+        self.st = st
+        self.at = at
+        return (st, at)
+
+
+    def __adaptive_mode(self, at):
+        """ applies the hysteresis to the ATAT mode that the latencies ask for """
+
+        if (at == self.at) or (self.st is None) or (at == 1 and self.__backoff > 1):
+            self.__streak = 0
+            return at
+
+        self.__streak += 1
+        if self.__streak < self.settle:
+            return self.at
+
+        self.__streak = 0
+        return at
+
+
+    def stats(self):
+        """ returns the chosen timeout, and the tail latencies of each ECU """
+        ecus = {}
+        for tx_id, w in self.__latency.items():
+            w = sorted(w)
+            ecus[tx_id] = {
+                "samples" : len(w),
+                "p50"     : percentile(w, 50),
+                "p95"     : percentile(w, 95),
+                "p99"     : percentile(w, 99),
+            }
+
+        return {
+            "timeout"  : (self.DEFAULT if self.st is None else self.st) * self.UNIT,
+            "adaptive" : self.at,
+            "backoff"  : self.__backoff,
+            "misses"   : self.misses,
+            "ecus"     : ecus,
+        }
+
+
+
+class QueryProfiler(object):
+    """
+        Keeps rolling windows of how long each stage of a query took, per
+        command, in nanoseconds. The stages are:
+
+            write  - flushing the input, writing the command, and flushing the output
+            wait   - from the end of the write, until the first byte of the answer
+            read   - from the first byte of the answer, until the prompt
+            parse  - assembling the lines into messages (Protocol.__call__)
+            decode - turning the messages into a value (OBDCommand.__call__)
+            total  - the sum of the above
+    """
+
+    STAGES = ["write", "wait", "read", "parse", "decode", "total"]
+
+    def __init__(self, window=256):
+        self.window = window
+        self.__stages = {} # key = command name, value = {stage : deque of nanoseconds}
+
+
+    def record(self, name, stages):
+        """ adds the stage durations (a dict of nanoseconds) of one query """
+        if name not in self.__stages:
+            self.__stages[name] = dict([ (s, deque(maxlen=self.window)) for s in self.STAGES ])
+
+        windows = self.__stages[name]
+        for stage, ns in stages.items():
+            windows[stage].append(ns)
+        windows["total"].append(sum(stages.values()))
+
+
+    def stats(self):
+        """ returns the p50, p95 and p99 of each stage, per command """
+        stats = {}
+        for name, windows in self.__stages.items():
+            stats[name] = {}
+            for stage, w in windows.items():
+                if not w:
+                    continue
+                w = sorted(w)
+                stats[name][stage] = {
+                    "samples" : len(w),
+                    "p50"     : percentile(w, 50),
+                    "p95"     : percentile(w, 95),
+                    "p99"     : percentile(w, 99),
+                }
+        return stats
@@ -29,11 +29,14 @@
 #                                                                      #
 ########################################################################
 
+import re
 import serial
 import errno
 import string
 import glob
 import sys
+import time
+import threading
 from .debug import debug
 
 
@@ -105,9 +108,126 @@ def twos_comp(val, num_bits):
         val = val - (1<<num_bits)
     return val
 
+# each byte value, with its bits in reverse order, and the positions of its set bits
+_REVERSED = [ int(("{0:08b}".format(b))[::-1], 2) for b in range(256) ]
+_SET_BITS = [ tuple([ n for n in range(8) if b & (1 << n) ]) for b in range(256) ]
+
+class BitSet(object):
+    """
+        A set of small non-negative integers (like PIDs), held in the
+        bits of a single int: bit N is set when N is in the set. Set
+        operations (&, |, -, ^) are single integer operations, and
+        iteration visits the set bits a byte at a time. Treat it as an
+        immutable value, like a frozenset.
+    """
+
+    __slots__ = ["bits"]
+
+    def __init__(self, bits=0):
+        self.bits = bits
+
+    @classmethod
+    def of(cls, members):
+        """ builds a set from an iterable of integers """
+        bits = 0
+        for n in members:
+            bits |= 1 << n
+        return cls(bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+            decodes a supported PID bitmap, as the PID getters return
+            it: the most significant bit of the first byte is member 1
+        """
+        bits = 0
+        shift = 1
+        for b in bytearray(data):
+            bits |= _REVERSED[b] << shift
+            shift += 8
+        return cls(bits)
+
+    def to_bytes(self, length):
+        """ encodes the members 1 through length * 8, the inverse of from_bytes() """
+        return bytearray([ _REVERSED[(self.bits >> (i * 8 + 1)) & 0xFF] for i in range(length) ])
+
+    def __contains__(self, n):
+        return (n >= 0) and ((self.bits >> n) & 1 == 1)
+
+    def __iter__(self):
+        """ iterates over the members in ascending order """
+        members = []
+        bits = self.bits
+        base = 0
+        while bits:
+            for n in _SET_BITS[bits & 0xFF]:
+                members.append(base + n)
+            bits >>= 8
+            base += 8
+        return iter(members)
+
+    def __len__(self):
+        return bin(self.bits).count("1")
+
+    def __bool__(self):
+        return self.bits != 0
+
+    __nonzero__ = __bool__
+
+    def __and__(self, other):
+        return BitSet(self.bits & other.bits)
+
+    def __or__(self, other):
+        return BitSet(self.bits | other.bits)
+
+    def __xor__(self, other):
+        return BitSet(self.bits ^ other.bits)
+
+    def __sub__(self, other):
+        return BitSet(self.bits & ~other.bits)
+
+    def __lshift__(self, n):
+        """ offsets every member by n, like the PIDs of a getter by its own PID """
+        return BitSet(self.bits << n)
+
+    def __rshift__(self, n):
+        return BitSet(self.bits >> n)
+
+    def __eq__(self, other):
+        return isinstance(other, BitSet) and (self.bits == other.bits)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __repr__(self):
+        return "BitSet(%s)" % list(self)
+
 def isHex(_hex):
     return all([c in string.hexdigits for c in _hex])
 
+_HEX_LINE = re.compile(r"[0-9A-Fa-f ]*\Z")
+
+def hex_line_to_bytes(line):
+    """
+        decodes a line of hex printed by the ELM327 (with or without spaces)
+        into a bytearray. Returns None if the line isn't
+        hex, such as "NO DATA". An odd number of digits (an 11-bit CAN
+        header) is padded with a leading zero.
+    """
+    if _HEX_LINE.match(line) is None:
+        return None
+    if (len(line) - line.count(' ')) % 2:
+        line = "0" + line
+    try:
+        return bytearray.fromhex(line)
+    except ValueError:
+        # digits split up oddly by spaces
+        line = line.replace(' ', '')
+        return bytearray(ascii_to_bytes(line if len(line) % 2 == 0 else "0" + line))
+
 def contiguous(l, start, end):
     """ checks that a list of integers are consequtive """
     if not l:
@@ -141,10 +261,46 @@ def try_port(portStr):
     return False
 
 
-def scanSerial():
-    """scan for available ports. return a list of serial names"""
-    available = []
+def probe_port(portStr, baudrate=38400, timeout=1):
+    """
+        checks for an ELM327 on the given port, with an ATI handshake.
+        returns the response time in seconds, or None if no ELM answered
+    """
+    try:
+        s = serial.Serial(portStr, baudrate=baudrate, timeout=timeout)
+    except (serial.SerialException, OSError) as e:
+        return None
 
+    buffer = bytearray()
+    try:
+        s.flushInput()
+        start = time.time()
+        s.write(b"ATI\r")
+
+        # read until the prompt, or until the adapter goes quiet
+        while (b'>' not in buffer) and (time.time() - start < timeout):
+            data = s.read(s.inWaiting() or 1)
+            if not data:
+                break
+            buffer.extend(data)
+
+        latency = time.time() - start
+    except (serial.SerialException, OSError) as e:
+        debug("Failed to probe '%s': %s" % (portStr, str(e)))
+        return None
+    finally:
+        s.close()
+
+    # the version banner always begins with "ELM" (clones included)
+    if (b'>' in buffer) and (b'ELM' in buffer.upper()):
+        debug("Found ELM on '%s' in %.3f seconds" % (portStr, latency))
+        return latency
+
+    return None
+
+
+def _possible_ports():
+    """ returns a list of serial port names where an adapter might live """
     possible_ports = []
 
     if sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
@@ -163,8 +319,62 @@ def scanSerial():
 
     # possible_ports += glob.glob('/dev/pts/[0-9]*') # for obdsim
 
-    for port in possible_ports:
-        if try_port(port):
-            available.append(port)
-    
-    return available
+    return possible_ports
+
+
+def _parallel(f, items, workers=16):
+    """
+        calls f() on every item, from a small pool of threads, so that
+        slow ports (like unpaired bluetooth devices) are waited on together.
+        returns the results in the same order as the items
+    """
+    items = list(items)
+    results = [None] * len(items)
+    errors = []
+    queue = list(enumerate(items))
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                i, item = queue.pop(0)
+            try:
+                results[i] = f(item)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [ threading.Thread(target=work) for _ in range(min(workers, len(items))) ]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+
+    # surface errors in the caller's thread, as a serial loop would have
+    if errors:
+        raise errors[0]
+
+    return results
+
+
+def scanSerial():
+    """scan for available ports. return a list of serial names"""
+    possible_ports = _possible_ports()
+    results = _parallel(try_port, possible_ports)
+    return [ port for port, available in zip(possible_ports, results) if available ]
+
+
+def probeSerial(ports=None, baudrate=38400, timeout=1):
+    """
+        probes every port at once for an ELM327 (see probe_port()).
+        returns a list of (port, latency) pairs, for the ports that
+        answered, fastest first. Scans for ports when none are given
+    """
+    if ports is None:
+        ports = _possible_ports()
+
+    results = _parallel(lambda port: probe_port(port, baudrate, timeout), ports)
+    found = [ (port, latency) for port, latency in zip(ports, results) if latency is not None ]
+    return sorted(found, key=lambda p: p[1])
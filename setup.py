@@ -24,6 +24,7 @@ setup(
 
     license="GNU GPLv2",
     packages=find_packages(),
+    package_data={"obd": ["dtc.txt"]},
     include_package_data=True,
     zip_safe=False,
     #install_requires=["pyserial"],
@@ -4,7 +4,7 @@ from obd.utils import OBDStatus
 from obd.OBDResponse import OBDResponse
 from obd.OBDCommand import OBDCommand
 from obd.decoders import noop
-from obd.protocols import SAE_J1850_PWM
+from obd.protocols import SAE_J1850_PWM, ISO_15765_4_11bit_500k
 
 
 def test_is_connected():
@@ -101,3 +101,196 @@ def test_query():
 
 def test_load_commands():
 	pass
+
+
+
+class FakeELM(object):
+	""" stands in for an ELM327, replying from a table of raw lines """
+
+	def __init__(self, protocol, responses):
+		self.protocol  = protocol
+		self.responses = responses
+		self.written   = []
+		self.cached    = None # a connection profile, see profiles.py
+
+	def status(self):
+		return OBDStatus.CAR_CONNECTED
+
+	def protocol_id(self):
+		return self.protocol.ELM_ID
+
+	def ecus(self):
+		return self.protocol.ecu_map.values()
+
+	def stats(self):
+		return {}
+
+	def profile(self):
+		return self.cached
+
+	def close(self):
+		pass
+
+	def stages(self):
+		return { "write" : 1, "wait" : 2, "read" : 3, "parse" : 4 }
+
+	def send_and_parse(self, cmd):
+		self.written.append(cmd)
+		cmd = cmd or self.written[-2] # empty lines repeat the last command
+		if cmd.startswith("01") and len(cmd) == 5:
+			cmd = cmd[:4] # drop the response count of "fast" commands
+		return self.protocol(self.responses.get(cmd, ["NO DATA"]))
+
+
+def test_supported_per_connection():
+	# two cars in one process, supporting different PIDs
+	a = obd.OBD("/dev/null")
+	a.port = FakeELM(ISO_15765_4_11bit_500k(["7E8 06 41 00 BE 3F A8 13"]), {
+		"0100" : ["7E8 06 41 00 BE 3F A8 13"], # ... RPM, SPEED, ... PIDS_B
+	})
+	b = obd.OBD("/dev/null")
+	b.port = FakeELM(ISO_15765_4_11bit_500k(["7E8 06 41 00 80 00 00 00"]), {
+		"0100" : ["7E8 06 41 00 80 00 00 00"], # STATUS only
+	})
+	a._OBD__load_commands()
+	b._OBD__load_commands()
+
+	assert a.supports(obd.commands.RPM)
+	assert a.supports(obd.commands.SPEED)
+	assert a.supports(obd.commands.PIDS_B)
+	assert not b.supports(obd.commands.RPM)
+	assert not b.supports(obd.commands.PIDS_B)
+	assert a.supports(obd.commands.STATUS) and b.supports(obd.commands.STATUS)
+	assert obd.commands.RPM in a.supported_commands
+	assert obd.commands.RPM not in b.supported_commands
+
+	# support that the tables declare, and commands outside the tables
+	assert a.supports(obd.commands.PIDS_A) and b.supports(obd.commands.PIDS_A)
+	assert b.supports(obd.commands.VOLTAGE)
+	assert not a.supports(OBDCommand("TEST", "", "0123", 2, noop))
+
+	# the shared command objects are left alone
+	assert not obd.commands.RPM.supported
+	assert not obd.commands.PIDS_B.supported
+
+	a.close()
+	assert not a.supports(obd.commands.RPM)
+	assert b.supports(obd.commands.STATUS)
+
+
+def test_supported_from_profile():
+	# a cached profile's PID bitmaps stand in for the PID getters' replies
+	o = obd.OBD("/dev/null")
+	o.port = FakeELM(ISO_15765_4_11bit_500k(["7E8 06 41 00 BE 3F A8 13"]), {})
+	o.port.cached = { "pids" : { "0100" : "BE3FA813", "0120" : "80000001", "0140" : "00000000" } }
+	o._OBD__load_commands()
+
+	assert o.port.written == []
+	assert o.supports(obd.commands.RPM)
+	assert o.supports(obd.commands.DISTANCE_W_MIL) # PID 0x21
+	assert o.supports(obd.commands.PIDS_C)         # PID 0x40
+	assert not o.supports(obd.commands.FUEL_LEVEL) # PID 0x2F
+	assert obd.commands.PIDS_B not in o.supported_commands
+
+
+def test_query_many():
+	o = obd.OBD("/dev/null")
+	o.port = FakeELM(ISO_15765_4_11bit_500k(["7E8 06 41 00 BE 3F A8 13"]), {
+		# engine answers all three, in a multi-frame reply
+		# transmission skips RPM, so its reply starts at SPEED
+		"010C0D05" : ["7E8 10 08 41 0C 1A F8 0D 32",
+		              "7E8 21 05 7B 00 00 00 00 00",
+		              "7E9 04 41 0D 33"],
+		"03"       : ["7E8 04 43 01 01 33"],
+	})
+
+	cmds = [obd.commands.RPM, obd.commands.GET_DTC, obd.commands.SPEED, obd.commands.COOLANT_TEMP]
+	r = o.query_many(cmds, force=True)
+
+	assert o.port.written == ["010C0D05", "03"]
+	assert r[0].value == 1726.0
+	assert r[1].value[0][0] == "P0133"
+	assert r[2].value == 50
+	assert r[3].value == 83
+
+	# repeated requests are re-triggered with an empty line
+	cmds = [obd.commands.RPM, obd.commands.SPEED, obd.commands.COOLANT_TEMP]
+	r = o.query_many(cmds, force=True)
+	r = o.query_many(cmds, force=True)
+	assert o.port.written[-2:] == ["010C0D05", ""]
+	assert r[2].value == 83
+
+
+def test_query_many_chunks():
+	o = obd.OBD("/dev/null")
+	o.port = FakeELM(ISO_15765_4_11bit_500k(["7E8 06 41 00 BE 3F A8 13"]), {})
+
+	cmds = [obd.commands[1][pid] for pid in range(4, 12)]
+	r = o.query_many(cmds, force=True)
+
+	assert o.port.written == ["01040506070809", "010A0B"]
+	assert all([x.is_null() for x in r])
+
+
+def test_query_many_legacy():
+	# non-CAN protocols send one command per request
+	o = obd.OBD("/dev/null")
+	o.port = FakeELM(SAE_J1850_PWM(["48 6B 10 41 00 BE 3F A8 13 AA"]), {
+		"010D" : ["48 6B 10 41 0D 32 AA"],
+	})
+
+	r = o.query_many([obd.commands.RPM, obd.commands.SPEED], force=True)
+	assert o.port.written == ["010C1", "010D1"]
+	assert r[0].is_null()
+	assert r[1].value == 50
+
+
+def test_response_counts():
+	o = obd.OBD("/dev/null")
+	o.port = FakeELM(ISO_15765_4_11bit_500k([
+		"7E8 06 41 00 BE 3F A8 13",
+		"7E9 06 41 00 98 18 80 11",
+		"7EA 06 41 00 80 00 00 01",
+	]), {
+		"010C" : ["7E8 04 41 0C 1A F8"], # only the engine knows RPM
+	})
+	o._RECOUNT_INTERVAL = 4
+
+	# the first query waits on every ECU, and learns that only one answers
+	assert o.query(obd.commands.RPM, force=True).value == 1726.0
+	assert o.query(obd.commands.RPM, force=True).value == 1726.0
+	assert o.query(obd.commands.RPM, force=True).value == 1726.0
+	assert o.port.written == ["010C3", "010C1", ""]
+
+	# a periodic recount notices a second ECU answering
+	o.port.responses["010C"].append("7E9 04 41 0C 1A F8")
+	o.query(obd.commands.RPM, force=True)
+	o.query(obd.commands.RPM, force=True)
+	o.query(obd.commands.RPM, force=True)
+	assert o.port.written[-3:] == ["", "010C3", "010C2"]
+
+	# when nobody answers, the count is forgotten
+	o.port.responses["010C"] = ["NO DATA"]
+	o.query(obd.commands.RPM, force=True)
+	o.query(obd.commands.RPM, force=True)
+	assert o.port.written[-2:] == ["", "010C3"]
+
+
+def test_instrument():
+	o = obd.OBD("/dev/null", instrument=True)
+	o.port = FakeELM(ISO_15765_4_11bit_500k(["7E8 06 41 00 BE 3F A8 13"]), {
+		"010C" : ["7E8 04 41 0C 1A F8"],
+		"010D" : [], # no answer at all
+	})
+
+	o.query(obd.commands.RPM, force=True)
+	o.query(obd.commands.SPEED, force=True)
+
+	queries = o.stats()["queries"]
+	assert queries["RPM"]["wait"]["p50"] == 2
+	assert queries["RPM"]["decode"]["samples"] == 1
+	assert queries["RPM"]["total"]["p50"] >= 10
+
+	# unanswered queries aren't decoded
+	assert "decode" not in queries["SPEED"]
+	assert queries["SPEED"]["total"]["p50"] == 10
@@ -0,0 +1,128 @@
+
+import os
+import pty
+import sys
+import threading
+import pytest
+
+import obd
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 5), reason="asyncio transport requires Python 3.5+")
+
+
+class FakeELM(threading.Thread):
+	""" answers ELM327 commands on the master side of a pty """
+
+	RESPONSES = {
+		"ATZ"   : "\r\rELM327 v1.5",
+		"ATE0"  : "ATE0\rOK",
+		"ATH1"  : "OK",
+		"ATL0"  : "OK",
+		"ATSP0" : "OK",
+		"ATDPN" : "A6",
+		"0100"  : "7E8 06 41 00 BE 3F A8 13",
+		"010C"  : "7E8 04 41 0C 1A F8",
+		"010D"  : "7E8 03 41 0D 32",
+	}
+
+	def __init__(self):
+		super(FakeELM, self).__init__()
+		self.daemon = True
+		self.master, slave = pty.openpty()
+		self.portname = os.ttyname(slave)
+		self.written = []
+
+	def run(self):
+		buffer = b""
+		last = ""
+		while True:
+			try:
+				buffer += os.read(self.master, 1024)
+			except OSError:
+				return
+
+			while b"\r" in buffer:
+				cmd, buffer = buffer.split(b"\r", 1)
+				cmd = cmd.strip().decode()
+				self.written.append(cmd)
+
+				# an empty line repeats the last command
+				cmd = cmd or last
+				last = cmd
+
+				# drop the response count digit of "fast" commands
+				if cmd.startswith("01") and len(cmd) == 5:
+					cmd = cmd[:4]
+
+				r = self.RESPONSES.get(cmd, "NO DATA")
+				os.write(self.master, (r + "\r\r>").encode())
+
+
+def run(coroutine):
+	import asyncio
+	return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def test_connect_and_query():
+	from obd.aio import AsyncioOBD
+
+	elm = FakeELM()
+	elm.start()
+
+	connection = AsyncioOBD(elm.portname)
+	assert run(connection.connect()) == obd.OBDStatus.CAR_CONNECTED
+	assert connection.protocol_name() == "ISO 15765-4 (CAN 11/500)"
+	assert obd.commands.RPM in connection.supported_commands
+
+	r = run(connection.query(obd.commands.RPM))
+	assert r.value == 1726.0
+	assert elm.written[-1] == "010C1"
+
+	# repeated commands are re-triggered with an empty line
+	r = run(connection.query(obd.commands.RPM))
+	assert r.value == 1726.0
+	assert elm.written[-1] == ""
+
+	connection.close()
+	assert not connection.is_connected()
+
+
+def test_many_adapters_one_loop():
+	import asyncio
+	from obd.aio import AsyncioOBD
+
+	elms = [FakeELM() for i in range(4)]
+	connections = []
+	for elm in elms:
+		elm.start()
+		connections.append(AsyncioOBD(elm.portname))
+
+	run(asyncio.gather(*[c.connect() for c in connections]))
+	responses = run(asyncio.gather(*[c.query(obd.commands.SPEED) for c in connections]))
+
+	assert [r.value for r in responses] == [50] * len(elms)
+
+	for c in connections:
+		c.close()
+
+
+def test_concurrent_queries():
+	import asyncio
+	from obd.aio import AsyncioOBD
+
+	elm = FakeELM()
+	elm.start()
+
+	connection = AsyncioOBD(elm.portname)
+	run(connection.connect())
+
+	# every query must be answered for its own PID, even when one of
+	# them is sent as an empty line (a repeat of the one before it)
+	run(connection.query(obd.commands.RPM))
+	cmds = [obd.commands.SPEED, obd.commands.RPM, obd.commands.RPM, obd.commands.SPEED]
+	responses = run(asyncio.gather(*[connection.query(c) for c in cmds]))
+
+	assert [r.value for r in responses] == [50, 1726.0, 1726.0, 50]
+	assert elm.written[-4:] == ["010D1", "010C1", "", "010D1"]
+
+	connection.close()
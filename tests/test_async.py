@@ -0,0 +1,159 @@
+
+import time
+import threading
+import obd
+from obd.utils import OBDStatus
+
+
+class FakeELM(object):
+	""" stands in for an ELM327, recording the commands it was sent """
+
+	def __init__(self, delay=0.0):
+		self.delay   = delay
+		self.written = []
+
+	def status(self):
+		return OBDStatus.CAR_CONNECTED
+
+	def ecus(self):
+		return [obd.ECU.ENGINE]
+
+	def close(self):
+		pass
+
+	def send_and_parse(self, cmd):
+		self.written.append(cmd)
+		time.sleep(self.delay)
+		return []
+
+
+def make_async(delay=0.0):
+	o = obd.Async("/dev/null", fast=False)
+	o.port = FakeELM(delay)
+	return o
+
+
+def test_periods():
+	o = make_async()
+	o.watch(obd.commands.RPM, period=0.02, force=True)
+	o.watch(obd.commands.COOLANT_TEMP, period=10, force=True)
+
+	o.start()
+	time.sleep(0.5)
+	o.stop()
+
+	rpm = o.port.written.count("010C")
+	coolant = o.port.written.count("0105")
+
+	assert coolant == 1 # only the initial query, the next isn't due yet
+	assert 15 <= rpm <= 26
+
+
+def test_priority():
+	o = make_async(delay=0.01)
+	o.watch(obd.commands.SPEED, force=True)
+	o.watch(obd.commands.RPM, period=0.05, priority=1, force=True)
+
+	# both are due from the start, the higher priority goes first
+	# SPEED fills the time in between
+	o.start()
+	time.sleep(0.2)
+	o.stop()
+
+	assert o.port.written[0] == "010C"
+	assert 3 <= o.port.written.count("010C") <= 5
+	assert o.port.written.count("010D") > 5
+
+
+def test_load():
+	o = make_async(delay=0.02)
+	o.watch(obd.commands.RPM, period=0.01, force=True)
+	o.watch(obd.commands.SPEED, period=0.01, force=True)
+
+	o.start()
+	time.sleep(0.3)
+	o.stop()
+
+	# each command takes ~20ms, but is wanted every 10ms
+	assert o.load > 1.0
+
+
+def test_load_unperiodic():
+	o = make_async(delay=0.02)
+	o.watch(obd.commands.RPM, period=0.05, force=True)
+	o.watch(obd.commands.SPEED, force=True)
+	o.watch(obd.commands.COOLANT_TEMP, force=True)
+
+	o.start()
+	time.sleep(0.3)
+	o.stop()
+
+	# RPM has to wait its turn behind the commands without a period
+	assert 1.0 < o.load < 1.5
+
+	# unless they have a lower priority
+	o.watch(obd.commands.SPEED, priority=-1, force=True)
+	o.watch(obd.commands.COOLANT_TEMP, priority=-1, force=True)
+	assert 0.3 < o.load < 0.6
+
+
+def test_callback_workers():
+	o = obd.Async("/dev/null", fast=False, callback_workers=1, overflow=obd.Overflow.COALESCE)
+	o.port = FakeELM()
+
+	main = threading.current_thread()
+	threads = []
+	def slow(r):
+		threads.append(threading.current_thread())
+		time.sleep(0.1)
+
+	o.watch(obd.commands.RPM, callback=slow, force=True)
+	o.start()
+	time.sleep(0.35)
+	o.stop()
+
+	# the loop kept polling while the callback was busy
+	assert len(o.port.written) > 10
+	assert len(threads) < 6
+	assert main not in threads
+	assert o.dispatcher.coalesced > 0
+
+
+def test_watch_while_running():
+	o = make_async(delay=0.005)
+	o.watch(obd.commands.RPM, force=True)
+	o.start()
+
+	# change the subscriptions without stopping the loop
+	time.sleep(0.05)
+	o.watch(obd.commands.SPEED, force=True)
+	time.sleep(0.05)
+	o.unwatch(obd.commands.RPM)
+	n = len(o.port.written)
+	time.sleep(0.05)
+	assert o.running
+
+	o.unwatch_all()
+	time.sleep(0.02)
+	m = len(o.port.written)
+	time.sleep(0.05)
+	o.stop()
+
+	written = o.port.written
+	assert written[0] == "010C"
+	assert "010D" in written
+	assert "010C" not in written[n + 1:] # at most one RPM query was in flight
+	assert len(written) <= m + 1
+	assert o.query(obd.commands.SPEED).is_null()
+
+
+def test_start_empty():
+	o = make_async()
+	o.start()
+	assert o.running
+
+	# a newly watched command wakes the idle loop
+	o.watch(obd.commands.RPM, force=True)
+	time.sleep(0.05)
+	o.stop()
+	assert "010C" in o.port.written
@@ -1,6 +1,8 @@
 
 import obd
-from obd.decoders import pid
+from obd import OBDCommand, ECU
+from obd.commands import Commands
+from obd.decoders import pid, noop
 
 
 def test_list_integrity():
@@ -72,6 +74,33 @@ def test_contains():
 	assert not obd.commands.has_pid(-1, 0)
 	assert not obd.commands.has_pid(1, -1)
 	assert not obd.commands.has_command("I'm a string, not an OBDCommand")
+	assert not obd.commands.has_command(OBDCommand("RPM", "Not RPM", "01FF", 2, noop))
+	assert not obd.commands.has_name("NOT_A_COMMAND")
+	assert not obd.commands.has_pid(8, 0)
+
+
+def test_register():
+	commands = Commands() # leave the shared tables alone
+	c = OBDCommand("OIL_TEMP_ALT", "Oil temperature (manufacturer)", "221310", 2, noop, ECU.ENGINE)
+
+	assert not commands.has_command(c)
+	assert commands.register(c)
+
+	assert commands.has_command(c)
+	assert commands.has_name("OIL_TEMP_ALT")
+	assert commands.has_pid(0x22, 0x1310)
+	assert commands.OIL_TEMP_ALT is c
+	assert commands["OIL_TEMP_ALT"] is c
+	assert commands[0x22, 0x1310] is c
+	assert commands[1, 12] is commands.RPM
+
+	# names must be unique, and not shadow the registry's own attributes
+	assert not commands.register(OBDCommand("OIL_TEMP_ALT", "", "221311", 2, noop))
+	assert not commands.register(OBDCommand("RPM", "", "221312", 2, noop))
+	assert not commands.register(OBDCommand("modes", "", "221313", 2, noop))
+	assert not commands.register("I'm a string, not an OBDCommand")
+
+	assert not obd.commands.has_command(c)
 
 
 def test_pid_getters():
@@ -0,0 +1,67 @@
+
+import logging
+from obd.debug import Debug
+
+
+class Unprintable(object):
+	def __repr__(self):
+		raise AssertionError("formatted while debug output was off")
+
+
+def test_enabled():
+	d = Debug()
+	assert not d.enabled
+
+	d.console = True
+	assert d.enabled
+	d.console = False
+	assert not d.enabled
+
+	d.handler = lambda msg: None
+	assert d.enabled
+	d.handler = None
+	assert not d.enabled
+
+
+def test_lazy():
+	d = Debug()
+	d.log("read: %r", Unprintable()) # never formatted
+
+	messages = []
+	d.handler = messages.append
+	d.log("write: %r", "010C\r\n")
+	d("plain")
+	assert messages == ["write: '010C\\r\\n'", "plain"]
+
+
+def test_logger():
+	records = []
+
+	class Collect(logging.Handler):
+		def emit(self, record):
+			records.append(record)
+
+	logger = logging.getLogger("obd.test")
+	logger.setLevel(logging.DEBUG)
+	logger.propagate = False
+	logger.addHandler(Collect())
+
+	d = Debug()
+	d.logger = logger
+	assert d.enabled
+
+	# a logger that drops DEBUG records doesn't count
+	logger.setLevel(logging.WARNING)
+	assert not d.enabled
+	d.log("read: %r", Unprintable())
+	logger.setLevel(logging.DEBUG)
+	assert d.enabled
+
+	d.log("Sending command: %s", "RPM")
+	d("No connection", True)
+
+	assert [ (r.levelno, r.getMessage()) for r in records ] == [
+		(logging.DEBUG, "Sending command: RPM"),
+		(logging.WARNING, "No connection"),
+	]
+	assert records[0].args == ("RPM",) # formatted by logging, not before
@@ -1,5 +1,7 @@
 
 from obd.OBDResponse import Unit
+from obd.protocols.protocol import Message
+from obd.utils import BitSet
 import obd.decoders as d
 
 
@@ -16,9 +18,18 @@ def test_noop():
 	assert d.noop("No Operation") == ("No Operation", Unit.NONE)
 
 def test_pid():
-	assert d.pid("00000000") == ("00000000000000000000000000000000", Unit.NONE)
-	assert d.pid("F00AA00F") == ("11110000000010101010000000001111", Unit.NONE)
-	assert d.pid("11")       == ("00010001", Unit.NONE)
+	def m(data):
+		message = Message([])
+		message.data = data
+		return message
+
+	# N is in the set when the getter's PID + N is supported
+	assert d.pid([m([0x00, 0x00, 0x00, 0x00])]) == (BitSet(), Unit.NONE)
+	assert d.pid([m([0xF0, 0x0A, 0xA0, 0x0F])]) == (BitSet.of([1, 2, 3, 4, 13, 15, 17, 19, 29, 30, 31, 32]), Unit.NONE)
+	assert d.pid([m([0x11])])                   == (BitSet.of([4, 8]), Unit.NONE)
+
+	# the union of every ECU's answer
+	assert d.pid([m([0x80, 0, 0, 0]), m([0, 0, 0, 0x01])]) == (BitSet.of([1, 32]), Unit.NONE)
 
 def test_count():
 	assert d.count("0")   == (0,    Unit.COUNT)
@@ -0,0 +1,94 @@
+
+import time
+import threading
+from obd.dispatch import CallbackDispatcher, Overflow
+
+
+class Gate(object):
+	""" a callback that blocks until released, recording what it saw """
+
+	def __init__(self):
+		self.event = threading.Event()
+		self.seen  = []
+
+	def __call__(self, r):
+		self.event.wait(2)
+		self.seen.append(r)
+
+
+def test_order():
+	seen = []
+	d = CallbackDispatcher()
+	d.start()
+	for i in range(10):
+		d.put("A", [seen.append], i)
+	d.stop() # drains the queue before returning
+	assert seen == list(range(10))
+
+
+def test_drop_oldest():
+	gate = Gate()
+	d = CallbackDispatcher(maxsize=3, overflow=Overflow.DROP_OLDEST)
+	d.start()
+
+	d.put("A", [gate], 0)
+	time.sleep(0.05) # let the worker pick up the first event, and block
+	for i in range(1, 6):
+		d.put("A", [gate], i)
+
+	assert d.dropped == 2
+	gate.event.set()
+	d.stop()
+	assert gate.seen == [0, 3, 4, 5]
+
+
+def test_coalesce():
+	gate = Gate()
+	d = CallbackDispatcher(overflow=Overflow.COALESCE)
+	d.start()
+
+	d.put("A", [gate], 0)
+	time.sleep(0.05)
+	for i in range(1, 6):
+		d.put("A", [gate], i)
+		d.put("B", [gate], -i)
+
+	assert d.coalesced == 8
+	assert d.pending() == 2
+	gate.event.set()
+	d.stop()
+	assert gate.seen == [0, 5, -5]
+
+
+def test_block():
+	gate = Gate()
+	d = CallbackDispatcher(maxsize=1, overflow=Overflow.BLOCK)
+	d.start()
+
+	d.put("A", [gate], 0)
+	time.sleep(0.05)
+	d.put("A", [gate], 1) # fills the queue
+
+	t = threading.Thread(target=d.put, args=("A", [gate], 2))
+	t.start()
+	time.sleep(0.05)
+	assert t.is_alive() # blocked on the full queue
+
+	gate.event.set()
+	t.join(1)
+	d.stop()
+	assert gate.seen == [0, 1, 2]
+	assert d.dropped == 0
+
+
+def test_callback_errors():
+	seen = []
+	def bad(r):
+		raise ValueError("oops")
+
+	d = CallbackDispatcher()
+	d.start()
+	d.put("A", [bad, seen.append], 1)
+	d.put("A", [seen.append], 2)
+	d.stop()
+	assert seen == [1, 2]
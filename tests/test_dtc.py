@@ -0,0 +1,48 @@
+
+import os
+import pytest
+from obd.codes import DTC
+from obd.dtc import DTCIndex
+
+
+def test_lookup():
+	assert DTC["P0133"] == "O2 Sensor Circuit Slow OBDResponse"
+	assert "P0171" in DTC
+	assert DTC.get("P0171") == "System Too Lean"
+
+	# the first and last entries, and misses around them
+	assert DTC["P0001"] == "Fuel Volume Regulator Control Circuit/Open"
+	assert DTC["U0431"] == "Invalid Data Received From Body Control Module 'A'"
+	for code in ["A0000", "P0000", "P00010", "P000", "U0432", "Z9999", "", None, 133]:
+		assert code not in DTC
+		assert DTC.get(code, "unknown") == "unknown"
+
+	with pytest.raises(KeyError):
+		DTC["P9999"]
+
+
+def test_every_code():
+	# the file must be sorted for the binary search to find everything
+	with open(DTC.path) as f:
+		lines = [ l.rstrip("\n").split("\t") for l in f ]
+
+	codes = [ code for code, desc in lines ]
+	assert codes == sorted(set(codes))
+
+	for code, desc in lines:
+		assert DTC[code] == desc
+
+	assert len(DTC) == len(lines)
+	assert list(DTC) == codes
+
+
+def test_small_index(tmpdir):
+	path = str(tmpdir.join("dtc.txt"))
+	with open(path, "w") as f:
+		f.write("B1234\tone\nC0001\ttwo\n")
+
+	index = DTCIndex(path)
+	assert index["B1234"] == "one"
+	assert index["C0001"] == "two"
+	assert "C0000" not in index
+	assert "B12345" not in index
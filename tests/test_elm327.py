@@ -1,4 +1,316 @@
 
+import time
 from obd.protocols import ECU, SAE_J1850_PWM
 from obd.elm327 import ELM327
 
+
+
+class FakePort(object):
+	""" minimal stand-in for serial.Serial, serving pre-chunked reads """
+
+	def __init__(self, chunks, timeout=0, responses=None):
+		self.responses = responses # optional {command: response}, queued on write
+		self.last    = ""
+		self.chunks  = list(chunks)
+		self.reads   = 0
+		self.written = []
+		self.timeout = timeout
+
+	def inWaiting(self):
+		return len(self.chunks[0]) if self.chunks else 0
+
+	def read(self, n=1):
+		self.reads += 1
+		if not self.chunks:
+			time.sleep(self.timeout) # nothing arrives before the timeout
+			return b''
+		chunk = self.chunks.pop(0)
+		self.chunks[0:0] = [chunk[n:]] if chunk[n:] else []
+		return chunk[:n]
+
+	def write(self, data):
+		self.written.append(data)
+		if self.responses is not None:
+			cmd = data.strip().decode() or self.last # empty lines repeat
+			self.last = cmd
+			self.chunks.append(self.responses.get(cmd, b"?") + b"\r\r>")
+
+	def flushInput(self):
+		pass
+
+	def flush(self):
+		pass
+
+
+def read_lines(chunks):
+	elm = ELM327("/dev/null", 38400, None) # fails to open, leaving no port
+	elm._ELM327__port = FakePort(chunks)
+	return elm._ELM327__read(), elm._ELM327__port
+
+
+def test_read_single_chunk():
+	lines, port = read_lines([b"7E8 06 41 00 BE 3F A8 13\r7E9 06 41 00 98 18 80 11\r\r>"])
+	assert lines == ["7E8 06 41 00 BE 3F A8 13", "7E9 06 41 00 98 18 80 11"]
+	assert port.reads == 1
+
+
+def test_read_split_chunks():
+	lines, port = read_lines([b"48 6B 10 41 0", b"0 BE 1F B8 11 AA\r\n", b"\r>"])
+	assert lines == ["48 6B 10 41 00 BE 1F B8 11 AA"]
+	assert port.reads == 3
+
+
+def test_read_nulls_and_trailing():
+	# null characters are skipped, anything after the prompt is dropped
+	lines, port = read_lines([b"\x00OK\x00\r\r>junk"])
+	assert lines == ["OK"]
+
+
+def test_read_timeout():
+	# an empty port gives up after retrying
+	lines, port = read_lines([])
+	assert lines == []
+	assert port.reads == 3
+
+
+def test_reset_polls_for_prompt():
+	elm = ELM327("/dev/null", 38400, None)
+	elm._ELM327__port = FakePort([b"ATZ\r", b"\r\rELM327 v1.5\r\r>"], timeout=3)
+
+	boot_time = elm._ELM327__reset("ATZ", 5)
+	assert elm._ELM327__port.written == [b"ATZ\r\n"]
+	assert elm._ELM327__port.reads == 2 # stopped at the prompt
+	assert elm._ELM327__port.timeout == 3 # port timeout is restored
+	assert boot_time < 1
+
+
+def test_reset_skips_stale_prompt():
+	# a banner and prompt left over from an earlier ATZ don't count
+	elm = ELM327("/dev/null", 38400, None)
+	elm._ELM327__port = FakePort([b"\r\rELM327 v1.5\r\r>", b"ATZ\r", b"\r\rELM327 v1.5\r\r>"], timeout=3)
+
+	assert elm._ELM327__reset("ATZ", 5) is not None
+	assert elm._ELM327__port.chunks == [] # read through this reset's prompt
+
+	# a prompt alone (no banner) is not a boot either
+	elm._ELM327__port = FakePort([b"ATZ\r", b"?\r\r>"], timeout=3)
+	assert elm._ELM327__reset("ATZ", 0.2) is None
+
+
+def test_reset_echo_off():
+	# without an echo, the banner and prompt are accepted after a short grace
+	elm = ELM327("/dev/null", 38400, None)
+	elm._ELM327__port = FakePort([b"\r\rELM327 v1.5\r\r>"], timeout=0.05)
+
+	start = time.time()
+	boot_time = elm._ELM327__reset("ATZ", 5)
+	assert time.time() - start < 1
+
+	# the grace period isn't part of the boot time
+	assert boot_time is not None
+	assert boot_time < ELM327._ECHO_GRACE
+
+
+def test_reset_timeout():
+	# an adapter that never prompts is given up on after the timeout
+	elm = ELM327("/dev/null", 38400, None)
+	elm._ELM327__port = FakePort([b"ATZ\r"], timeout=3)
+
+	start = time.time()
+	assert elm._ELM327__reset("ATZ", 0.2) is None
+	assert time.time() - start < 1
+	assert elm._ELM327__port.timeout == 3
+
+
+def test_stats():
+	# the boot time is unknown without a port
+	elm = ELM327("/dev/null", 38400, None)
+	assert elm.stats() == { "boot_time" : None, "baudrate" : 38400 }
+
+
+def test_instrument():
+	elm = ELM327("/dev/null", 38400, None)
+	assert elm.stages() is None
+
+	elm = ELM327("/dev/null", 38400, None, instrument=True)
+	port = FakePort([], responses={ "010C1" : b"7E8 04 41 0C 1A F8" })
+	elm._ELM327__port = port
+	elm._ELM327__set_protocol("6", ["7E8 06 41 00 00 01 02 03"])
+	elm._ELM327__connected()
+
+	r = elm.send_and_parse("010C1")
+	assert r[0].data == [0x1A, 0xF8]
+
+	stages = elm.stages()
+	assert sorted(stages.keys()) == ["parse", "read", "wait", "write"]
+	assert all([ ns >= 0 for ns in stages.values() ])
+
+
+def test_compact_headers():
+	elm = ELM327("/dev/null", 38400, None, compact=True)
+	port = FakePort([], responses={
+		"ATH0"  : b"OK",
+		"ATH1"  : b"OK",
+		"010C1" : b"410C1AF8",
+		"0902"  : b"7E81014490201314731\r7E82148433532363535\r7E8223930383532333431",
+	})
+	elm._ELM327__port = port
+	elm._ELM327__set_protocol("6", ["7E806410000010203"])
+	elm._ELM327__connected()
+
+	# a single ECU, so a run of plain mode 01 polls goes without headers
+	port.responses["010C1"] = b"7E804410C1AF8"
+	for i in range(ELM327._HEADERLESS_RUN - 1):
+		assert elm.send_and_parse("010C1")[0].data == [0x1A, 0xF8]
+	assert b"ATH0\r\n" not in port.written
+
+	port.responses["010C1"] = b"410C1AF8"
+	r = elm.send_and_parse("010C1")
+	assert r[0].data == [0x1A, 0xF8]
+	assert port.written[-2:] == [b"ATH0\r\n", b"010C1\r\n"]
+
+	# the adapter repeats the last command
+	r = elm.send_and_parse("")
+	assert r[0].data == [0x1A, 0xF8]
+	assert port.written[-1] == b"\r\n"
+
+	# other commands turn headers back on
+	r = elm.send_and_parse("0902")
+	assert len(r[0].data) == 18
+	assert port.written[-2:] == [b"ATH1\r\n", b"0902\r\n"]
+
+	# while commands that need headers are mixed in, they stay on
+	port.responses["010C1"] = b"7E804410C1AF8"
+	del port.written[:]
+	for i in range(ELM327._HEADERLESS_RUN * 2):
+		assert elm.send_and_parse("010C1")[0].data == [0x1A, 0xF8]
+		if i % 4 == 3:
+			assert len(elm.send_and_parse("0902")[0].data) == 18
+	assert b"ATH0\r\n" not in port.written
+	assert b"ATH1\r\n" not in port.written
+
+	# a repeat after switching headers sends the whole command again
+	elm.send_and_parse("010C1")
+	elm._ELM327__set_headers(False)
+	port.responses["010C1"] = b"410C1AF8"
+	elm.send_and_parse("")
+	assert port.written[-1] == b"010C1\r\n"
+
+
+def test_adaptive_timeout():
+	elm = ELM327("/dev/null", 38400, None, adaptive_timeout=True)
+	port = FakePort([], responses={
+		"ATST05" : b"OK",
+		"ATST09" : b"OK",
+		"ATAT1"  : b"OK",
+		"ATAT2"  : b"OK",
+		"010C"   : b"7E8 04 41 0C 1A F8",
+	})
+	elm._ELM327__port = port
+	elm._ELM327__set_protocol("6", ["7E806410000010203"])
+	elm._ELM327__connected()
+
+	for i in range(8):
+		assert elm.send_and_parse("010C")[0].data == [0x1A, 0xF8]
+
+	# the fake port answers instantly, so the timeout drops to the minimum
+	assert port.written[-2:] == [b"ATST05\r\n", b"ATAT2\r\n"]
+	timing = elm.stats()["timing"]
+	assert timing["ecus"][0]["samples"] == 8
+	assert timing["adaptive"] == 2
+
+	# the engine stops answering, so back off (the
+	# timeout is still the minimum, so only ATAT changes)
+	port.responses["010C"] = b"NO DATA"
+	elm.send_and_parse("010C")
+	assert port.written[-2:] == [b"010C\r\n", b"ATAT1\r\n"]
+	assert elm.stats()["timing"]["misses"] == 1
+
+
+
+class BaudPort(FakePort):
+	""" plays the adapter's side of the ATBRD / STBR handshake """
+
+	def __init__(self, refuse=[], garble=[], stn=False):
+		FakePort.__init__(self, [])
+		self.refuse  = refuse # rates answered with "?"
+		self.garble  = garble # rates at which the host's CR never arrives
+		self.stn     = stn
+		self.rate    = 38400  # adapter side
+		self.host    = 38400  # host side
+		self.pending = None
+
+	@property
+	def baudrate(self):
+		return self.host
+
+	@baudrate.setter
+	def baudrate(self, rate):
+		self.host = rate
+		if rate == self.pending:
+			self.chunks.append(b"ELM327 v1.5\r")
+		elif (rate == self.rate) and (self.pending is not None):
+			# the adapter gave up on the switch, and prompts at the old rate
+			self.pending = None
+			self.chunks.append(b"\r>")
+
+	def answer(self, data):
+		self.chunks.append(data + b"\r\r>")
+
+	def write(self, data):
+		self.written.append(data)
+		cmd = data.strip().decode()
+
+		if self.host != self.rate:
+			if self.pending in self.garble:
+				return # the adapter hears noise
+			if cmd == "" and self.host == self.pending:
+				self.rate = self.pending
+				self.pending = None
+				self.answer(b"OK")
+			return
+
+		if cmd.startswith("ATBRD") or cmd.startswith("STBR "):
+			if cmd.startswith("ATBRD"):
+				rate = [ r for r in [500000, 230400, 115200] if abs(4000000.0 / int(cmd[5:], 16) - r) < r * 0.03 ][0]
+			else:
+				rate = int(cmd[5:])
+			if rate in self.refuse:
+				self.answer(b"?")
+			else:
+				self.pending = rate
+				self.chunks.append(b"OK\r") # no prompt, the rate changes
+		elif cmd == "STI":
+			self.answer(b"STN1110 v4.2.1" if self.stn else b"?")
+		elif cmd == "ATI":
+			self.answer(b"ELM327 v1.5")
+		else:
+			self.answer(b"OK")
+
+
+def negotiate(port):
+	elm = ELM327("/dev/null", 38400, None)
+	elm._ELM327__port = port
+	return elm._ELM327__negotiate_baud(1)
+
+
+def test_negotiate_baud():
+	port = BaudPort(refuse=[500000])
+	assert negotiate(port) == 230400
+	assert port.rate == port.host == 230400
+	assert b"ATBRD 08\r\n" in port.written
+	assert b"ATBRD 11\r\n" in port.written
+	assert port.written[-1] == b"ATI\r\n" # verified with a round trip
+
+
+def test_negotiate_baud_stn():
+	port = BaudPort(stn=True)
+	assert negotiate(port) == 500000
+	assert b"STBR 500000\r\n" in port.written
+
+
+def test_negotiate_baud_fallback():
+	# the adapter never hears the CR at 500000, and refuses the rest
+	port = BaudPort(refuse=[230400, 115200], garble=[500000])
+	assert negotiate(port) == 38400
+	assert port.rate == port.host == 38400
@@ -0,0 +1,179 @@
+
+import os
+import time
+import pytest
+
+import obd
+from obd.elm327 import ELM327
+from obd.protocols import ECU
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="the emulator runs on a pty")
+
+from obd.emulator import Emulator, VirtualECU, default_ecus
+
+
+PROTOCOLS = ["1", "2", "3", "4", "5", "6", "7", "8", "9"]
+
+
+@pytest.mark.parametrize("protocol", PROTOCOLS)
+def test_protocols(protocol):
+	with Emulator(protocol, timeout_scale=0.1) as emulator:
+		connection = obd.OBD(emulator.port_name)
+		assert connection.is_connected()
+		assert connection.protocol_id() == protocol
+		assert obd.commands.RPM in connection.supported_commands
+
+		assert connection.query(obd.commands.RPM).value == 1726.0
+		assert connection.query(obd.commands.COOLANT_TEMP).value == 83
+
+		codes = connection.query(obd.commands.GET_DTC).value
+		assert [c[0] for c in codes] == ["P0133", "P0171"]
+		connection.close()
+
+
+def test_reconnect():
+	# each close() resets the adapter, and the next connection must wait
+	# for its own reset's banner, not that one's
+	with Emulator("6", timeout_scale=0.1, boot_time=0.3) as emulator:
+		for i in range(3):
+			connection = obd.OBD(emulator.port_name)
+			assert connection.status() == obd.OBDStatus.CAR_CONNECTED
+			assert connection.query(obd.commands.RPM).value == 1726.0
+			connection.close()
+
+
+def test_cached_profile(tmpdir):
+	# the second connection to the same vehicle skips the protocol search
+	cache = str(tmpdir.join("profiles.json"))
+	with Emulator("6", timeout_scale=0.1) as emulator:
+		connection = obd.OBD(emulator.port_name, cache=cache)
+		assert "ATSP0" in emulator.written
+		connection.close()
+
+		start = len(emulator.written)
+		connection = obd.OBD(emulator.port_name, cache=cache)
+		written = emulator.written[start:]
+		assert connection.status() == obd.OBDStatus.CAR_CONNECTED
+		assert "ATSP6" in written
+		assert "ATSP0" not in written
+		assert "0120" not in written # PID support comes from the profile
+		assert connection.supports(obd.commands.RPM)
+		assert connection.query(obd.commands.RPM).value == 1726.0
+		connection.close()
+
+
+def test_multi_ecu():
+	with Emulator("6", timeout_scale=0.1) as emulator:
+		connection = obd.OBD(emulator.port_name)
+
+		# both ECUs answer, the engine is identified
+		r = connection.query(obd.commands.SPEED)
+		assert r.value == 50
+		assert [m.ecu for m in r.messages] == [ECU.ENGINE]
+		assert len(connection.port.ecus()) == 2
+		assert emulator.written[-1] == "010D2"
+
+		# the fast suffix learned that only the engine knows RPM
+		connection.query(obd.commands.RPM)
+		connection.query(obd.commands.RPM)
+		assert emulator.written[-2:] == ["010C2", "010C1"]
+		connection.close()
+
+
+def test_iso_tp():
+	# enough DTCs to need a multi-frame answer
+	ecus = [ VirtualECU(0x10, { "010C" : "1AF8", "03" : "0133 0171 0300 0420 1234" }) ]
+	with Emulator("6", ecus, timeout_scale=0.1) as emulator:
+		connection = obd.OBD(emulator.port_name)
+		codes = connection.query(obd.commands.GET_DTC).value
+		assert [c[0] for c in codes] == ["P0133", "P0171", "P0300", "P0420", "P1234"]
+
+		# and multi-PID requests
+		r = connection.query_many([obd.commands.RPM, obd.commands.SPEED], force=True)
+		assert r[0].value == 1726.0
+		assert r[1].is_null()
+		connection.close()
+
+
+def test_monitor():
+	vin = "1G1JC5444R7252367"
+	ecus = default_ecus()
+	ecus[0].responses["0902"] = "01" + "".join([ "%02X" % ord(c) for c in vin ])
+
+	with Emulator("6", ecus, timeout_scale=0.1) as emulator:
+		connection = obd.OBD(emulator.port_name)
+		messages = list(connection.port.monitor(0.5))
+
+		assert "ATMA" in emulator.written
+		assert all([ m.tx_id is not None for m in messages ])
+		assert set([ m.tx_id for m in messages ]) == set([0, 1])
+		assert ECU.ENGINE in [ m.ecu for m in messages ]
+
+		# the VIN takes three frames, interleaved with the other ECU's
+		vins = [ m for m in messages if len(m.frames) == 3 ]
+		assert vins
+		assert bytes(vins[0].payload).endswith(vin.encode())
+
+		# the adapter is back at the prompt
+		assert connection.query(obd.commands.RPM).value == 1726.0
+		connection.close()
+
+
+def test_compact():
+	ecus = [ VirtualECU(0x10, { "010C" : "1AF8", "03" : "0133 0171 0300 0420" }) ]
+	with Emulator("6", ecus, timeout_scale=0.1) as emulator:
+		connection = obd.OBD(emulator.port_name, compact=True)
+		for i in range(ELM327._HEADERLESS_RUN):
+			assert connection.query(obd.commands.RPM).value == 1726.0
+		assert "ATH0" in emulator.written
+		assert connection.query(obd.commands.RPM).value == 1726.0
+
+		codes = connection.query(obd.commands.GET_DTC).value
+		assert len(codes) == 4
+		assert emulator.written[-2:] == ["ATH1", "03"]
+		connection.close()
+
+
+def test_latency_and_baudrate():
+	ecus = [ VirtualECU(0x10, { "010C" : "1AF8" }, latency=0.05) ]
+	with Emulator("6", ecus, baudrate=9600, timeout_scale=0.1) as emulator:
+		connection = obd.OBD(emulator.port_name)
+
+		start = time.time()
+		connection.query(obd.commands.RPM)
+		connection.query(obd.commands.RPM)
+		elapsed = time.time() - start
+
+		# ~20 characters a query at 9600 baud, plus the ECU latency
+		assert elapsed > 2 * (0.05 + 20 * 10.0 / 9600)
+		connection.close()
+
+
+@pytest.mark.parametrize("stn", [False, True])
+def test_negotiate_baud(stn):
+	with Emulator("6", timeout_scale=0.1, stn=stn) as emulator:
+		connection = obd.OBD(emulator.port_name, negotiate_baud=True)
+		assert connection.stats()["baudrate"] == 500000
+		assert connection.query(obd.commands.RPM).value == 1726.0
+		connection.close()
+
+
+def test_no_data():
+	with Emulator("6", timeout_scale=0.1) as emulator:
+		connection = obd.OBD(emulator.port_name)
+		assert connection.query(obd.commands.FUEL_RATE, force=True).is_null()
+		connection.close()
+
+
+def test_async():
+	with Emulator("6", timeout_scale=0.1) as emulator:
+		connection = obd.Async(emulator.port_name)
+		values = []
+		connection.watch(obd.commands.RPM, callback=lambda r: values.append(r.value))
+		connection.start()
+		time.sleep(0.3)
+		connection.stop()
+
+		assert len(values) > 5
+		assert all([v == 1726.0 for v in values])
+		connection.close()
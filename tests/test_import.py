@@ -0,0 +1,90 @@
+
+import os
+import sys
+import types
+import threading
+import importlib
+import subprocess
+import pytest
+import obd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# the modules that `import obd` must leave for first use
+DEFERRED = ["serial", "obd.obd", "obd.elm327", "obd.protocols", "obd.commands", "obd.decoders"]
+
+# wall time allowed for `import obd` itself (it was ~60ms when every
+# submodule was imported eagerly, and is a few ms with them deferred)
+IMPORT_BUDGET = 0.050
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="lazy imports require module __getattr__ (Python 3.7+)")
+def test_import_time():
+	p = subprocess.Popen([sys.executable, "-X", "importtime", "-c", "import obd"],
+	                     cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+	out, err = p.communicate()
+	assert p.returncode == 0, err
+
+	# import time: self [us] | cumulative | imported package
+	times = {}
+	for line in err.decode().splitlines():
+		fields = line.split("|")
+		if line.startswith("import time:") and fields[1].strip().isdigit():
+			times[fields[2].strip()] = int(fields[1])
+
+	for module in DEFERRED:
+		assert module not in times, "`import obd` imported %s" % module
+
+	assert times["obd"] < IMPORT_BUDGET * 1e6
+
+
+def test_exports():
+	for name in obd.__all__:
+		value = getattr(obd, name)
+		assert not isinstance(value, types.ModuleType)
+		assert name in dir(obd)
+
+	# importing the submodules of the same name must leave the exports in place
+	importlib.import_module("obd.commands")
+	importlib.import_module("obd.debug")
+	assert isinstance(obd.commands, sys.modules["obd.commands"].Commands)
+	assert isinstance(obd.debug, sys.modules["obd.debug"].Debug)
+	assert obd.commands.RPM.command == "010C"
+	assert obd.debug.enabled in [True, False]
+
+	with pytest.raises(AttributeError):
+		obd.NOT_AN_EXPORT
+
+
+def test_commands_deferred():
+	from obd.commands import Commands
+
+	c = Commands()
+	assert "modes" not in c.__dict__ # nothing assembled yet
+	assert c.has_name("RPM")
+	assert "modes" in c.__dict__
+
+	for lookup in [lambda c: c.RPM, lambda c: c["RPM"], lambda c: c[1][12], lambda c: c.modes[1][12]]:
+		assert lookup(Commands()) == obd.commands.RPM
+
+	assert len(Commands()) == len(obd.commands)
+	assert Commands().DTC_RPM.command == "020C"
+
+	with pytest.raises(AttributeError):
+		Commands().NOT_A_COMMAND
+
+
+def test_commands_first_use_threads():
+	from obd.commands import Commands
+
+	# several connections can use the same table for the first time at once
+	for i in range(20):
+		c = Commands()
+		found = []
+		threads = [ threading.Thread(target=lambda: found.append(c.has_command(obd.commands.RPM)))
+		            for j in range(8) ]
+		for t in threads:
+			t.start()
+		for t in threads:
+			t.join()
+		assert found == [True] * 8
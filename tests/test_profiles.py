@@ -0,0 +1,83 @@
+
+import os
+from obd.elm327 import ELM327
+from obd.profiles import ProfileCache, fingerprint
+
+
+R0100 = ["7E8 06 41 00 BE 3F A8 13", "7E9 06 41 00 98 18 80 11"]
+
+PROFILE = {
+	"protocol"    : "6",
+	"fingerprint" : fingerprint(R0100),
+	"ecu_map"     : [[0, 2], [1, 1]], # ECU.ENGINE, ECU.UNKNOWN
+	"pids"        : { "0100" : "BE3FA813" },
+}
+
+
+def fake_elm(responses):
+	""" an unopened ELM327, answering from a dict of responses """
+	elm = ELM327("/dev/null", 38400, None) # fails to open, leaving no port
+	sent = []
+	def send(cmd, delay=None):
+		sent.append(cmd)
+		return responses.get(cmd, ["?"])
+	elm._ELM327__send = send
+	return elm, sent
+
+
+def test_fingerprint():
+	# insensitive to spacing and to the order the ECUs responded in
+	assert fingerprint(R0100) == fingerprint(["7E9064100981880 11", "7E806 41 00 BE 3F A8 13"])
+	assert fingerprint(R0100) != fingerprint(R0100[:1])
+
+	# the status lines of a protocol search aren't part of it
+	assert fingerprint(R0100) == fingerprint(["SEARCHING..."] + R0100)
+	assert fingerprint(R0100) == fingerprint(["BUS INIT: ...OK", ""] + R0100)
+
+
+def test_cache(tmpdir):
+	path = str(tmpdir.join("profiles", "cache.json"))
+	cache = ProfileCache(path)
+	assert cache.lookup("/dev/ttyUSB0") == []
+
+	cache.store("/dev/ttyUSB0", PROFILE)
+	assert os.path.exists(path)
+
+	other = dict(PROFILE, fingerprint="other")
+	cache.store("/dev/ttyUSB0", other)
+
+	# a fresh instance reads back what was stored, most recent first
+	profiles = ProfileCache(path).lookup("/dev/ttyUSB0")
+	assert [p["fingerprint"] for p in profiles] == ["other", PROFILE["fingerprint"]]
+	assert profiles[1]["pids"] == PROFILE["pids"]
+	assert ProfileCache(path).lookup("/dev/ttyUSB1") == []
+
+	cache.forget("/dev/ttyUSB0")
+	assert cache.lookup("/dev/ttyUSB0") == []
+
+
+def test_cache_unreadable(tmpdir):
+	path = tmpdir.join("cache.json")
+	path.write("{ not json")
+	assert ProfileCache(str(path)).lookup("/dev/ttyUSB0") == []
+
+
+def test_load_profile():
+	elm, sent = fake_elm({ "ATSP6" : ["OK"], "0100" : R0100 })
+	assert elm.load_profile([PROFILE])
+	assert sent == ["ATSP6", "0100"]
+	assert elm.profile() is PROFILE
+	assert elm.fingerprint() == PROFILE["fingerprint"]
+	assert elm.protocol_id() == "6"
+
+
+def test_load_profile_mismatch():
+	# a different vehicle on the same port
+	elm, sent = fake_elm({ "ATSP6" : ["OK"], "0100" : R0100[:1] })
+	assert not elm.load_profile([PROFILE])
+	assert elm.profile() is None
+
+	# same vehicle, but the ECUs don't line up with what was cached
+	elm, sent = fake_elm({ "ATSP6" : ["OK"], "0100" : R0100 })
+	assert not elm.load_profile([dict(PROFILE, ecu_map=[[0, 2]])])
+	assert elm.profile() is None
@@ -1,4 +1,5 @@
 
+import json
 import random
 from obd.protocols import *
 from obd.protocols.protocol import Message
@@ -40,6 +41,25 @@ def test_single_frame():
 
 
 
+def test_data_in_place():
+	p = ISO_15765_4_11bit_500k([])
+	m = p(["7E8 06 41 00 00 01 02 03"])[0]
+
+	# the payload stays compact until data is asked for
+	assert m.payload == bytearray([0x00, 0x01, 0x02, 0x03])
+
+	# data is the message's payload, not a copy
+	m.data[0] = 0xFF
+	assert m.data.pop(1) == 0x01
+	assert m.data == [0xFF, 0x02, 0x03]
+	assert m.data is m.payload
+	assert json.dumps(m.data) == "[255, 2, 3]"
+
+	# the decoded line isn't held on to
+	assert m.frames[0].raw_bytes is None
+	assert m.frames[0].raw == "7E806410000010203"
+
+
 def test_hex_straining():
 	for protocol in CAN_11_PROTOCOLS:
 		p = protocol([])
@@ -85,6 +105,34 @@ def test_multi_ecu():
 
 
 
+def test_spaceless():
+	for protocol in CAN_11_PROTOCOLS:
+		p = protocol([])
+
+		# compact mode (ATS0) output parses the same as spaced output
+		r = p(["7E806410000010203"])
+		assert len(r) == 1
+		check_message(r[0], 1, 0x0, list(range(4)))
+
+
+
+def test_headerless():
+	for protocol in CAN_11_PROTOCOLS:
+		p = protocol(["7E8 06 41 00 00 01 02 03"])
+		p.headers = False
+
+		# no header, no PCI byte
+		r = p(["410C1AF8"])
+		assert len(r) == 1
+		check_message(r[0], 1, 0x0, [0x1A, 0xF8])
+		assert r[0].ecu == ECU.ENGINE
+
+		r = p(["NO DATA"])
+		assert len(r) == 1
+		assert not r[0].parsed()
+
+
+
 def test_multi_line():
 	for protocol in CAN_11_PROTOCOLS:
 		p = protocol([])
@@ -145,5 +193,81 @@ def test_multi_line():
 
 
 
+def test_reassembler():
+	p = ISO_15765_4_11bit_500k(["7E8 06 41 00 00 01 02 03", "7E9 06 41 00 00 01 02 03"])
+	r = p.reassembler()
+
+	# single frames come out right away
+	m = r.feed("7E8 06 41 00 00 01 02 03")
+	assert len(m) == 1
+	check_message(m[0], 1, 0x0, list(range(4)))
+	assert m[0].ecu == ECU.ENGINE
+
+	# multi-frame messages come out on the frame that completes them,
+	# while another ECU's frames are interleaved
+	assert r.feed("7E8 10 14 49 02 00 01 02 03") == []
+	assert r.feed("7E9 10 0B 49 02 00 01 02 03") == []
+	assert r.feed("7E8 21 04 05 06 07 08 09 0A") == []
+	assert sorted(r.pending()) == [0x0, 0x1]
+
+	m = r.feed("7E9 21 04 05 06 07 08 09 0A") # only the first 5 bytes count
+	assert len(m) == 1
+	check_message(m[0], 2, 0x1, list(range(9)))
+
+	m = r.feed("7E8 22 0B 0C 0D 0E 0F 10 11")
+	assert len(m) == 1
+	check_message(m[0], 3, 0x0, list(range(18)))
+	assert r.pending() == []
+
+	# repeated frames are ignored, missing frames drop the message
+	r.feed("7E8 10 14 49 02 00 01 02 03")
+	r.feed("7E8 21 04 05 06 07 08 09 0A")
+	assert r.feed("7E8 21 04 05 06 07 08 09 0A") == []
+	assert r.duplicates == 1
+	assert r.feed("7E8 23 12 13 14 15 16 17 18") == []
+	assert r.dropped == 1
+	assert r.pending() == []
+
+	# consecutive frames without a first frame are dropped
+	assert r.feed("7E8 22 0B 0C 0D 0E 0F 10 11") == []
+
+	# status lines pass through
+	m = r.feed("NO DATA")
+	assert len(m) == 1
+	assert not m[0].parsed()
+
+	# blank and truncated lines (as read from a live bus) are dropped
+	for line in ["", " ", "7E8", "7E8 ", "7E8 10", "7E8 00", "7E8 01", "7E8 01 43"]:
+		assert r.feed(line) == []
+	assert r.pending() == []
+	assert p(["7E8", "7E8 06 41 00 00 01 02 03"])[0].data == list(range(4))
+
+
+def test_reassembler_long():
+	# sequence numbers roll over after 0xF
+	p = ISO_15765_4_29bit_500k([])
+	r = p.reassembler()
+
+	data = [ i & 0xFF for i in range(200) ]
+	payload = [0x46, 0x00] + data
+	lines = ["18 DA F1 10 10 %02X %s" % (len(payload), " ".join([ "%02X" % b for b in payload[:6] ]))]
+	rest = payload[6:]
+	seq = 1
+	while rest:
+		chunk = (rest[:7] + [0] * 7)[:7]
+		lines.append("18 DA F1 10 %02X %s" % (0x20 | (seq & 0x0F), " ".join([ "%02X" % b for b in chunk ])))
+		rest = rest[7:]
+		seq += 1
+
+	for line in lines[:-1]:
+		assert r.feed(line) == []
+	m = r.feed(lines[-1])
+	check_message(m[0], len(lines), 0x10, data)
+
+	# the same as parsing the whole response at once
+	assert p(lines)[0].data == data
+
+
+
 def test_can_29():
 	pass
@@ -46,6 +46,19 @@ def test_single_frame():
 		assert len(r) == 0
 
 
+def test_headerless():
+	for protocol in LEGACY_PROTOCOLS:
+		p = protocol(["48 6B 10 41 00 BE 1F B8 11 AA"])
+		p.headers = False
+
+		# no header, no checksum
+		r = p(["410C1AF8", "41 0D 32"])
+		assert len(r) == 2
+		check_message(r[0], 1, 0x10, [0x1A, 0xF8])
+		check_message(r[1], 1, 0x10, [0x32])
+		assert r[0].ecu == ECU.ENGINE
+
+
 def test_hex_straining():
 	for protocol in LEGACY_PROTOCOLS:
 		p = protocol([])
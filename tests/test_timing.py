@@ -0,0 +1,135 @@
+
+from obd.timing import TimeoutTuner, QueryProfiler, percentile
+
+
+def feed(tuner, latencies, tx_id=0):
+	for l in latencies:
+		tuner.record(tx_id, l)
+		tuner.hit()
+
+
+def test_percentile():
+	values = list(range(1, 101))
+	assert percentile(values, 50) == 50
+	assert percentile(values, 99) == 99
+	assert percentile(values, 100) == 100
+	assert percentile([7], 95) == 7
+	assert percentile([], 50) is None
+
+
+def test_waits_for_samples():
+	tuner = TimeoutTuner(min_samples=8)
+	feed(tuner, [0.010] * 7)
+	assert tuner.update() is None
+	assert tuner.st is None
+
+	# every ECU needs enough samples
+	feed(tuner, [0.010])
+	feed(tuner, [0.030] * 3, tx_id=1)
+	assert tuner.update() is None
+
+
+def test_tightens():
+	tuner = TimeoutTuner(min_samples=8, margin=1.5)
+	feed(tuner, [0.020] * 8)
+
+	# 20 ms * 1.5 = 30 ms = 8 counts, steady enough for ATAT2
+	assert tuner.update() == (8, 2)
+	assert tuner.update() is None
+
+	stats = tuner.stats()
+	assert abs(stats["timeout"] - 8 * TimeoutTuner.UNIT) < 1e-9
+	assert stats["adaptive"] == 2
+	assert stats["ecus"][0]["samples"] == 8
+	assert stats["ecus"][0]["p99"] == 0.020
+
+
+def test_slowest_ecu_and_jitter():
+	tuner = TimeoutTuner(min_samples=8)
+	feed(tuner, [0.010] * 8, tx_id=0)
+	feed(tuner, [0.020] * 7 + [0.100], tx_id=1) # occasionally slow
+
+	st, at = tuner.update()
+	assert st == 37 # ceil(100 ms * 1.5 / 4.096 ms)
+	assert at == 1  # jittery, so keep the conservative mode
+
+
+def test_floor_and_ceiling():
+	tuner = TimeoutTuner(min_samples=8)
+	feed(tuner, [0.001] * 8)
+	assert tuner.update()[0] == TimeoutTuner.MINIMUM
+
+	tuner = TimeoutTuner(min_samples=8)
+	feed(tuner, [2.0] * 8)
+	assert tuner.update()[0] == TimeoutTuner.MAXIMUM
+
+
+def test_backoff():
+	tuner = TimeoutTuner(window=16, min_samples=8)
+	feed(tuner, [0.020] * 8)
+	assert tuner.update() == (8, 2)
+
+	# a miss doubles the timeout, and drops back to ATAT1
+	tuner.miss()
+	assert tuner.update() == (15, 1)
+	tuner.miss()
+	assert tuner.update() == (30, 1)
+	assert tuner.stats()["misses"] == 2
+
+	# a window of clean responses halves it again
+	feed(tuner, [0.020] * 16)
+	assert tuner.update() == (15, 1)
+	feed(tuner, [0.020] * 16)
+	assert tuner.update() == (8, 1)
+
+	# and ATAT2 returns once latencies have stayed steady
+	feed(tuner, [0.020] * 8)
+	assert tuner.update() is None
+	feed(tuner, [0.020] * 8)
+	assert tuner.update() == (8, 2)
+
+
+def test_settle():
+	tuner = TimeoutTuner(window=8, min_samples=8, settle=3)
+	steady   = [0.020] * 8
+	unsteady = [0.010] * 7 + [0.030]
+
+	feed(tuner, steady)
+	assert tuner.update() == (8, 2)
+
+	# a vehicle on the edge doesn't flip the mode back and forth
+	for i in range(3):
+		feed(tuner, unsteady)
+		assert tuner.update() == (11, 2) # ceil(30 ms * 1.5 / 4.096 ms)
+		feed(tuner, steady)
+		assert tuner.update() == (8, 2)
+
+	# but it does switch once the latencies stay unsteady
+	feed(tuner, unsteady)
+	assert tuner.update() == (11, 2)
+	feed(tuner, unsteady)
+	assert tuner.update() is None
+	feed(tuner, unsteady)
+	assert tuner.update() == (11, 1)
+
+
+def test_query_profiler():
+	profiler = QueryProfiler(window=4)
+	assert profiler.stats() == {}
+
+	for wait in [10, 20, 30, 40, 50]:
+		profiler.record("RPM", { "write" : 1, "wait" : wait, "read" : 2, "parse" : 3 })
+	profiler.record("SPEED", { "write" : 1 })
+
+	stats = profiler.stats()
+	assert sorted(stats.keys()) == ["RPM", "SPEED"]
+
+	# only the last window of samples is kept
+	wait = stats["RPM"]["wait"]
+	assert wait["samples"] == 4
+	assert (wait["p50"], wait["p95"], wait["p99"]) == (30, 50, 50)
+	assert stats["RPM"]["total"]["p99"] == 56
+
+	# stages that weren't timed are left out
+	assert "decode" not in stats["RPM"]
+	assert sorted(stats["SPEED"].keys()) == ["total", "write"]
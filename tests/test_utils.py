@@ -0,0 +1,111 @@
+
+import os
+import pty
+import time
+import threading
+import pytest
+
+from obd.utils import probe_port, probeSerial, _parallel, hex_line_to_bytes, BitSet
+
+
+class FakeAdapter(threading.Thread):
+	""" answers ATI on the master side of a pty, after a delay """
+
+	def __init__(self, banner, delay=0):
+		super(FakeAdapter, self).__init__()
+		self.daemon = True
+		self.banner = banner
+		self.delay = delay
+		self.master, self.slave = pty.openpty()
+		self.portname = os.ttyname(self.slave)
+
+	def run(self):
+		buffer = b""
+		while True:
+			try:
+				buffer += os.read(self.master, 1024)
+			except OSError:
+				return
+
+			while b"\r" in buffer:
+				cmd, buffer = buffer.split(b"\r", 1)
+				time.sleep(self.delay)
+				if self.banner is not None:
+					os.write(self.master, self.banner + b"\r\r>")
+
+
+def adapter(banner, delay=0):
+	a = FakeAdapter(banner, delay)
+	a.start()
+	return a
+
+
+def test_probe_port():
+	assert probe_port(adapter(b"ELM327 v1.5").portname) < 1
+	assert probe_port(adapter(b"?").portname) is None # not an ELM
+	assert probe_port(adapter(None).portname, timeout=0.2) is None # silent
+	assert probe_port("/dev/does-not-exist") is None
+
+
+def test_probe_serial_ranking():
+	slow = adapter(b"ELM327 v1.4b", delay=0.3)
+	fast = adapter(b"ELM327 v2.1", delay=0.05)
+	other = adapter(b"?")
+
+	ports = [slow.portname, "/dev/does-not-exist", other.portname, fast.portname]
+
+	start = time.time()
+	found = probeSerial(ports)
+	assert time.time() - start < 0.6 # probed at the same time, not one after another
+
+	assert [ port for port, latency in found ] == [fast.portname, slow.portname]
+	assert found[0][1] < found[1][1]
+
+
+def test_parallel():
+	assert _parallel(lambda x: x * 2, range(40), workers=4) == [ x * 2 for x in range(40) ]
+	assert _parallel(lambda x: x, []) == []
+
+	def fail(x):
+		raise ValueError(x)
+
+	with pytest.raises(ValueError):
+		_parallel(fail, [1, 2])
+
+
+def test_hex_line_to_bytes():
+	assert hex_line_to_bytes("48 6B 10 41 0C 1A F8 22") == bytearray([0x48, 0x6B, 0x10, 0x41, 0x0C, 0x1A, 0xF8, 0x22])
+	assert hex_line_to_bytes("410c1af8") == bytearray([0x41, 0x0C, 0x1A, 0xF8])
+	assert hex_line_to_bytes("") == bytearray()
+
+	# 11-bit CAN headers are padded, with or without spaces
+	assert hex_line_to_bytes("7E8 03 41 0D 32") == bytearray([0x07, 0xE8, 0x03, 0x41, 0x0D, 0x32])
+	assert hex_line_to_bytes("7E803410D32") == bytearray([0x07, 0xE8, 0x03, 0x41, 0x0D, 0x32])
+
+	# status messages aren't hex
+	for line in ["NO DATA", "CAN ERROR", "SEARCHING...", "12.5V", "?"]:
+		assert hex_line_to_bytes(line) is None
+
+
+def test_bitset():
+	pids = BitSet.from_bytes(bytearray([0xBE, 0x3F, 0xA8, 0x13]))
+	assert list(pids) == [1, 3, 4, 5, 6, 7, 11, 12, 13, 14, 15, 16, 17, 19, 21, 28, 31, 32]
+	assert len(pids) == 18
+	assert (12 in pids) and (13 in pids)
+	assert (2 not in pids) and (0 not in pids) and (-1 not in pids) and (33 not in pids)
+	assert pids.to_bytes(4) == bytearray([0xBE, 0x3F, 0xA8, 0x13])
+
+	# set operations
+	watched = BitSet.of([4, 12, 13, 40])
+	assert list(pids & watched) == [4, 12, 13]
+	assert list(watched - pids) == [40]
+	assert list(watched ^ BitSet.of([4, 41])) == [12, 13, 40, 41]
+	assert list(BitSet.of([1]) | BitSet.of([32])) == [1, 32]
+	assert list(BitSet.of([1, 32]) << 0x20) == [0x21, 0x40]
+	assert list(BitSet.of([0x21, 0x40]) >> 0x20) == [1, 32]
+
+	# values, usable as dict keys
+	assert BitSet.of([1, 2]) == BitSet(6)
+	assert BitSet.of([1, 2]) != BitSet(7)
+	assert len(set([BitSet(6), BitSet.of([2, 1])])) == 1
+	assert not BitSet() and BitSet(1)